@@ -39,7 +39,7 @@ ANALYZE telematics_suntech_raw_dlq;
 
 -- RISK SCORE DAILY
 
-ALTER TABLE nessie.telematics.risk_score_daily          EXECUTE optimize(file_size_threshold => '128MB');
+-- optimize: config/spark/table_maintenance.py (scripts/batch_jobs.sh), solo particiones con archivos pequeños/deletes
 
 ALTER TABLE "nessie"."telematics"."risk_score_daily"    EXECUTE remove_orphan_files(retention_threshold => '1d');
 
@@ -49,10 +49,20 @@ ANALYZE nessie.telematics.risk_score_daily;
 
 -- TELEMATICS REAL TIME
 
-ALTER TABLE nessie.telematics.telematics_real_time          EXECUTE optimize(file_size_threshold => '256MB') WHERE received_day = current_date - INTERVAL '1' day;
+-- optimize: config/spark/table_maintenance.py (scripts/batch_jobs.sh), ordenado por device_id, gps_epoch
 
 ALTER TABLE "nessie"."telematics"."telematics_real_time"    EXECUTE remove_orphan_files(retention_threshold => '1d');
 
 ALTER TABLE "nessie"."telematics"."telematics_real_time"    EXECUTE expire_snapshots(retention_threshold => '1d');
 
-ANALYZE nessie.telematics.telematics_real_time;
\ No newline at end of file
+ANALYZE nessie.telematics.telematics_real_time;
+
+-- DEVICE LAST STATE (upsert: compactar equality deletes)
+
+ALTER TABLE nessie.telematics.device_last_state          EXECUTE optimize;
+
+ALTER TABLE "nessie"."telematics"."device_last_state"    EXECUTE remove_orphan_files(retention_threshold => '1d');
+
+ALTER TABLE "nessie"."telematics"."device_last_state"    EXECUTE expire_snapshots(retention_threshold => '1d');
+
+ANALYZE nessie.telematics.device_last_state;
\ No newline at end of file
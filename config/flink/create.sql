@@ -41,7 +41,8 @@ CREATE TABLE IF NOT EXISTS nessie.telematics.telematics_real_time (
   decoded_epoch            TIMESTAMP(3) WITH LOCAL TIME ZONE,
   correlation_id           STRING,
   device_id_bucket         INT,
-  received_day             DATE
+  received_day             DATE,
+  geo_cell                 BIGINT   -- celda de 0.01° agrupada por cuadro de 1° (services/telematics_api/geo.py)
 )
 PARTITIONED BY (
   device_id_bucket,
@@ -57,6 +58,7 @@ WITH (
   'write.metadata.metrics.default' = 'truncate(16)',
   'write.metadata.metrics.column.gps_epoch'       = 'full',
   'write.metadata.metrics.column.received_epoch'  = 'full',
+  'write.metadata.metrics.column.geo_cell'        = 'full',
   'write.parquet.bloom-filter-enabled.column.device_id'      = 'true',
   'write.parquet.bloom-filter-enabled.column.gps_epoch'      = 'true',
   'write.parquet.bloom-filter-enabled.column.correlation_id' = 'true',
@@ -120,6 +122,46 @@ CREATE OR REPLACE TEMPORARY TABLE kafka_telematics_real_time (
   'json.ignore-parse-errors' = 'true'
 );
 
+-- ÚLTIMA POSICIÓN POR DEVICE (upsert: una fila por device_id)
+CREATE TABLE IF NOT EXISTS nessie.telematics.device_last_state (
+  device_id                STRING NOT NULL,
+  device_id_bucket         INT    NOT NULL,
+  report_type              STRING,
+  tenant                   STRING,
+  provider                 STRING,
+  `model`                  STRING,
+  alert_type               STRING,
+  latitude                 DOUBLE,
+  longitude                DOUBLE,
+  gps_fixed                BOOLEAN,
+  gps_epoch                TIMESTAMP(3) WITH LOCAL TIME ZONE,
+  speed_kmh                DOUBLE,
+  heading                  STRING,
+  odometer_meters          BIGINT,
+  engine_on                BOOLEAN,
+  received_epoch           TIMESTAMP(3) WITH LOCAL TIME ZONE,
+  correlation_id           STRING,
+  PRIMARY KEY (device_id, device_id_bucket) NOT ENFORCED
+)
+PARTITIONED BY (
+  device_id_bucket
+)
+WITH (
+  'format-version' = '2',
+  'write.upsert.enabled' = 'true',
+  'write.format.default' = 'parquet',
+  'write.parquet.compression-codec' = 'ZSTD',
+  'write.distribution-mode' = 'hash',
+  'write.metadata.metrics.default' = 'truncate(16)',
+  'write.metadata.metrics.column.device_id' = 'full',
+  'write.parquet.bloom-filter-enabled.column.device_id' = 'true',
+  'commit.retry.num-retries'='5',
+  'commit.retry.min-wait-ms'='1000',
+  'commit.retry.max-wait-ms'='30000',
+  'gc.enabled' = 'true',
+  'write.metadata.delete-after-commit.enabled' = 'true'
+);
+
 -- RISK SCORE DIARIO
 CREATE TABLE IF NOT EXISTS nessie.telematics.risk_score_daily (
   device_id         VARCHAR,
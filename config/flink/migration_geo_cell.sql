@@ -0,0 +1,21 @@
+-- Agrega geo_cell a una telematics_real_time ya existente (create.sql solo aplica en instalaciones nuevas).
+-- Correr en Trino ANTES de reiniciar sink_telematics_real_time.sql (el INSERT ya incluye la columna):
+--   docker exec -i iothub-stack-trino-1 trino --server https://localhost:8080 --insecure --user cleanup --password \
+--     --catalog nessie --schema telematics -f /opt/sql/migration_geo_cell.sql
+-- Las métricas min/max de geo_cell quedan completas con el default 'truncate(16)' (solo trunca strings/binarios).
+
+USE nessie.telematics;
+
+ALTER TABLE telematics_real_time ADD COLUMN IF NOT EXISTS geo_cell BIGINT;
+
+-- Opcional: llenar el histórico por día (las consultas por área ya incluyen filas con geo_cell NULL,
+-- pero esos archivos no se pueden podar). Repetir por received_day y compactar después.
+-- UPDATE telematics_real_time
+-- SET geo_cell =
+--     ((CAST(floor(least(greatest((latitude  +  90) * 100, 0), 17999)) AS BIGINT) / 100) * 360
+--    + (CAST(floor(least(greatest((longitude + 180) * 100, 0), 35999)) AS BIGINT) / 100)) * 10000
+--   + (CAST(floor(least(greatest((latitude  +  90) * 100, 0), 17999)) AS BIGINT) % 100) * 100
+--   + (CAST(floor(least(greatest((longitude + 180) * 100, 0), 35999)) AS BIGINT) % 100)
+-- WHERE received_day = DATE '2025-09-25'
+--   AND geo_cell IS NULL
+--   AND latitude IS NOT NULL AND longitude IS NOT NULL;
@@ -0,0 +1,72 @@
+SET 'table.local-time-zone' = 'America/Mexico_City';
+SET 'parallelism.default' = '1';
+SET 'table.exec.resource.default-parallelism' = '1';
+SET 'table.exec.sink.parallelism' = '1';
+SET 'table.dynamic-table-options.enabled' = 'true';
+SET 'restart-strategy' = 'fixed-delay';
+SET 'restart-strategy.fixed-delay.attempts' = '10';
+SET 'restart-strategy.fixed-delay.delay' = '5 s';
+-- Cada checkpoint es un commit del upsert: define qué tan fresca está la última posición
+SET 'execution.checkpointing.interval' = '60 s';
+SET 'execution.checkpointing.timeout'  = '10 min';
+SET 'execution.checkpointing.min-pause' = '30 s';
+SET 'execution.checkpointing.max-concurrent-checkpoints' = '1';
+SET 'execution.checkpointing.unaligned' = 'false';
+
+USE CATALOG nessie;
+USE telematics;
+
+-- Top-1 por device_id ordenado por gps_epoch: un reporte atrasado (gps_epoch menor
+-- al ya guardado) no reemplaza la última posición. Consumer group propio para no
+-- compartir offsets con sink_telematics_real_time.sql.
+INSERT INTO nessie.telematics.device_last_state
+SELECT
+  device_id,
+  device_id_bucket,
+  report_type,
+  tenant,
+  provider,
+  `model`,
+  alert_type,
+  latitude,
+  longitude,
+  gps_fixed,
+  gps_epoch,
+  speed_kmh,
+  heading,
+  odometer_meters,
+  engine_on,
+  received_epoch,
+  correlation_id
+FROM (
+  SELECT
+    *,
+    ROW_NUMBER() OVER (PARTITION BY device_id ORDER BY gps_epoch DESC) AS rn
+  FROM (
+    SELECT
+      device_id,
+      CAST(MOD(ABS(HASH_CODE(device_id)), 32) AS INT) AS device_id_bucket,
+      report_type,
+      tenant,
+      provider,
+      `model`,
+      alert_type,
+      CAST(latitude AS DOUBLE) AS latitude,
+      CAST(longitude AS DOUBLE) AS longitude,
+      CAST(gps_fixed AS BOOLEAN) AS gps_fixed,
+      CAST(TO_TIMESTAMP_LTZ(CAST(gps_epoch AS BIGINT) * 1000, 3) AS TIMESTAMP_LTZ(3)) AS gps_epoch,
+      CAST(speed_kmh AS DOUBLE) AS speed_kmh,
+      heading,
+      odometer_meters,
+      engine_on,
+      CAST(TO_TIMESTAMP_LTZ(CAST(received_epoch AS BIGINT) * 1000, 3) AS TIMESTAMP_LTZ(3)) AS received_epoch,
+      correlation_id
+    FROM kafka_telematics_real_time /*+ OPTIONS('properties.group.id'='staging.datalake-device-last-state') */
+    WHERE report_type IN ('STATUS','ALERT')
+      AND device_id IS NOT NULL
+      AND gps_epoch IS NOT NULL
+      AND latitude IS NOT NULL
+      AND longitude IS NOT NULL
+  )
+)
+WHERE rn = 1;
@@ -38,6 +38,19 @@ SELECT
   CAST(TO_TIMESTAMP_LTZ(CAST(decoded_epoch  AS BIGINT) * 1000, 3) AS TIMESTAMP_LTZ(3)) AS decoded_epoch,
   correlation_id,
   CAST(MOD(ABS(HASH_CODE(device_id)), 32) AS INT) AS device_id_bucket,
-  CAST(TO_TIMESTAMP_LTZ(CAST(received_epoch AS BIGINT) * 1000, 3) AS DATE) AS received_day
-FROM kafka_telematics_real_time
+  CAST(TO_TIMESTAMP_LTZ(CAST(received_epoch AS BIGINT) * 1000, 3) AS DATE) AS received_day,
+  -- geo_cell = cuadro de 1° * 10000 + fila * 100 + columna (celdas de 0.01°); NULL sin coordenadas
+  CASE WHEN geo_lat_i IS NULL OR geo_lon_i IS NULL THEN CAST(NULL AS BIGINT) ELSE
+    CAST(((geo_lat_i - MOD(geo_lat_i, 100)) / 100 * 360 + (geo_lon_i - MOD(geo_lon_i, 100)) / 100) * 10000
+      + MOD(geo_lat_i, 100) * 100 + MOD(geo_lon_i, 100) AS BIGINT)
+  END AS geo_cell
+FROM (
+  SELECT
+    k.*,
+    CASE WHEN latitude IS NULL THEN CAST(NULL AS BIGINT)
+      ELSE CAST(FLOOR(LEAST(GREATEST((CAST(latitude  AS DOUBLE) +  90) * 100, 0), 17999)) AS BIGINT) END AS geo_lat_i,
+    CASE WHEN longitude IS NULL THEN CAST(NULL AS BIGINT)
+      ELSE CAST(FLOOR(LEAST(GREATEST((CAST(longitude AS DOUBLE) + 180) * 100, 0), 35999)) AS BIGINT) END AS geo_lon_i
+  FROM kafka_telematics_real_time k
+)
 WHERE report_type IN ('STATUS','ALERT');
\ No newline at end of file
@@ -1,24 +1,287 @@
 import argparse
+import hashlib
+import json
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
 from pyspark.sql import SparkSession
 from pyspark.sql import functions as F
-from pyspark.sql.types import IntegerType
+from pyspark import StorageLevel
+
+DEVICE_ID_BUCKETS = 32
+TABLE = "nessie.telematics.telematics_real_time"
+
+# Modo --clustered: columnas de partición + write.order-by de la tabla
+CLUSTER_COLUMNS = ["device_id_bucket", "received_day", "device_id", "gps_epoch"]
+# Propiedad que cada append deja en el summary del snapshot (reanudación sin duplicar)
+CHUNK_PROPERTY = "backfill.chunk"
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"
 
 def java_hashcode(s: str) -> int:
+    """Referencia en Python de String.hashCode() (para validar la versión nativa)."""
     if s is None:
         return None
+    # Java hashea unidades UTF-16: un carácter fuera del BMP (p.ej. emoji) cuenta como dos (surrogates)
+    units = s.encode("utf-16-le", "surrogatepass")
     h = 0
-    for ch in s:
-        h = (31 * h + ord(ch)) & 0xFFFFFFFF
+    for i in range(0, len(units), 2):
+        h = (31 * h + int.from_bytes(units[i:i + 2], "little")) & 0xFFFFFFFF
     if h & 0x80000000:
         h = -((~h + 1) & 0xFFFFFFFF)
     return int(h)
 
-java_hash_udf = F.udf(java_hashcode, IntegerType())
+def device_id_bucket_col(col: str = "device_id"):
+    """
+    MOD(ABS(HASH_CODE(device_id)), 32) de Flink como expresión nativa de Spark
+    (sin UDF de Python: no hay serialización JVM <-> worker por fila).
+
+    hashCode se acumula en BIGINT módulo 2^32 (no depende de overflow de INT ni
+    del modo ANSI) y al final se reinterpreta como entero con signo de 32 bits.
+    ABS(Integer.MIN_VALUE) en Java sigue siendo negativo, pero MIN_VALUE % 32 = 0,
+    igual que 2^31 % 32, así que ABS en BIGINT da el mismo bucket.
+
+    length/substr/ascii de Spark trabajan por code point; uno fuera del BMP
+    (> 0xFFFF) se expande a su par de surrogates UTF-16 (alto * 31 + bajo, o
+    sea h * 961 + ...), como lo recorre String.hashCode.
+    """
+    return F.expr(
+        f"CAST(IF(length({col}) = 0, 0, abs(aggregate("
+        f"transform(sequence(1, length({col})), i -> ascii(substr({col}, i, 1))), "
+        f"CAST(0 AS BIGINT), "
+        f"(h, x) -> IF(x > 65535, "
+        f"(h * 961 + (55296 + (x - 65536) div 1024) * 31 + (56320 + (x - 65536) % 1024)) % 4294967296, "
+        f"(h * 31 + x) % 4294967296), "
+        f"h -> IF(h >= 2147483648, h - 4294967296, h)"
+        f")) % {DEVICE_ID_BUCKETS}) AS INT)"
+    )
 
 def sql_str_list(vals):
     quoted = ["'" + v.replace("'", "''") + "'" for v in vals]
     return ",".join(quoted)
 
+def read_source(spark, args, where_sql, lower_ts, upper_ts):
+    """
+    Lectura JDBC de Postgres. Con --jdbc-partitions > 1 se parte por rango de
+    received_epoch (entre lower_ts y upper_ts) y cada rango lo lee una tarea.
+    """
+    reader = (
+        spark.read.format("jdbc")
+        .option("url", args.pg_url)
+        .option("dbtable", f"(SELECT * FROM {args.pg_table} WHERE {where_sql}) AS src")
+        .option("user", args.pg_user)
+        .option("password", args.pg_pass)
+        .option("driver", "org.postgresql.Driver")
+        .option("fetchsize", str(args.fetch_size))
+    )
+    if args.jdbc_partitions > 1:
+        reader = (
+            reader
+            .option("partitionColumn", "received_epoch")
+            .option("lowerBound", lower_ts)
+            .option("upperBound", upper_ts)
+            .option("numPartitions", str(args.jdbc_partitions))
+        )
+    return reader.load()
+
+def geo_cell_col(lat: str = "latitude", lon: str = "longitude"):
+    """
+    Misma celda que sink_telematics_real_time.sql y services/telematics_api/geo.py:
+    cuadro de 1° * 10000 + fila * 100 + columna, con celdas de 0.01°.
+    GREATEST/LEAST de Spark ignoran NULL, así que sin coordenadas se fuerza NULL.
+    """
+    lat_i = f"CAST(FLOOR(LEAST(GREATEST(({lat} + 90) * 100, 0), 17999)) AS BIGINT)"
+    lon_i = f"CAST(FLOOR(LEAST(GREATEST(({lon} + 180) * 100, 0), 35999)) AS BIGINT)"
+    return F.expr(
+        f"IF({lat} IS NULL OR {lon} IS NULL, CAST(NULL AS BIGINT), "
+        f"(div({lat_i}, 100) * 360 + div({lon_i}, 100)) * 10000 + ({lat_i} % 100) * 100 + ({lon_i} % 100))"
+    )
+
+def transform(df):
+    coords = F.split(F.regexp_replace(F.col("coordinates").cast("string"), r"[()]", ""), ",")
+    return df.select(
+        "report_type",
+        "tenant",
+        "provider",
+        "model",
+        "firmware",
+        "device_id",
+        "alert_type",
+        coords.getItem(1).cast("double").alias("latitude"),
+        coords.getItem(0).cast("double").alias("longitude"),
+        "gps_fixed",
+        F.col("gps_epoch").cast("timestamp").alias("gps_epoch"),
+        F.col("satellites").cast("bigint").alias("satellites"),
+        F.col("speed_kmh").cast("double").alias("speed_kmh"),
+        "heading",
+        F.col("odometer_meters").cast("bigint").alias("odometer_meters"),
+        "engine_on",
+        F.col("vehicle_battery_voltage").cast("double").alias("vehicle_battery_voltage"),
+        F.col("backup_battery_voltage").cast("double").alias("backup_battery_voltage"),
+        F.col("received_epoch").cast("timestamp").alias("received_epoch"),
+        F.col("decoded_epoch").cast("timestamp").alias("decoded_epoch"),
+        "correlation_id",
+        device_id_bucket_col("device_id").alias("device_id_bucket"),
+        F.to_date(F.col("received_epoch")).alias("received_day"),
+    ).withColumn("geo_cell", geo_cell_col())
+
+def time_windows(start_ts, end_ts, chunk_days):
+    """[start_ts, end_ts) en ventanas de --chunk-days días (una sola si es 0)."""
+    if chunk_days <= 0:
+        return [(start_ts, end_ts)]
+    end = datetime.fromisoformat(end_ts)
+    windows = []
+    lo, cur = start_ts, datetime.fromisoformat(start_ts)
+    while cur < end:
+        cur = min(cur + timedelta(days=chunk_days), end)
+        hi = end_ts if cur == end else cur.strftime(TS_FORMAT)
+        windows.append((lo, hi))
+        lo = hi
+    return windows
+
+def run_layout(args, lines):
+    """
+    Lo que define qué filas cubre cada (línea, ventana): si cambia, los chunks
+    confirmados ya no corresponden y reanudar duplicaría datos. --lines-per-batch
+    y --line-start/--line-end no entran: la reanudación es por línea.
+    """
+    return {
+        "device_file_sha256": hashlib.sha256("\n".join(lines).encode("utf-8")).hexdigest(),
+        "start_ts": args.start_ts,
+        "end_ts": args.end_ts,
+        "chunk_days": args.chunk_days,
+        "report_types": sorted(x.strip() for x in args.report_types.split(",") if x.strip()),
+    }
+
+def layout_id(layout):
+    return hashlib.sha1(json.dumps(layout, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+def chunk_key(run, first, last, window):
+    return f"run={run};lines={first}-{last};received={window[0]}..{window[1]}"
+
+def chunk_units(key, run):
+    """(línea, ventana) que cubre un chunk confirmado de esta corrida (vacío si es de otra)."""
+    fields = dict(part.split("=", 1) for part in key.split(";") if "=" in part)
+    if fields.get("run") != run or "lines" not in fields or "received" not in fields:
+        return set()
+    first, last = (int(x) for x in fields["lines"].split("-"))
+    window = tuple(fields["received"].split(".."))
+    return {(line, window) for line in range(first, last + 1)}
+
+def contiguous(lines):
+    """[2, 3, 5] -> [(2, 3), (5, 5)]"""
+    runs = []
+    for line in lines:
+        if runs and line == runs[-1][1] + 1:
+            runs[-1] = (runs[-1][0], line)
+        else:
+            runs.append((line, line))
+    return runs
+
+def plan_chunks(line_devices, start_idx, end_idx, lines_per_batch, windows, done_units):
+    """
+    Chunks (primera, última, devices, ventana) = batch de hasta --lines-per-batch
+    líneas consecutivas × ventana, sin las (línea, ventana) de `done_units`.
+    Devuelve (chunks, total de (línea, ventana), ya confirmadas).
+    """
+    chunks = []
+    total = skipped = 0
+    for first in range(start_idx, end_idx + 1, lines_per_batch):
+        lines = [l for l in range(first, min(first + lines_per_batch - 1, end_idx) + 1) if line_devices[l]]
+        for w in windows:
+            total += len(lines)
+            pending = [l for l in lines if (l, w) not in done_units]
+            skipped += len(lines) - len(pending)
+            for lo, hi in contiguous(pending):
+                devices = [d for l in range(lo, hi + 1) for d in line_devices.get(l, [])]
+                chunks.append((lo, hi, devices, w))
+    return chunks, total, skipped
+
+def load_manifest(path):
+    """(layout, chunks confirmados) según el manifiesto (JSON por línea; la primera trae el layout)."""
+    layout, done = None, {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    if "layout" in entry:
+                        layout = entry["layout"]
+                    else:
+                        done[entry["chunk"]] = entry
+    except FileNotFoundError:
+        pass
+    return layout, done
+
+def append_manifest(path, entry, lock):
+    with lock:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, default=str) + "\n")
+            f.flush()
+
+def committed_chunks(spark):
+    """
+    Chunks con snapshot en la tabla (summary `backfill.chunk`): cubre un append
+    que se confirmó en Iceberg pero no llegó al manifiesto (job cortado justo después).
+    """
+    snaps = spark.table(f"{TABLE}.snapshots")
+    rows = (
+        snaps.select(
+            F.col("summary").getItem(CHUNK_PROPERTY).alias("chunk"),
+            "snapshot_id",
+            "committed_at",
+            F.col("summary").getItem("added-records").alias("added_records"),
+        )
+        .where(F.col("chunk").isNotNull())
+        .collect()
+    )
+    return {r["chunk"]: r.asDict() for r in rows}
+
+def table_bytes_per_row(spark, default):
+    """Bytes por fila de los archivos de datos actuales (Parquet ZSTD), para dimensionar archivos."""
+    r = (
+        spark.table(f"{TABLE}.files")
+        .where(F.col("content") == 0)
+        .agg(F.sum("file_size_in_bytes").alias("bytes"), F.sum("record_count").alias("records"))
+        .first()
+    )
+    if r is None or not r["records"]:
+        return default
+    return r["bytes"] / r["records"]
+
+def write_clustered(out, row_count, bytes_per_row, target_bytes, key):
+    """
+    Un rango de (bucket, día, device_id, gps_epoch) por tarea, ordenado dentro
+    de la tarea: cada tarea escribe pocos archivos de ~target_bytes ya ordenados
+    como pide write.order-by. distribution-mode=none evita que Iceberg vuelva a
+    hacer shuffle sobre lo ya repartido.
+    """
+    n = max(1, math.ceil(row_count * bytes_per_row / target_bytes))
+    (
+        out.repartitionByRange(n, *CLUSTER_COLUMNS)
+        .sortWithinPartitions(*CLUSTER_COLUMNS)
+        .writeTo(TABLE)
+        .option("distribution-mode", "none")
+        .option("target-file-size-bytes", str(target_bytes))
+        .option(f"snapshot-property.{CHUNK_PROPERTY}", key)
+        .append()
+    )
+    return n
+
+def chunk_files(spark, key):
+    """added-data-files / added-files-size del snapshot del chunk."""
+    r = (
+        spark.table(f"{TABLE}.snapshots")
+        .where(F.col("summary").getItem(CHUNK_PROPERTY) == key)
+        .select(
+            "snapshot_id",
+            F.col("summary").getItem("added-data-files").cast("bigint").alias("files"),
+            F.col("summary").getItem("added-files-size").cast("bigint").alias("bytes"),
+        )
+        .first()
+    )
+    return r.asDict() if r else {}
+
 def main():
     p = argparse.ArgumentParser()
     p.add_argument("--pg-url", required=True)
@@ -31,6 +294,17 @@ def main():
     p.add_argument("--device-file", required=True, help="Ruta a un archivo con líneas de device_id separados por coma")
     p.add_argument("--line-start", type=int, default=1, help="Primera línea (1-index) a procesar")
     p.add_argument("--line-end", type=int, default=None, help="Última línea (1-index) a procesar (incluida)")
+    p.add_argument("--lines-per-batch", type=int, default=1, help="Líneas del archivo que se juntan en una sola lectura/append")
+    p.add_argument("--parallel-batches", type=int, default=1, help="Batches que se procesan a la vez")
+    p.add_argument("--jdbc-partitions", type=int, default=1, help="Particiones de la lectura JDBC por rango de received_epoch (1 = sin partir)")
+    p.add_argument("--fetch-size", type=int, default=10000, help="fetchsize del driver JDBC")
+    p.add_argument("--clustered", action="store_true",
+                   help="Reparte por (device_id_bucket, received_day), ordena por device_id, gps_epoch y dimensiona archivos a --target-file-mb")
+    p.add_argument("--target-file-mb", type=int, default=256, help="Tamaño objetivo de archivo en modo --clustered (write.target-file-size-bytes)")
+    p.add_argument("--row-bytes", type=float, default=0,
+                   help="Bytes por fila en Parquet para estimar archivos en modo --clustered (0 = promedio de la tabla)")
+    p.add_argument("--chunk-days", type=int, default=0, help="Parte [--start-ts, --end-ts) en ventanas de N días por batch (0 = una sola)")
+    p.add_argument("--manifest", help="Archivo JSONL de progreso: los chunks ya confirmados se saltan al relanzar")
     p.add_argument("--nessie-uri", default="http://nessie:19120/api/v1")
     p.add_argument("--nessie-ref", default="main")
     p.add_argument("--warehouse", default="s3://iothub-telematics-data-stg/warehouse")
@@ -38,6 +312,8 @@ def main():
     args = p.parse_args()
 
     report_types = [x.strip() for x in args.report_types.split(",") if x.strip()]
+    lines_per_batch = max(1, args.lines_per_batch)
+    parallel_batches = max(1, args.parallel_batches)
 
     # Spark session
     spark = (
@@ -56,6 +332,8 @@ def main():
         .config("spark.hadoop.fs.s3a.aws.credentials.provider", "org.apache.hadoop.fs.s3a.SimpleAWSCredentialsProvider")
         .config("spark.sql.shuffle.partitions", "200")
         .config("spark.sql.iceberg.handle-timestamp-without-timezone", "true")
+        # Varios batches envían jobs desde hilos distintos; FAIR reparte los executors entre ellos
+        .config("spark.scheduler.mode", "FAIR")
         .getOrCreate()
     )
 
@@ -77,86 +355,120 @@ def main():
         spark.stop()
         return
 
-    processed_total_rows = 0
+    end_idx = min(end_idx, total_lines)
 
-    # Preconstruye parte estática del WHERE
-    base_conditions = [
-        f"report_type IN ({sql_str_list(report_types)})",
-        f"received_epoch >= TIMESTAMP '{args.start_ts}'",
-        f"received_epoch < TIMESTAMP '{args.end_ts}'",
-    ]
-    base_where = " AND ".join(base_conditions)
+    # Preconstruye parte estática del WHERE (la ventana received_epoch va por chunk)
+    base_where = f"report_type IN ({sql_str_list(report_types)})"
+    windows = time_windows(args.start_ts, args.end_ts, args.chunk_days)
+    layout = run_layout(args, all_lines)
+    run = layout_id(layout)
 
+    line_devices = {}
     for line_no in range(start_idx, end_idx + 1):
-        raw_line = all_lines[line_no - 1]
-        line_devices = [x.strip() for x in raw_line.split(",") if x.strip()]
-        if not line_devices:
+        line_devices[line_no] = [x.strip() for x in all_lines[line_no - 1].split(",") if x.strip()]
+        if not line_devices[line_no]:
             jlog.warn(f"Línea {line_no}/{total_lines} vacía. Saltando.")
-            continue
 
-        jlog.info(f"[{line_no}/{total_lines}] Procesando línea con {len(line_devices)} devices")
+    # Con --manifest se saltan las (línea, ventana) ya confirmadas, sin importar cómo se agruparon
+    done_units = set()
+    manifest_lock = threading.Lock()
+    if args.manifest:
+        saved_layout, done = load_manifest(args.manifest)
+        if saved_layout is None and done:
+            jlog.error(f"Manifiesto {args.manifest} sin layout (formato anterior): no se puede verificar; usa otro --manifest")
+            spark.stop()
+            raise SystemExit(1)
+        if saved_layout is not None and saved_layout != layout:
+            changed = sorted(k for k in set(layout) | set(saved_layout) if layout.get(k) != saved_layout.get(k))
+            jlog.error(
+                f"Manifiesto {args.manifest} creado con otros argumentos ({', '.join(changed)}): reanudar duplicaría "
+                f"filas. Relanza con los mismos valores o usa otro --manifest"
+            )
+            spark.stop()
+            raise SystemExit(1)
+        if saved_layout is None:
+            append_manifest(args.manifest, {"layout": layout, "run": run}, manifest_lock)
+        for key, snap in committed_chunks(spark).items():
+            if key not in done and chunk_units(key, run):
+                # Confirmado en Iceberg pero no en el manifiesto: se completa
+                entry = {"chunk": key, "rows": snap["added_records"], "snapshot_id": snap["snapshot_id"], "recovered": True}
+                append_manifest(args.manifest, entry, manifest_lock)
+                done[key] = entry
+        for key in done:
+            done_units |= chunk_units(key, run)
 
-        # WHERE específico de la línea
-        where_line = f"{base_where} AND device_id IN ({sql_str_list(line_devices)})"
+    chunks, total_units, skipped = plan_chunks(line_devices, start_idx, end_idx, lines_per_batch, windows, done_units)
+    if args.manifest:
+        jlog.info(f"Manifiesto {args.manifest}: {skipped}/{total_units} (línea, ventana) ya confirmadas")
 
-        # Construir subconsulta JDBC sin 'AND' al inicio (arreglado)
-        subquery = f"(SELECT * FROM {args.pg_table} WHERE {where_line}) AS src"
+    target_bytes = args.target_file_mb * 1048576
+    bytes_per_row = args.row_bytes
+    if args.clustered and bytes_per_row <= 0:
+        bytes_per_row = table_bytes_per_row(spark, default=64.0)
+        jlog.info(f"Modo clustered: {bytes_per_row:.1f} bytes/fila, objetivo {args.target_file_mb} MiB por archivo")
 
-        try:
-            df = (
-                spark.read.format("jdbc")
-                .option("url", args.pg_url)
-                .option("dbtable", subquery)
-                .option("user", args.pg_user)
-                .option("password", args.pg_pass)
-                .option("driver", "org.postgresql.Driver")
-                .load()
-            )
+    def process_batch(first, last, devices, window):
+        label = f"[{first}-{last}/{total_lines}]" if first != last else f"[{first}/{total_lines}]"
+        if len(windows) > 1:
+            label += f"[{window[0]} .. {window[1]}]"
+        key = chunk_key(run, first, last, window)
+        jlog.info(f"{label} Procesando {len(devices)} devices")
 
-            # Transformaciones
-            coords = F.split(F.regexp_replace(F.col("coordinates").cast("string"), r"[()]", ""), ",")
-            out = (
-                df.select(
-                    "report_type",
-                    "tenant",
-                    "provider",
-                    "model",
-                    "firmware",
-                    "device_id",
-                    "alert_type",
-                    coords.getItem(1).cast("double").alias("latitude"),
-                    coords.getItem(0).cast("double").alias("longitude"),
-                    "gps_fixed",
-                    F.col("gps_epoch").cast("timestamp").alias("gps_epoch"),
-                    F.col("satellites").cast("bigint").alias("satellites"),
-                    F.col("speed_kmh").cast("double").alias("speed_kmh"),
-                    "heading",
-                    F.col("odometer_meters").cast("bigint").alias("odometer_meters"),
-                    "engine_on",
-                    F.col("vehicle_battery_voltage").cast("double").alias("vehicle_battery_voltage"),
-                    F.col("backup_battery_voltage").cast("double").alias("backup_battery_voltage"),
-                    F.col("received_epoch").cast("timestamp").alias("received_epoch"),
-                    F.col("decoded_epoch").cast("timestamp").alias("decoded_epoch"),
-                    "correlation_id",
-                    (F.abs(java_hash_udf(F.col("device_id"))) % F.lit(32)).cast("int").alias("device_id_bucket"),
-                    F.to_date(F.col("received_epoch")).alias("received_day"),
-                )
-            )
+        where_batch = (
+            f"{base_where} AND received_epoch >= TIMESTAMP '{window[0]}' AND received_epoch < TIMESTAMP '{window[1]}' "
+            f"AND device_id IN ({sql_str_list(devices)})"
+        )
+        out = transform(read_source(spark, args, where_batch, window[0], window[1]))
 
+        # Se materializa una sola vez: el count y el append leen del cache, no de Postgres
+        out = out.persist(StorageLevel.MEMORY_AND_DISK)
+        try:
             row_count = out.count()
-            processed_total_rows += row_count
-            jlog.info(f"[{line_no}/{total_lines}] Rows leídas/transformadas: {row_count}")
-
+            jlog.info(f"{label} Rows leídas/transformadas: {row_count}")
+            entry = {"chunk": key, "rows": row_count, "committed_at": datetime.now().isoformat(timespec="seconds")}
             if row_count > 0:
-                out.writeTo("nessie.telematics.telematics_real_time").append()
-                jlog.info(f"[{line_no}/{total_lines}] Append OK ({row_count} rows)")
+                if args.clustered:
+                    tasks = write_clustered(out, row_count, bytes_per_row, target_bytes, key)
+                    files = chunk_files(spark, key)
+                    entry.update(files, tasks=tasks)
+                    avg_mb = files["bytes"] / files["files"] / 1048576 if files.get("files") else 0.0
+                    jlog.info(f"{label} Append OK ({row_count} rows, {files.get('files')} archivos, {avg_mb:.1f} MiB promedio)")
+                else:
+                    out.writeTo(TABLE).option(f"snapshot-property.{CHUNK_PROPERTY}", key).append()
+                    jlog.info(f"{label} Append OK ({row_count} rows)")
+            if args.manifest:
+                append_manifest(args.manifest, entry, manifest_lock)
+            return row_count
+        finally:
+            out.unpersist()
+
+    processed_total_rows = 0
+    failed = 0
 
-        except Exception as e:
-            # Log y continuar con la siguiente línea
-            jlog.error(f"[{line_no}/{total_lines}] Error procesando línea: {str(e)}", e)
+    if parallel_batches == 1:
+        for first, last, devices, window in chunks:
+            try:
+                processed_total_rows += process_batch(first, last, devices, window)
+            except Exception as e:
+                # Log y continuar con el siguiente batch
+                failed += 1
+                jlog.error(f"[{first}-{last}/{total_lines}] Error procesando líneas: {str(e)}", e)
+    else:
+        with ThreadPoolExecutor(max_workers=parallel_batches) as pool:
+            futures = {pool.submit(process_batch, *c): c for c in chunks}
+            for fut in as_completed(futures):
+                first, last, _, _ = futures[fut]
+                try:
+                    processed_total_rows += fut.result()
+                except Exception as e:
+                    failed += 1
+                    jlog.error(f"[{first}-{last}/{total_lines}] Error procesando líneas: {str(e)}", e)
 
-    jlog.info(f"PROCESO TERMINADO. Líneas procesadas: {end_idx - start_idx + 1}. Filas totales escritas: {processed_total_rows}")
+    jlog.info(
+        f"PROCESO TERMINADO. Líneas procesadas: {end_idx - start_idx + 1} en {len(chunks)} chunks "
+        f"({failed} con error). Filas totales escritas: {processed_total_rows}"
+    )
     spark.stop()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,122 @@
+"""
+Paridad y throughput de device_id_bucket: expresión nativa vs. UDF de Python.
+
+Compara `device_id_bucket_col` contra la referencia `abs(java_hashcode(s)) % 32`
+(String.hashCode de Java, el mismo HASH_CODE que usa el sink de Flink) y contra
+la UDF que se usaba antes en el backfill. Sale con código 1 si hay diferencias.
+
+Uso:
+    spark-submit config/spark/bench_device_bucket.py --rows 5000000
+"""
+import argparse
+import random
+import string
+import sys
+import time
+
+from pyspark.sql import SparkSession
+from pyspark.sql import functions as F
+from pyspark.sql.types import IntegerType
+
+from backfill_telematics import DEVICE_ID_BUCKETS, device_id_bucket_col, java_hashcode
+
+
+def reference_bucket(s):
+    if s is None:
+        return None
+    return abs(java_hashcode(s)) % DEVICE_ID_BUCKETS
+
+
+# UDF del backfill anterior (se mantiene aquí solo para comparar)
+java_hash_udf = F.udf(lambda s: java_hashcode(s), IntegerType())
+
+
+def parity_corpus(n_random: int):
+    rnd = random.Random(42)
+    ids = [
+        None,
+        "",
+        "0",
+        "polygenelubricants",  # hashCode == Integer.MIN_VALUE
+        "1440086780",
+        "356938035643809",
+        "A1B2C3D4",
+        "dispositivo-ñ",
+        "dev-\U0001F69A",  # fuera del BMP: dos unidades UTF-16 en String.hashCode
+        "\U0001D518\U0001D52B\U0001D526-7",
+    ]
+    for _ in range(n_random):
+        kind = rnd.random()
+        if kind < 0.5:
+            ids.append(str(rnd.randint(10 ** 9, 10 ** 10 - 1)))  # id numérico de 10 dígitos
+        elif kind < 0.8:
+            ids.append(str(rnd.randint(10 ** 14, 10 ** 15 - 1)))  # IMEI
+        else:
+            ids.append("".join(rnd.choices(string.ascii_letters + string.digits + "-_", k=rnd.randint(1, 24))))
+    return ids
+
+
+def check_parity(spark, n_random: int) -> int:
+    ids = parity_corpus(n_random)
+    df = spark.createDataFrame([(s,) for s in ids], "device_id string")
+    rows = df.select(
+        "device_id",
+        device_id_bucket_col("device_id").alias("native"),
+        (F.abs(java_hash_udf("device_id")) % F.lit(DEVICE_ID_BUCKETS)).cast("int").alias("udf"),
+    ).collect()
+
+    mismatches = 0
+    for r in rows:
+        expected = reference_bucket(r.device_id)
+        if r.native != expected or r.udf != expected:
+            mismatches += 1
+            if mismatches <= 20:
+                print(f"MISMATCH device_id={r.device_id!r} native={r.native} udf={r.udf} expected={expected}")
+    print(f"paridad: {len(rows)} ids, {mismatches} diferencias")
+    return mismatches
+
+
+def timed(df) -> float:
+    t0 = time.perf_counter()
+    df.agg(F.sum("b")).collect()
+    return time.perf_counter() - t0
+
+
+def bench(spark, rows: int) -> None:
+    base = spark.range(rows).select(
+        (F.lit(1440000000) + (F.col("id") * 7919) % 1000000).cast("string").alias("device_id")
+    ).cache()
+    base.count()
+
+    native = base.select(device_id_bucket_col("device_id").alias("b"))
+    udf = base.select((F.abs(java_hash_udf("device_id")) % F.lit(DEVICE_ID_BUCKETS)).cast("int").alias("b"))
+
+    timed(native)  # warm-up (codegen)
+    t_native = timed(native)
+    t_udf = timed(udf)
+    print(f"rows={rows}")
+    print(f"nativo: {t_native:.3f}s ({rows / t_native:,.0f} filas/s)")
+    print(f"udf:    {t_udf:.3f}s ({rows / t_udf:,.0f} filas/s)")
+    print(f"speedup: {t_udf / t_native:.1f}x")
+    base.unpersist()
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--rows", type=int, default=2_000_000, help="Filas para el benchmark de throughput")
+    p.add_argument("--parity-random", type=int, default=20_000, help="Ids aleatorios extra para la paridad")
+    p.add_argument("--skip-bench", action="store_true")
+    args = p.parse_args()
+
+    spark = SparkSession.builder.appName("bench_device_bucket").getOrCreate()
+    try:
+        if check_parity(spark, args.parity_random):
+            sys.exit(1)
+        if not args.skip_bench:
+            bench(spark, args.rows)
+    finally:
+        spark.stop()
+
+
+if __name__ == "__main__":
+    main()
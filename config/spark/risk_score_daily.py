@@ -0,0 +1,287 @@
+import argparse
+from datetime import date, timedelta
+
+from pyspark.sql import SparkSession
+from pyspark.sql import functions as F
+
+SOURCE_TABLE = "nessie.telematics.telematics_real_time"
+TARGET_TABLE = "nessie.telematics.risk_score_daily"
+# Propiedad de risk_score_daily con el último snapshot de telematics_real_time procesado
+STATE_PROPERTY = "risk.last-source-snapshot-id"
+STATE_TS_PROPERTY = "risk.last-source-committed-at"
+
+# Mismos parámetros que sink_risk_score_daily.sql
+OVERSPEED_KMH = 110
+NIGHT_FROM_HOUR = 23
+NIGHT_TO_HOUR = 4
+MIN_REPORTS = 10
+
+def parse_buckets(spec):
+    """'0-7,12,30' -> [0..7, 12, 30]"""
+    if not spec:
+        return None
+    out = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            lo, hi = part.split("-", 1)
+            out.update(range(int(lo), int(hi) + 1))
+        else:
+            out.add(int(part))
+    return sorted(out)
+
+def read_devices(args):
+    devices = []
+    if args.devices:
+        devices.extend(x.strip() for x in args.devices.split(",") if x.strip())
+    if args.device_file:
+        with open(args.device_file, "r", encoding="utf-8") as f:
+            for line in f:
+                devices.extend(x.strip() for x in line.split(",") if x.strip())
+    return list(dict.fromkeys(devices)) or None
+
+def with_report_date(df):
+    """report_date y hora local de gps_epoch (spark.sql.session.timeZone = zona local, como en Flink)."""
+    return (
+        df.withColumn("report_date", F.to_date(F.col("gps_epoch")))
+          .withColumn("gps_hour_local", F.hour(F.col("gps_epoch")))
+    )
+
+def score(base):
+    """
+    Fórmula de sink_risk_score_daily.sql:
+    rs/rn = proporción de excesos de velocidad / reportes nocturnos,
+    fs = rs^1.7, fn = rn^1.3, fint = rs*rn, raw = 0.55 fs + 0.30 fn + 0.15 fint,
+    score = round(100 / (1 + e^(-12 (raw - 0.1155)))) acotado a [0, 100].
+    """
+    agg = base.groupBy("device_id", "report_date").agg(
+        F.count(F.lit(1)).alias("total_reports"),
+        F.sum(F.when(F.col("speed_kmh").cast("double") > OVERSPEED_KMH, 1).otherwise(0)).cast("bigint").alias("overspeed_reports"),
+        F.sum(
+            F.when((F.col("gps_hour_local") >= NIGHT_FROM_HOUR) | (F.col("gps_hour_local") < NIGHT_TO_HOUR), 1).otherwise(0)
+        ).cast("bigint").alias("night_reports"),
+    )
+    rs = F.col("overspeed_reports").cast("double") / F.col("total_reports").cast("double")
+    rn = F.col("night_reports").cast("double") / F.col("total_reports").cast("double")
+    risk_raw = 0.55 * F.pow(rs, 1.7) + 0.30 * F.pow(rn, 1.3) + 0.15 * (rs * rn)
+    score_raw = F.lit(100.0) / (F.lit(1.0) + F.exp(F.lit(-12.0) * (risk_raw - F.lit(0.1155))))
+    bounded = F.least(F.greatest(F.round(score_raw), F.lit(0.0)), F.lit(100.0)).cast("double")
+    enough = F.col("total_reports") >= MIN_REPORTS
+
+    return agg.select(
+        "device_id",
+        "report_date",
+        F.when(enough, bounded).alias("score"),
+        F.when(~enough, F.lit("Sin evidencia"))
+         .when(bounded <= 20, F.lit("Seguro"))
+         .when(bounded <= 60, F.lit("Menos seguro"))
+         .otherwise(F.lit("Inseguro")).alias("level"),
+        "total_reports",
+        "overspeed_reports",
+        "night_reports",
+    )
+
+def current_snapshot(spark):
+    row = spark.sql(
+        f"SELECT h.snapshot_id, s.committed_at FROM {SOURCE_TABLE}.history h "
+        f"JOIN {SOURCE_TABLE}.snapshots s ON s.snapshot_id = h.snapshot_id "
+        f"WHERE h.is_current_ancestor ORDER BY h.made_current_at DESC LIMIT 1"
+    ).first()
+    return (row.snapshot_id, row.committed_at) if row else (None, None)
+
+def stored_state(spark):
+    props = {r.key: r.value for r in spark.sql(f"SHOW TBLPROPERTIES {TARGET_TABLE}").collect()}
+    snap = props.get(STATE_PROPERTY)
+    return (int(snap) if snap else None), props.get(STATE_TS_PROPERTY)
+
+def touched_pairs(spark, jlog, start_snapshot, start_committed_at, end_snapshot):
+    """
+    (device_id, report_date, device_id_bucket, max_received_day) con filas nuevas
+    entre dos snapshots: max_received_day acota la relectura de ese día aunque
+    el reporte haya llegado después de --late-days.
+    Se leen solo los archivos agregados (appends); si el snapshot guardado ya
+    expiró, se usa received_epoch desde el commit guardado.
+    """
+    try:
+        new_rows = (
+            spark.read.format("iceberg")
+            .option("start-snapshot-id", str(start_snapshot))
+            .option("end-snapshot-id", str(end_snapshot))
+            .load(SOURCE_TABLE)
+        )
+        new_rows.select("device_id").take(1)  # fuerza la planeación del scan (valida el snapshot inicial)
+    except Exception as e:
+        if not start_committed_at:
+            raise
+        jlog.warn(f"Lectura incremental desde {start_snapshot} falló ({e}); usando received_epoch >= {start_committed_at}")
+        new_rows = (
+            spark.table(SOURCE_TABLE)
+            .where(F.col("received_day") >= F.to_date(F.lit(start_committed_at)) - F.expr("INTERVAL 1 DAY"))
+            .where(F.col("received_epoch") >= F.to_timestamp(F.lit(start_committed_at)) - F.expr("INTERVAL 1 HOUR"))
+        )
+    return (
+        with_report_date(new_rows)
+        .where(F.col("device_id").isNotNull() & F.col("report_date").isNotNull())
+        .groupBy("device_id", "report_date", "device_id_bucket")
+        .agg(F.max("received_day").alias("max_received_day"))
+    )
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--start-date", help="Primer report_date a recalcular (YYYY-MM-DD)")
+    p.add_argument("--end-date", help="Último report_date a recalcular (incluido). Default: --start-date")
+    p.add_argument("--devices", help="device_id separados por coma")
+    p.add_argument("--device-file", help="Archivo con device_id separados por coma (una o varias líneas)")
+    p.add_argument("--buckets", help="device_id_bucket a procesar, ej. '0-7,12'")
+    p.add_argument("--incremental", action="store_true",
+                   help="Recalcula solo los (device, report_date) con datos nuevos desde el último snapshot procesado")
+    p.add_argument("--late-days", type=int, default=7,
+                   help="Días de received_day posteriores a report_date donde pueden llegar reportes atrasados")
+    p.add_argument("--parallelism", type=int, default=32, help="Particiones del shuffle (agregación por device)")
+    p.add_argument("--verify", action="store_true",
+                   help="Compara contra las filas ya existentes (p.ej. del job de Flink) antes del MERGE y reporta diferencias")
+    p.add_argument("--dry-run", action="store_true", help="Calcula y reporta, sin escribir")
+    p.add_argument("--time-zone", default="America/Mexico_City")
+    p.add_argument("--nessie-uri", default="http://nessie:19120/api/v1")
+    p.add_argument("--nessie-ref", default="main")
+    p.add_argument("--warehouse", default="s3://iothub-telematics-data-stg/warehouse")
+    p.add_argument("--s3-endpoint", default="https://s3.us-west-2.amazonaws.com")
+    args = p.parse_args()
+
+    if not args.incremental and not args.start_date:
+        p.error("--start-date es requerido sin --incremental")
+
+    spark = (
+        SparkSession.builder
+        .config("spark.sql.extensions", "org.apache.iceberg.spark.extensions.IcebergSparkSessionExtensions")
+        .config("spark.sql.catalog.nessie", "org.apache.iceberg.spark.SparkCatalog")
+        .config("spark.sql.catalog.nessie.catalog-impl", "org.apache.iceberg.nessie.NessieCatalog")
+        .config("spark.sql.catalog.nessie.uri", args.nessie_uri)
+        .config("spark.sql.catalog.nessie.ref", args.nessie_ref)
+        .config("spark.sql.catalog.nessie.warehouse", args.warehouse)
+        .config("spark.sql.catalog.nessie.io-impl", "org.apache.iceberg.aws.s3.S3FileIO")
+        .config("spark.sql.catalog.nessie.s3.endpoint", args.s3_endpoint)
+        .config("spark.sql.catalog.nessie.s3.path-style-access", "true")
+        .config("spark.sql.catalog.nessie.s3.region", "us-west-2")
+        .config("spark.hadoop.fs.s3a.endpoint", args.s3_endpoint)
+        .config("spark.hadoop.fs.s3a.path.style.access", "true")
+        .config("spark.hadoop.fs.s3a.aws.credentials.provider", "org.apache.hadoop.fs.s3a.SimpleAWSCredentialsProvider")
+        .config("spark.sql.shuffle.partitions", str(args.parallelism))
+        .config("spark.sql.session.timeZone", args.time_zone)
+        .config("spark.sql.iceberg.handle-timestamp-without-timezone", "true")
+        .getOrCreate()
+    )
+    jlog = spark._jvm.org.apache.log4j.LogManager.getLogger("RiskScoreDailyJob")
+
+    devices = read_devices(args)
+    buckets = parse_buckets(args.buckets)
+    start_date = date.fromisoformat(args.start_date) if args.start_date else None
+    end_date = date.fromisoformat(args.end_date) if args.end_date else start_date
+
+    end_snapshot, end_committed_at = current_snapshot(spark)
+    pairs = None
+    # Con filtros solo se recalcula parte de lo tocado: mover la marca global
+    # dejaría atrás (para siempre) los reportes atrasados de lo no filtrado.
+    partial = buckets is not None or devices is not None
+
+    if args.incremental:
+        last_snapshot, last_committed_at = stored_state(spark)
+        if last_snapshot is None:
+            if start_date is None:
+                jlog.error(f"Sin {STATE_PROPERTY} en {TARGET_TABLE}: la primera corrida incremental requiere --start-date")
+                spark.stop()
+                return
+            jlog.warn(f"Sin snapshot previo; recalculando {start_date}..{end_date} y guardando snapshot {end_snapshot}")
+        elif last_snapshot == end_snapshot:
+            jlog.info(f"Sin snapshots nuevos desde {last_snapshot}. Nada que hacer.")
+            spark.stop()
+            return
+        else:
+            pairs = touched_pairs(spark, jlog, last_snapshot, last_committed_at, end_snapshot)
+            if start_date:
+                pairs = pairs.where(F.col("report_date").between(F.lit(start_date), F.lit(end_date)))
+                partial = True
+
+    # Filtros comunes (pushdown a las particiones device_id_bucket / received_day)
+    src = spark.read.format("iceberg").option("snapshot-id", str(end_snapshot)).load(SOURCE_TABLE) if end_snapshot else spark.table(SOURCE_TABLE)
+    if buckets is not None:
+        src = src.where(F.col("device_id_bucket").isin(buckets))
+        if pairs is not None:
+            pairs = pairs.where(F.col("device_id_bucket").isin(buckets))
+    if devices is not None:
+        src = src.where(F.col("device_id").isin(devices))
+        if pairs is not None:
+            pairs = pairs.where(F.col("device_id").isin(devices))
+
+    if pairs is not None:
+        pairs = pairs.cache()
+        bounds = pairs.agg(F.min("report_date").alias("lo"), F.max("report_date").alias("hi"),
+                           F.max("max_received_day").alias("received_hi"), F.count(F.lit(1)).alias("n")).first()
+        if bounds.n == 0:
+            jlog.info("Los snapshots nuevos no tocan (device, report_date) dentro de los filtros.")
+            lo = hi = None
+        else:
+            lo, hi = bounds.lo, bounds.hi
+            received_hi = hi + timedelta(days=args.late_days)
+            if bounds.received_hi is not None and bounds.received_hi > received_hi:
+                # Un reporte más atrasado que --late-days: releer hasta su received_day para
+                # que el día se recalcule con todas sus filas y el MERGE no baje el conteo
+                jlog.warn(f"Reportes recibidos hasta {bounds.received_hi}, después de {hi} + {args.late_days} días")
+                received_hi = bounds.received_hi
+            touched_buckets = [r.device_id_bucket for r in pairs.select("device_id_bucket").distinct().collect()]
+            src = src.where(F.col("device_id_bucket").isin(touched_buckets))
+            jlog.info(f"{bounds.n} (device, report_date) tocados entre {lo} y {hi} en {len(touched_buckets)} buckets")
+    else:
+        lo, hi = start_date, end_date
+        received_hi = hi + timedelta(days=args.late_days) if hi else None
+
+    if lo is not None:
+        base = with_report_date(
+            src.where(F.col("received_day").between(F.lit(lo - timedelta(days=1)), F.lit(received_hi)))
+        ).where(F.col("report_date").between(F.lit(lo), F.lit(hi)))
+        if pairs is not None:
+            base = base.join(F.broadcast(pairs.select("device_id", "report_date")), ["device_id", "report_date"], "left_semi")
+
+        result = score(base).cache()
+        n = result.count()
+        jlog.info(f"Filas calculadas: {n} (report_date {lo}..{hi})")
+
+        if args.verify and n:
+            current = spark.table(TARGET_TABLE).where(F.col("report_date").between(F.lit(lo), F.lit(hi)))
+            diff = (
+                result.alias("n").join(current.alias("c"), ["device_id", "report_date"])
+                .where(~F.col("n.score").eqNullSafe(F.col("c.score")) | ~F.col("n.level").eqNullSafe(F.col("c.level"))
+                       | (F.col("n.total_reports") != F.col("c.total_reports")))
+            )
+            jlog.info(f"verify: {diff.count()} filas con score/level/total distintos a los existentes")
+
+        if n and not args.dry_run:
+            result.createOrReplaceTempView("risk_score_updates")
+            spark.sql(f"""
+                MERGE INTO {TARGET_TABLE} t
+                USING risk_score_updates s
+                ON t.device_id = s.device_id AND t.report_date = s.report_date
+                WHEN MATCHED THEN UPDATE SET *
+                WHEN NOT MATCHED THEN INSERT *
+            """)
+            jlog.info(f"MERGE OK ({n} rows)")
+        result.unpersist()
+
+    if args.incremental and end_snapshot is not None and partial:
+        jlog.warn(
+            f"Corrida incremental con filtros (--buckets/--devices/--start-date): {STATE_PROPERTY} "
+            f"se queda en el snapshot anterior para que una corrida sin filtros recalcule el resto"
+        )
+    elif args.incremental and end_snapshot is not None and not args.dry_run:
+        spark.sql(
+            f"ALTER TABLE {TARGET_TABLE} SET TBLPROPERTIES "
+            f"('{STATE_PROPERTY}' = '{end_snapshot}', '{STATE_TS_PROPERTY}' = '{end_committed_at}')"
+        )
+        jlog.info(f"Snapshot procesado: {end_snapshot}")
+
+    spark.stop()
+
+if __name__ == "__main__":
+    main()
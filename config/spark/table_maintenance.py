@@ -0,0 +1,238 @@
+import argparse
+import json
+from datetime import date, timedelta
+
+from pyspark.sql import SparkSession
+from pyspark.sql import functions as F
+
+CATALOG = "nessie"
+NAMESPACE = "telematics"
+
+# Orden de reescritura y tamaño objetivo por tabla. `day_column` acota qué
+# particiones se revisan (--lookback-days / --min-age-days) si la tabla está
+# particionada por ella.
+TABLES = {
+    "telematics_real_time": {
+        "sort_order": "device_id ASC NULLS LAST, gps_epoch ASC NULLS LAST",
+        "target_file_mb": 256,
+        "day_column": "received_day",
+    },
+    "risk_score_daily": {
+        "sort_order": "device_id ASC NULLS LAST, report_date ASC NULLS LAST",
+        "target_file_mb": 128,
+        "day_column": "report_date",
+    },
+}
+
+# content en el metadata table `files`: 0 = datos, 1 = position deletes, 2 = equality deletes
+DATA, POSITION_DELETES, EQUALITY_DELETES = 0, 1, 2
+
+def sql_literal(value):
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, date):
+        return f"DATE '{value.isoformat()}'"
+    return "'" + str(value).replace("'", "''") + "'"
+
+def partition_fields(spark, table):
+    """Columnas del struct `partition` del metadata table (vacío si la tabla no está particionada)."""
+    schema = spark.table(f"{table}.files").schema
+    if "partition" not in schema.fieldNames():
+        return []
+    return [f.name for f in schema["partition"].dataType.fields]
+
+def partition_stats(spark, table, fields, small_bytes, day_column=None, day_from=None, day_to=None):
+    """
+    Una fila por partición con archivos de datos (totales y pequeños) y de
+    deletes, leída de `<tabla>.files` (archivos vivos del snapshot actual).
+    """
+    files = spark.table(f"{table}.files")
+    keys = [F.col(f"partition.{f}").alias(f) for f in fields]
+    if day_column in fields:
+        if day_from is not None:
+            files = files.where(F.col(f"partition.{day_column}") >= F.lit(day_from))
+        if day_to is not None:
+            files = files.where(F.col(f"partition.{day_column}") <= F.lit(day_to))
+
+    is_data = F.col("content") == DATA
+    is_delete = F.col("content").isin(POSITION_DELETES, EQUALITY_DELETES)
+    agg = files.groupBy(*keys).agg(
+        F.sum(F.when(is_data, 1).otherwise(0)).alias("data_files"),
+        F.sum(F.when(is_data & (F.col("file_size_in_bytes") < small_bytes), 1).otherwise(0)).alias("small_files"),
+        F.sum(F.when(is_data, F.col("file_size_in_bytes")).otherwise(0)).alias("data_bytes"),
+        F.sum(F.when(is_data, F.col("record_count")).otherwise(0)).alias("records"),
+        F.sum(F.when(is_delete, 1).otherwise(0)).alias("delete_files"),
+        F.sum(F.when(is_delete, F.col("file_size_in_bytes")).otherwise(0)).alias("delete_bytes"),
+    )
+    return [r.asDict() for r in agg.collect()]
+
+def partition_key(row, fields):
+    return tuple(row[f] for f in fields)
+
+def partition_filter(keys, fields):
+    """
+    Predicado `where` de rewrite_data_files para un conjunto de particiones.
+    Con varias columnas de partición se agrupa por las demás (p.ej. el día) y
+    la primera va en un IN, para no generar un OR por partición.
+    """
+    if not fields:
+        return None
+    if len(fields) == 1:
+        values = ", ".join(sql_literal(k[0]) for k in sorted(keys))
+        return f"{fields[0]} IN ({values})"
+    groups = {}
+    for k in keys:
+        groups.setdefault(k[1:], []).append(k[0])
+    terms = []
+    for rest, firsts in sorted(groups.items()):
+        conds = [f"{fields[0]} IN ({', '.join(sql_literal(v) for v in sorted(set(firsts)))})"]
+        conds += [f"{f} = {sql_literal(v)}" if v is not None else f"{f} IS NULL" for f, v in zip(fields[1:], rest)]
+        terms.append("(" + " AND ".join(conds) + ")")
+    return " OR ".join(terms)
+
+def totals(rows):
+    keys = ("data_files", "small_files", "data_bytes", "records", "delete_files", "delete_bytes")
+    return {k: int(sum(r[k] or 0 for r in rows)) for k in keys}
+
+def fmt_totals(t):
+    return (
+        f"{t['data_files']} archivos ({t['small_files']} pequeños, {t['data_bytes'] / 1048576:.1f} MiB, {t['records']} filas), "
+        f"{t['delete_files']} delete files ({t['delete_bytes'] / 1048576:.1f} MiB)"
+    )
+
+def maintain_table(spark, jlog, name, args):
+    cfg = TABLES[name]
+    table = f"{CATALOG}.{NAMESPACE}.{name}"
+    fields = partition_fields(spark, table)
+    day_column = cfg["day_column"] if cfg["day_column"] in fields else None
+    small_bytes = args.small_file_mb * 1048576
+    today = date.today()
+    day_from = today - timedelta(days=args.lookback_days) if args.lookback_days else None
+    day_to = today - timedelta(days=args.min_age_days)
+
+    before = partition_stats(spark, table, fields, small_bytes, day_column, day_from, day_to)
+    selected = [
+        r for r in before
+        if (r["small_files"] or 0) >= args.min_small_files or (r["delete_files"] or 0) >= args.min_delete_files
+    ]
+    selected.sort(key=lambda r: (r["delete_files"] or 0, r["small_files"] or 0), reverse=True)
+    if args.max_partitions:
+        selected = selected[: args.max_partitions]
+
+    report = {
+        "table": table,
+        "partition_fields": fields,
+        "partitions_scanned": len(before),
+        "partitions_selected": len(selected),
+        "before": totals(selected),
+    }
+    jlog.info(
+        f"{table}: {len(selected)}/{len(before)} particiones sobre el umbral "
+        f"(>= {args.min_small_files} archivos < {args.small_file_mb} MiB o >= {args.min_delete_files} delete files)"
+    )
+    for r in selected[: args.log_partitions]:
+        jlog.info(f"  {partition_key(r, fields)}: {r['data_files']} archivos, {r['small_files']} pequeños, {r['delete_files']} deletes")
+
+    if not selected or args.dry_run:
+        return report
+
+    where = partition_filter([partition_key(r, fields) for r in selected], fields)
+    options = {
+        "target-file-size-bytes": str(cfg["target_file_mb"] * 1048576),
+        "min-input-files": "2",
+        "delete-file-threshold": str(args.min_delete_files),
+        "max-concurrent-file-group-rewrites": str(args.concurrency),
+        "partial-progress.enabled": "true",
+        "partial-progress.max-commits": str(args.max_commits),
+    }
+    opts_sql = ", ".join(f"{sql_literal(k)}, {sql_literal(v)}" for k, v in options.items())
+    call = (
+        f"CALL {CATALOG}.system.rewrite_data_files("
+        f"table => '{NAMESPACE}.{name}', strategy => 'sort', sort_order => '{cfg['sort_order']}', "
+        f"options => map({opts_sql})"
+        + (f", where => {sql_literal(where)}" if where else "")
+        + ")"
+    )
+    result = spark.sql(call).first().asDict()
+    report["rewrite"] = {k: int(v) for k, v in result.items() if v is not None}
+    jlog.info(f"{table}: rewrite_data_files -> {result}")
+
+    spark.sql(f"REFRESH TABLE {table}")
+    after_by_key = {partition_key(r, fields): r for r in partition_stats(spark, table, fields, small_bytes, day_column, day_from, day_to)}
+    after = [after_by_key[partition_key(r, fields)] for r in selected if partition_key(r, fields) in after_by_key]
+    report["after"] = totals(after)
+    jlog.info(f"{table} antes:   {fmt_totals(report['before'])}")
+    jlog.info(f"{table} después: {fmt_totals(report['after'])}")
+    return report
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--tables", default=",".join(TABLES), help=f"Tablas separadas por coma ({', '.join(TABLES)})")
+    p.add_argument("--small-file-mb", type=int, default=32, help="Archivos de datos por debajo de este tamaño cuentan como pequeños")
+    p.add_argument("--min-small-files", type=int, default=8, help="Compactar particiones con al menos N archivos pequeños")
+    p.add_argument("--min-delete-files", type=int, default=1, help="Compactar particiones con al menos N delete files")
+    p.add_argument("--lookback-days", type=int, default=30, help="Solo particiones de los últimos N días (0 = todas)")
+    p.add_argument("--min-age-days", type=int, default=1,
+                   help="Omitir particiones de los últimos N días (el sink de Flink sigue escribiendo en el día actual)")
+    p.add_argument("--max-partitions", type=int, default=0, help="Máximo de particiones por tabla y corrida (0 = sin límite)")
+    p.add_argument("--concurrency", type=int, default=4, help="Grupos de archivos reescritos en paralelo (max-concurrent-file-group-rewrites)")
+    p.add_argument("--max-commits", type=int, default=10, help="Commits parciales por tabla (partial-progress)")
+    p.add_argument("--log-partitions", type=int, default=20, help="Particiones candidatas a listar en el log")
+    p.add_argument("--report", help="Archivo JSON con el reporte antes/después")
+    p.add_argument("--dry-run", action="store_true", help="Solo reporta las particiones candidatas")
+    p.add_argument("--nessie-uri", default="http://nessie:19120/api/v1")
+    p.add_argument("--nessie-ref", default="main")
+    p.add_argument("--warehouse", default="s3://iothub-telematics-data-stg/warehouse")
+    p.add_argument("--s3-endpoint", default="https://s3.us-west-2.amazonaws.com")
+    args = p.parse_args()
+
+    names = [t.strip() for t in args.tables.split(",") if t.strip()]
+    unknown = [t for t in names if t not in TABLES]
+    if unknown:
+        p.error(f"Tablas sin configuración de mantenimiento: {unknown}")
+
+    spark = (
+        SparkSession.builder
+        .config("spark.sql.extensions", "org.apache.iceberg.spark.extensions.IcebergSparkSessionExtensions")
+        .config("spark.sql.catalog.nessie", "org.apache.iceberg.spark.SparkCatalog")
+        .config("spark.sql.catalog.nessie.catalog-impl", "org.apache.iceberg.nessie.NessieCatalog")
+        .config("spark.sql.catalog.nessie.uri", args.nessie_uri)
+        .config("spark.sql.catalog.nessie.ref", args.nessie_ref)
+        .config("spark.sql.catalog.nessie.warehouse", args.warehouse)
+        .config("spark.sql.catalog.nessie.io-impl", "org.apache.iceberg.aws.s3.S3FileIO")
+        .config("spark.sql.catalog.nessie.s3.endpoint", args.s3_endpoint)
+        .config("spark.sql.catalog.nessie.s3.path-style-access", "true")
+        .config("spark.sql.catalog.nessie.s3.region", "us-west-2")
+        .config("spark.hadoop.fs.s3a.endpoint", args.s3_endpoint)
+        .config("spark.hadoop.fs.s3a.path.style.access", "true")
+        .config("spark.hadoop.fs.s3a.aws.credentials.provider", "org.apache.hadoop.fs.s3a.SimpleAWSCredentialsProvider")
+        .config("spark.sql.iceberg.handle-timestamp-without-timezone", "true")
+        .getOrCreate()
+    )
+    jlog = spark._jvm.org.apache.log4j.LogManager.getLogger("TableMaintenanceJob")
+
+    reports = []
+    failed = 0
+    for name in names:
+        try:
+            reports.append(maintain_table(spark, jlog, name, args))
+        except Exception as e:
+            # Log y continuar con la siguiente tabla
+            failed += 1
+            jlog.error(f"{name}: error en el mantenimiento: {str(e)}", e)
+            reports.append({"table": name, "error": str(e)})
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2, default=str)
+    jlog.info(f"MANTENIMIENTO TERMINADO. Tablas: {len(names)} ({failed} con error)")
+    spark.stop()
+    if failed:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
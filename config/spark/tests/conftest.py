@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Los jobs se lanzan como archivos sueltos con spark-submit; se importan igual
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,79 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("pyspark")
+
+from backfill_telematics import (  # noqa: E402
+    chunk_key, chunk_units, layout_id, load_manifest, plan_chunks, run_layout, time_windows,
+)
+
+LINES = ["1,2", "3", "", "4,5", "6", "7"]
+LINE_DEVICES = {n: [d for d in line.split(",") if d] for n, line in enumerate(LINES, start=1)}
+
+
+def args(**kw):
+    base = dict(start_ts="2025-01-01 00:00:00", end_ts="2025-01-15 00:00:00", chunk_days=7, report_types="STATUS,ALERT")
+    return SimpleNamespace(**{**base, **kw})
+
+
+def done_from(chunks, run):
+    units = set()
+    for first, last, _, window in chunks:
+        units |= chunk_units(chunk_key(run, first, last, window), run)
+    return units
+
+
+def test_time_windows():
+    assert time_windows("2025-01-01 00:00:00", "2025-01-15 00:00:00", 7) == [
+        ("2025-01-01 00:00:00", "2025-01-08 00:00:00"),
+        ("2025-01-08 00:00:00", "2025-01-15 00:00:00"),
+    ]
+
+
+def test_resume_with_other_batching_skips_everything():
+    a = args()
+    run = layout_id(run_layout(a, LINES))
+    windows = time_windows(a.start_ts, a.end_ts, a.chunk_days)
+    first_run, total, _ = plan_chunks(LINE_DEVICES, 1, len(LINES), 3, windows, set())
+    assert total == 10  # 5 líneas con devices × 2 ventanas
+    for lines_per_batch in (1, 2, 4, 6):
+        chunks, _, skipped = plan_chunks(LINE_DEVICES, 1, len(LINES), lines_per_batch, windows, done_from(first_run, run))
+        assert chunks == [] and skipped == 10
+
+
+def test_partial_resume_processes_each_pending_line_once():
+    a = args()
+    run = layout_id(run_layout(a, LINES))
+    windows = time_windows(a.start_ts, a.end_ts, a.chunk_days)
+    # Primera corrida cortada: solo las líneas 2-4 de la primera ventana
+    done = chunk_units(chunk_key(run, 2, 4, windows[0]), run)
+    chunks, _, skipped = plan_chunks(LINE_DEVICES, 1, len(LINES), 6, windows, done)
+    covered = [(line, w) for first, last, _, w in chunks for line in range(first, last + 1) if LINE_DEVICES[line]]
+    assert len(covered) == len(set(covered)) == 10 - skipped
+    assert not set(covered) & done
+    assert sorted(d for c in chunks if c[3] == windows[0] for d in c[2]) == ["1", "2", "6", "7"]
+
+
+def test_layout_changes_with_window_and_device_file():
+    base = run_layout(args(), LINES)
+    assert run_layout(args(chunk_days=3), LINES) != base
+    assert run_layout(args(), LINES[:-1]) != base
+    assert run_layout(args(report_types="ALERT, STATUS"), LINES) == base
+
+
+def test_chunks_of_other_runs_are_ignored():
+    assert chunk_units(chunk_key("other", 1, 2, ("a", "b")), "mine") == set()
+    assert chunk_units("lines=1-2;received=a..b", "mine") == set()  # formato anterior
+
+
+def test_load_manifest(tmp_path):
+    path = tmp_path / "m.jsonl"
+    layout = run_layout(args(), LINES)
+    path.write_text(
+        json.dumps({"layout": layout, "run": layout_id(layout)}) + "\n" + json.dumps({"chunk": "k1", "rows": 3}) + "\n"
+    )
+    saved, done = load_manifest(str(path))
+    assert saved == layout and list(done) == ["k1"]
+    assert load_manifest(str(tmp_path / "missing.jsonl")) == (None, {})
@@ -0,0 +1,51 @@
+import os
+import shutil
+
+import pytest
+
+pytest.importorskip("pyspark")
+
+from backfill_telematics import DEVICE_ID_BUCKETS, device_id_bucket_col, java_hashcode  # noqa: E402
+from bench_device_bucket import parity_corpus, reference_bucket  # noqa: E402
+
+# Valores de String.hashCode() en Java
+JAVA_HASHCODES = {
+    "": 0,
+    "a": 97,
+    "hello": 99162322,
+    "Aa": 2112,
+    "BB": 2112,
+    "polygenelubricants": -2147483648,  # Integer.MIN_VALUE
+    "\U0001F600": 1772899,  # "😀": dos unidades UTF-16
+}
+
+
+@pytest.mark.parametrize("s,expected", sorted(JAVA_HASHCODES.items()))
+def test_java_hashcode_matches_java(s, expected):
+    assert java_hashcode(s) == expected
+
+
+def test_java_hashcode_none():
+    assert java_hashcode(None) is None
+
+
+@pytest.fixture(scope="module")
+def spark():
+    from pyspark.sql import SparkSession
+
+    if not (os.environ.get("JAVA_HOME") or shutil.which("java")):
+        pytest.skip("SparkSession local requiere Java")
+
+    session = SparkSession.builder.master("local[1]").appName("test_device_bucket").getOrCreate()
+    yield session
+    session.stop()
+
+
+def test_native_bucket_matches_reference(spark):
+    ids = parity_corpus(2000) + list(JAVA_HASHCODES)
+    assert any(s and any(ord(ch) > 0xFFFF for ch in s) for s in ids)
+    df = spark.createDataFrame([(s,) for s in ids], "device_id string")
+    rows = df.select("device_id", device_id_bucket_col("device_id").alias("b")).collect()
+    mismatches = [(r.device_id, r.b, reference_bucket(r.device_id)) for r in rows if r.b != reference_bucket(r.device_id)]
+    assert not mismatches
+    assert all(r.b is None or 0 <= r.b < DEVICE_ID_BUCKETS for r in rows)
@@ -8,13 +8,23 @@ echo "[INFO] Ejecutando Batch Riesgo (Iceberg)..."
 docker exec -i jobmanager bash -lc \
   "bin/sql-client.sh -i /opt/sql/create.sql -f /opt/sql/sink_risk_score_daily.sql"
 
-# 2) Batch Cleanup RAW And DLQ
+# 2) Compactación por partición (telematics_real_time / risk_score_daily) según metadata de archivos
+echo "[INFO] Ejecutando compactación de particiones con archivos pequeños..."
+docker exec -i spark bash -lc \
+  "/opt/spark/bin/spark-submit \
+    --jars /opt/jars/iceberg-spark-runtime-3.5_2.13-1.9.2.jar,/opt/jars/iceberg-aws-bundle-1.9.2.jar \
+    /opt/jobs/table_maintenance.py --concurrency 4" \
+  || echo "[WARN] Compactación con errores; se continúa con el cleanup"
+
+# 3) Batch Cleanup RAW And DLQ
 echo "[INFO] Ejecutando Cleanup RAW & DLQ..."
 docker exec -e TRINO_PASSWORD='' -i iothub-stack-trino-1 bash -lc \
 'trino \
   --server https://localhost:8080 \
   --insecure \
   --user cleanup \
+  --source batch-jobs \
+  --client-tags batch \
   --password \
   --catalog nessie \
   --schema telematics \
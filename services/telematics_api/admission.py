@@ -0,0 +1,242 @@
+import asyncio
+import hashlib
+import heapq
+import itertools
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, List, Literal, Optional, Tuple
+
+from trino_async import QueryQueueTimeout
+
+# Prioridad de la cola de admisión (menor = antes) y tag hacia Trino
+Priority = Literal["high", "normal", "low"]
+PRIORITY_ORDER: Dict[str, int] = {"high": 0, "normal": 1, "low": 2}
+
+
+class AdmissionRejected(Exception):
+    """Query rechazada sin esperar (cola llena): el cliente debe reintentar más tarde."""
+
+    def __init__(self, message: str, retry_after_s: int = 1):
+        super().__init__(message)
+        self.retry_after_s = retry_after_s
+
+
+@dataclass
+class ClientPolicy:
+    """Política por token. `name` es la etiqueta para tags/métricas (nunca el token)."""
+    name: str
+    priority: Priority = "normal"
+    max_concurrency: Optional[int] = None  # None = límite por token por defecto
+
+
+@dataclass
+class RequestBudget:
+    """Estado de admisión del request en curso (cliente, prioridad efectiva, costo)."""
+    client: ClientPolicy
+    priority: Priority
+    cost: Optional[float] = None
+    downgraded: bool = False
+
+    @property
+    def tags(self) -> List[str]:
+        tags = ["api", f"client:{self.client.name}", f"priority:{self.priority}"]
+        if self.downgraded:
+            tags.append("downgraded")
+        return tags
+
+
+# Lo fija require_token y lo heredan las tasks del request (run_cancellable, streaming),
+# igual que metrics.ENDPOINT.
+CURRENT: ContextVar[Optional[RequestBudget]] = ContextVar("admission_budget", default=None)
+
+# Queries sin token (p.ej. /health)
+INTERNAL = ClientPolicy("internal", "normal")
+
+
+def client_label(token: str) -> str:
+    return "c" + hashlib.sha256(token.encode("utf-8")).hexdigest()[:8]
+
+
+def parse_policies(text: str) -> Dict[str, ClientPolicy]:
+    """
+    `token=name:priority[:max_concurrent]` separados por comas, p.ej.
+    `token1=mobile:high:4,token2=bi:low:2`.
+    """
+    policies: Dict[str, ClientPolicy] = {}
+    for item in text.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        token, _, spec = item.partition("=")
+        parts = [p.strip() for p in spec.split(":")]
+        name = parts[0] if parts and parts[0] else client_label(token.strip())
+        priority = parts[1] if len(parts) > 1 and parts[1] else "normal"
+        if priority not in PRIORITY_ORDER:
+            raise ValueError(f"invalid priority {priority!r} for client {name!r}")
+        max_concurrency = int(parts[2]) if len(parts) > 2 and parts[2] else None
+        policies[token.strip()] = ClientPolicy(name, priority, max_concurrency)  # type: ignore[arg-type]
+    return policies
+
+
+def estimate_cost(days: int, devices: int, rows: int, weight: float = 1.0) -> float:
+    """
+    Costo previo a ejecutar: días × devices × filas pedidas (× peso de la tabla).
+    No pretende ser exacto, solo ordenar requests baratos vs caros antes de
+    mandarlos a Trino.
+    """
+    return max(days, 1) * max(devices, 1) * max(rows, 1) * weight
+
+
+@dataclass
+class Lease:
+    """Slot concedido a una query; se devuelve con `release`."""
+    client: str
+    priority: Priority
+    tags: List[str]
+    waited_s: float = 0.0
+
+
+@dataclass
+class _Waiter:
+    client: str
+    limit: Optional[int]
+    future: "asyncio.Future[None]"
+    abandoned: bool = False
+
+
+class AdmissionController:
+    """
+    Slots de ejecución de Trino por proceso con límite global y por cliente.
+
+    - Si hay slot global y el cliente está bajo su límite, la query entra sin esperar.
+    - Si no, espera en una cola acotada (`max_queue`, `max_queue_per_client`)
+      ordenada por prioridad y luego por llegada; al liberarse un slot entra el
+      primer waiter cuyo cliente tenga cupo.
+    - Cola llena → `AdmissionRejected` (429); espera mayor a `timeout_s` →
+      `QueryQueueTimeout` (503), como el semáforo anterior.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        per_client: int,
+        max_queue: int = 64,
+        max_queue_per_client: int = 16,
+        timeout_s: float = 30.0,
+    ):
+        self.max_concurrency = max_concurrency
+        self.per_client = per_client
+        self.max_queue = max_queue
+        self.max_queue_per_client = max_queue_per_client
+        self.timeout_s = timeout_s
+        self._running: Dict[str, int] = {}
+        self._queued: Dict[str, int] = {}
+        self._heap: List[Tuple[int, int, _Waiter]] = []
+        self._seq = itertools.count()
+        self._in_use = 0
+        self._waiting = 0
+
+        # Métricas
+        self._admitted = 0
+        self._rejected = 0
+        self._timeouts = 0
+        self._wait_total_s = 0.0
+        self._wait_max_s = 0.0
+
+    def _limit(self, budget: RequestBudget) -> Optional[int]:
+        if budget.client is INTERNAL:
+            return None
+        return budget.client.max_concurrency or self.per_client
+
+    def _has_room(self, client: str, limit: Optional[int]) -> bool:
+        return self._in_use < self.max_concurrency and (limit is None or self._running.get(client, 0) < limit)
+
+    def _grant(self, client: str) -> None:
+        self._in_use += 1
+        self._running[client] = self._running.get(client, 0) + 1
+
+    def _dispatch(self) -> None:
+        held: List[Tuple[int, int, _Waiter]] = []
+        while self._heap and self._in_use < self.max_concurrency:
+            entry = heapq.heappop(self._heap)
+            w = entry[2]
+            if w.abandoned:
+                continue
+            if self._has_room(w.client, w.limit):
+                self._grant(w.client)
+                w.future.set_result(None)
+            else:
+                held.append(entry)
+        for entry in held:
+            heapq.heappush(self._heap, entry)
+
+    async def acquire(self) -> Lease:
+        budget = CURRENT.get() or RequestBudget(INTERNAL, INTERNAL.priority)
+        client, limit = budget.client.name, self._limit(budget)
+        lease = Lease(client, budget.priority, budget.tags)
+
+        if self._has_room(client, limit) and not self._heap:
+            self._grant(client)
+            self._admitted += 1
+            return lease
+        if self._waiting >= self.max_queue:
+            self._rejected += 1
+            raise AdmissionRejected(f"admission queue full ({self._waiting} waiting)")
+        if limit is not None and self._queued.get(client, 0) >= self.max_queue_per_client:
+            self._rejected += 1
+            raise AdmissionRejected(f"too many queued queries for client {client}")
+
+        t0 = time.monotonic()
+        waiter = _Waiter(client, limit, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._heap, (PRIORITY_ORDER[budget.priority], next(self._seq), waiter))
+        self._waiting += 1
+        self._queued[client] = self._queued.get(client, 0) + 1
+        # Puede haber cupo aunque haya cola (waiters de clientes en su límite)
+        self._dispatch()
+        try:
+            await asyncio.wait({waiter.future}, timeout=self.timeout_s)
+        except BaseException:
+            # Cancelado (cliente desconectado): si el slot llegó a concederse, se devuelve
+            waiter.abandoned = True
+            if waiter.future.done():
+                self.release(lease)
+            raise
+        finally:
+            self._waiting -= 1
+            self._queued[client] -= 1
+            if not self._queued[client]:
+                del self._queued[client]
+
+        if not waiter.future.done():
+            waiter.abandoned = True
+            self._timeouts += 1
+            raise QueryQueueTimeout(f"trino query slots exhausted ({self._in_use}/{self.max_concurrency} in use)")
+        lease.waited_s = time.monotonic() - t0
+        self._admitted += 1
+        self._wait_total_s += lease.waited_s
+        self._wait_max_s = max(self._wait_max_s, lease.waited_s)
+        return lease
+
+    def release(self, lease: Lease) -> None:
+        self._in_use -= 1
+        n = self._running.get(lease.client, 0) - 1
+        if n > 0:
+            self._running[lease.client] = n
+        else:
+            self._running.pop(lease.client, None)
+        self._dispatch()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "per_client": self.per_client,
+            "in_use": self._in_use,
+            "waiting": self._waiting,
+            "running_by_client": dict(self._running),
+            "admitted": self._admitted,
+            "rejected": self._rejected,
+            "timeouts": self._timeouts,
+            "wait_avg_ms": round(1000 * self._wait_total_s / self._admitted, 3) if self._admitted else 0.0,
+            "wait_max_ms": round(1000 * self._wait_max_s, 3),
+        }
@@ -0,0 +1,106 @@
+"""
+Micro-benchmark: formateo de timestamps por valor (format_local_offset) vs por
+columna (LocalOffsetFormatter). Verifica primero que ambos caminos den
+exactamente el mismo texto.
+
+    python bench/bench_timestamps.py --rows 10000 --repeat 15
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+
+def corpus(n: int, seed: int = 7):
+    """Valores como los entrega AsyncTrino (UTC), más casos borde."""
+    rnd = random.Random(seed)
+    base = datetime(2015, 1, 1, tzinfo=timezone.utc)
+    span = int((datetime(2026, 1, 1, tzinfo=timezone.utc) - base).total_seconds())
+    values = [base + timedelta(seconds=rnd.randrange(span), microseconds=rnd.randrange(1_000_000)) for _ in range(n)]
+
+    # Alrededor de cada cambio de horario (DST hasta 2022 en America/Mexico_City)
+    for t in getattr(main.LOCAL_TZ, "_utc_transition_times", [])[1:]:
+        if t.year >= 1970:
+            for d in (-1, 0, 1):
+                values.append(t.replace(tzinfo=timezone.utc) + timedelta(seconds=d, microseconds=999))
+
+    # Otras zonas, naive, strings y nulos (camino de fallback)
+    ny = pytz.timezone("America/New_York")
+    values += [
+        ny.localize(datetime(2024, 3, 10, 3, 30)),
+        datetime(2024, 6, 1, 12, 0, 0, 123456, tzinfo=timezone(timedelta(hours=5, minutes=30))),
+        datetime(2024, 6, 1, 12, 0, 0),
+        "2024-06-01 12:00:00.5",
+        None,
+    ]
+    return values
+
+
+def timed(fn) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def bench_pair(old, new, repeat: int):
+    """
+    Corre ambos caminos alternados y devuelve (mejor old, mejor new, mediana de
+    old/new por par): la mediana de pares se mueve poco con el ruido de una
+    máquina compartida, a diferencia del cociente de los mejores tiempos.
+    """
+    t_old, t_new = [], []
+    for _ in range(repeat):
+        t_old.append(timed(old))
+        t_new.append(timed(new))
+    ratio = statistics.median(o / n for o, n in zip(t_old, t_new))
+    return min(t_old), min(t_new), ratio
+
+
+def run(rows: int, repeat: int) -> int:
+    values = corpus(rows)
+
+    scalar = [main.format_local_offset(v) for v in values]
+    column = main.TS_FORMATTER.format_column(values)
+    mismatches = [(v, a, b) for v, a, b in zip(values, scalar, column) if a != b]
+    if mismatches:
+        for v, a, b in mismatches[:10]:
+            print(f"MISMATCH {v!r}: {a!r} != {b!r}")
+        return 1
+    print(f"parity OK ({len(values)} values)")
+
+    # Página típica: 3 columnas de timestamp
+    page = [[values[i], values[(i + 1) % rows], values[(i + 2) % rows]] for i in range(rows)]
+    cols = ["gps_epoch", "received_epoch", "decoded_epoch"]
+
+    def per_value():
+        out = []
+        for r in page:
+            out.append({c: (main.format_local_offset(v) if v is not None else None) for c, v in zip(cols, r)})
+        return out
+
+    def per_column():
+        return main.postprocess_rows(cols, page)
+
+    t_old, t_new, ratio = bench_pair(per_value, per_column, repeat)
+    print(f"rows={rows} x {len(cols)} cols, best of {repeat} (alternados)")
+    print(f"  format_local_offset : {t_old * 1000:8.1f} ms  ({rows * len(cols) / t_old:,.0f} values/s)")
+    print(f"  LocalOffsetFormatter: {t_new * 1000:8.1f} ms  ({rows * len(cols) / t_new:,.0f} values/s)")
+    print(f"  speedup             : {ratio:8.1f}x (mediana por par; {t_old / t_new:.1f}x entre mejores tiempos)")
+    return 0
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--rows", type=int, default=10000)
+    p.add_argument("--repeat", type=int, default=15)
+    args = p.parse_args()
+    sys.exit(run(args.rows, args.repeat))
@@ -0,0 +1,255 @@
+"""
+Datos sintéticos con el esquema de `telematics_real_time` y `risk_score_daily`
+(config/flink/create.sql), en el formato JSON en que Trino los entrega por
+`/v1/statement` (timestamps como texto con zona, decimales como números).
+
+Determinista: mismo seed, device y día -> mismas filas.
+
+    python bench/datagen.py telematics --device 1440086780 --day 2025-09-25 --rows 5
+    python bench/datagen.py risk --rows 5
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import zlib
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from geo import geo_cell  # noqa: E402  (misma fórmula que Flink y el backfill)
+
+# Tipos Trino por columna (lo que anuncia `columns` en la respuesta)
+TELEMATICS_TYPES: Dict[str, str] = {
+    "report_type": "varchar",
+    "tenant": "varchar",
+    "provider": "varchar",
+    "model": "varchar",
+    "firmware": "varchar",
+    "device_id": "varchar",
+    "alert_type": "varchar",
+    "latitude": "double",
+    "longitude": "double",
+    "gps_fixed": "boolean",
+    "gps_epoch": "timestamp(6) with time zone",
+    "satellites": "bigint",
+    "speed_kmh": "double",
+    "heading": "varchar",
+    "odometer_meters": "bigint",
+    "engine_on": "boolean",
+    "vehicle_battery_voltage": "double",
+    "backup_battery_voltage": "double",
+    "received_epoch": "timestamp(6) with time zone",
+    "decoded_epoch": "timestamp(6) with time zone",
+    "correlation_id": "varchar",
+    "device_id_bucket": "integer",
+    "received_day": "date",
+    "geo_cell": "bigint",
+}
+
+RISK_TYPES: Dict[str, str] = {
+    "device_id": "varchar",
+    "report_date": "date",
+    "score": "double",
+    "level": "varchar",
+    "total_reports": "bigint",
+    "overspeed_reports": "bigint",
+    "night_reports": "bigint",
+}
+
+LAST_STATE_TYPES: Dict[str, str] = {
+    c: TELEMATICS_TYPES[c] for c in (
+        "device_id", "device_id_bucket", "report_type", "tenant", "provider", "model", "alert_type",
+        "latitude", "longitude", "gps_fixed", "gps_epoch", "speed_kmh", "heading",
+        "odometer_meters", "engine_on", "received_epoch", "correlation_id",
+    )
+}
+
+SCHEMAS = {
+    "telematics_real_time": TELEMATICS_TYPES,
+    "risk_score_daily": RISK_TYPES,
+    "device_last_state": LAST_STATE_TYPES,
+}
+
+PROVIDERS = [("queclink", "GV300", "R12"), ("suntech", "ST4315", "3.1.7"), ("maxtrack", "MXT-140", "1.4")]
+ALERTS = ["PANIC", "OVERSPEED", "IGNITION_ON", "IGNITION_OFF", "LOW_BATTERY"]
+HEADINGS = ["N", "NE", "E", "SE", "S", "SW", "W", "NW"]
+LOCAL_OFFSET = timedelta(hours=-6)  # America/Mexico_City (sin DST desde 2022)
+
+
+def java_hashcode(s: str) -> int:
+    # Unidades UTF-16, como Java: un carácter fuera del BMP cuenta como dos
+    units = s.encode("utf-16-le", "surrogatepass")
+    h = 0
+    for i in range(0, len(units), 2):
+        h = (31 * h + int.from_bytes(units[i:i + 2], "little")) & 0xFFFFFFFF
+    return h - 0x100000000 if h & 0x80000000 else h
+
+
+def device_ids(n: int, seed: int = 1) -> List[str]:
+    rnd = random.Random(seed)
+    return [str(rnd.randint(1_400_000_000, 1_599_999_999)) for _ in range(n)]
+
+
+def trino_ts(dt: datetime) -> str:
+    return dt.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f") + " UTC"
+
+
+def _rng(*parts: Any) -> random.Random:
+    return random.Random(zlib.crc32("|".join(map(str, parts)).encode("utf-8")))
+
+
+# Radio del recorrido diario alrededor de su centro (más el ruido gaussiano)
+TRACK_RADIUS = 0.05
+TRACK_MARGIN = 1e-3
+
+
+def _track(device_id: str, day: date, seed: int) -> Tuple[random.Random, Tuple[str, str, str], float, float]:
+    rnd = _rng(seed, device_id, day)
+    provider = PROVIDERS[rnd.randrange(len(PROVIDERS))]
+    lat0 = 19.2 + rnd.random() * 0.5
+    lon0 = -99.3 + rnd.random() * 0.5
+    return rnd, provider, lat0, lon0
+
+
+def track_bounds(device_id: str, day: date, seed: int = 1) -> Tuple[float, float, float, float]:
+    """
+    (min_lon, min_lat, max_lon, max_lat) que contiene todas las filas del día
+    de un device, sin generarlas: el equivalente al min/max de un archivo.
+    """
+    _, _, lat0, lon0 = _track(device_id, day, seed)
+    r = TRACK_RADIUS + TRACK_MARGIN
+    return lon0 - r, lat0 - r, lon0 + r, lat0 + r
+
+
+def telematics_rows(
+    device_id: str,
+    day: date,
+    day_rows: int,
+    start: int = 0,
+    n: Optional[int] = None,
+    seed: int = 1,
+    descending: bool = True,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Filas [start, start+n) de las `day_rows` de un día de un device, repartidas
+    en 24h con un recorrido continuo (lat/lon/velocidad suaves) y ~1% de ALERT.
+    El orden por defecto es gps_epoch DESC, como lo piden los endpoints.
+    """
+    rnd, (provider, model, firmware), lat0, lon0 = _track(device_id, day, seed)
+    tenant = f"tenant-{rnd.randrange(20):02d}"
+    bucket = abs(java_hashcode(device_id)) % 32
+    day_start = datetime(day.year, day.month, day.day, tzinfo=timezone.utc) - LOCAL_OFFSET
+    total = max(day_rows, 1)
+    step = 86400.0 / total
+    end = total if n is None else min(total, start + n)
+
+    for k in range(start, end):
+        i = total - 1 - k if descending else k
+        r = _rng(seed, device_id, day, i)
+        gps = day_start + timedelta(seconds=i * step)
+        phase = i / total * 2 * math.pi
+        speed = max(0.0, 55 + 45 * math.sin(phase * 3) + r.gauss(0, 12))
+        alert = r.random() < 0.01
+        received = gps + timedelta(seconds=r.uniform(0.5, 20))
+        lat = round(lat0 + TRACK_RADIUS * math.sin(phase) + r.gauss(0, 1e-5), 6)
+        lon = round(lon0 + TRACK_RADIUS * math.cos(phase) + r.gauss(0, 1e-5), 6)
+        yield {
+            "report_type": "ALERT" if alert else "STATUS",
+            "tenant": tenant,
+            "provider": provider,
+            "model": model,
+            "firmware": firmware,
+            "device_id": device_id,
+            "alert_type": ALERTS[r.randrange(len(ALERTS))] if alert else None,
+            "latitude": lat,
+            "longitude": lon,
+            "gps_fixed": r.random() > 0.02,
+            "gps_epoch": trino_ts(gps),
+            "satellites": r.randint(4, 14),
+            "speed_kmh": round(speed, 1),
+            "heading": HEADINGS[r.randrange(len(HEADINGS))],
+            "odometer_meters": 10_000_000 + i * 25,
+            "engine_on": speed > 1,
+            "vehicle_battery_voltage": round(r.uniform(12.1, 14.4), 2),
+            "backup_battery_voltage": round(r.uniform(3.7, 4.2), 2),
+            "received_epoch": trino_ts(received),
+            "decoded_epoch": trino_ts(received + timedelta(milliseconds=r.randint(5, 400))),
+            "correlation_id": f"{device_id}-{i:08d}",
+            "device_id_bucket": bucket,
+            "received_day": (received + LOCAL_OFFSET).date().isoformat(),
+            "geo_cell": geo_cell(lat, lon),
+        }
+
+
+def risk_rows(
+    devices: List[str],
+    start_day: date,
+    end_day: date,
+    n: int,
+    offset: int = 0,
+    seed: int = 1,
+) -> Iterator[Dict[str, Any]]:
+    """Filas en orden device_id, report_date DESC (el orden del endpoint)."""
+    days = (end_day - start_day).days + 1
+    emitted = 0
+    k = 0
+    for device_id in sorted(devices):
+        for d in range(days - 1, -1, -1):
+            if k < offset:
+                k += 1
+                continue
+            if emitted >= n:
+                return
+            day = start_day + timedelta(days=d)
+            r = _rng(seed, "risk", device_id, day)
+            total = r.randint(0, 2000)
+            over = int(total * r.random() * 0.2)
+            night = int(total * r.random() * 0.3)
+            if total < 10:
+                score, level = None, "Sin evidencia"
+            else:
+                rs, rn = over / total, night / total
+                raw = 0.55 * rs ** 1.7 + 0.30 * rn ** 1.3 + 0.15 * rs * rn
+                score = float(min(max(round(100 / (1 + math.exp(-12 * (raw - 0.1155)))), 0), 100))
+                level = "Seguro" if score <= 20 else ("Menos seguro" if score <= 60 else "Inseguro")
+            yield {
+                "device_id": device_id,
+                "report_date": day.isoformat(),
+                "score": score,
+                "level": level,
+                "total_reports": total,
+                "overspeed_reports": over,
+                "night_reports": night,
+            }
+            emitted += 1
+            k += 1
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("table", choices=["telematics", "risk"])
+    p.add_argument("--device", default=None)
+    p.add_argument("--devices", type=int, default=10)
+    p.add_argument("--day", default="2025-09-25")
+    p.add_argument("--days", type=int, default=30)
+    p.add_argument("--rows", type=int, default=10)
+    p.add_argument("--seed", type=int, default=1)
+    args = p.parse_args(argv)
+
+    day = date.fromisoformat(args.day)
+    if args.table == "telematics":
+        device = args.device or device_ids(1, args.seed)[0]
+        rows = telematics_rows(device, day, args.rows, seed=args.seed)
+    else:
+        devs = [args.device] if args.device else device_ids(args.devices, args.seed)
+        rows = risk_rows(devs, day - timedelta(days=args.days - 1), day, args.rows, seed=args.seed)
+    for row in rows:
+        print(json.dumps(row, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
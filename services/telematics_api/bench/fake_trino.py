@@ -0,0 +1,379 @@
+"""
+Servidor HTTP que imita el protocolo REST de Trino (`POST /v1/statement` +
+`nextUri` + `DELETE`) con datos de bench/datagen.py, para medir la API sin
+un cluster.
+
+No ejecuta SQL: reconoce la tabla, la proyección exterior, el device/ventana
+de los parámetros (`EXECUTE IMMEDIATE ... USING` o `EXECUTE <nombre> USING`
+con el header `X-Trino-Prepared-Statement`) y el OFFSET/FETCH, y genera
+filas con ese esquema. Las consultas por área (`geo_cell BETWEEN ? AND ?`)
+descartan cada device/día cuyo min/max de geo_cell no cruza los rangos,
+como Iceberg con los archivos, y filtran el resto por el bbox.
+`information_schema.columns` responde con el esquema de datagen. La latencia
+y el volumen son configurables.
+
+    python bench/fake_trino.py --port 18080 --queue-ms 20 --exec-ms 50 --day-rows 8640
+"""
+import argparse
+import asyncio
+import functools
+import itertools
+import os
+import re
+import sys
+from datetime import date, timedelta
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+from urllib.parse import unquote_plus
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from datagen import SCHEMAS, device_ids, risk_rows, telematics_rows, track_bounds  # noqa: E402
+from geo import geo_cell  # noqa: E402
+
+TABLE_RE = re.compile(r"\bFROM\s+(?:\w+\.)*(telematics_real_time|risk_score_daily|device_last_state)\b", re.I)
+DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+DATETIME_RE = re.compile(r"^\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}")
+GEO_RANGE_RE = re.compile(r"\bgeo_cell\s+BETWEEN\s+\?\s+AND\s+\?", re.I)
+
+
+# =========================
+# Parseo mínimo del statement
+# =========================
+def split_top(text: str, sep: str = ",") -> List[str]:
+    """Divide por `sep` fuera de paréntesis, corchetes y comillas."""
+    parts, depth, quote, cur = [], 0, False, []
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if quote:
+            cur.append(ch)
+            if ch == "'":
+                if i + 1 < len(text) and text[i + 1] == "'":
+                    cur.append("'")
+                    i += 1
+                else:
+                    quote = False
+        elif ch == "'":
+            quote = True
+            cur.append(ch)
+        elif ch in "([":
+            depth += 1
+            cur.append(ch)
+        elif ch in ")]":
+            depth -= 1
+            cur.append(ch)
+        elif ch == sep and depth == 0:
+            parts.append("".join(cur).strip())
+            cur = []
+        else:
+            cur.append(ch)
+        i += 1
+    if cur:
+        parts.append("".join(cur).strip())
+    return parts
+
+
+def parse_literal(lit: str) -> Any:
+    lit = lit.strip()
+    if lit.upper() == "NULL":
+        return None
+    if lit.startswith("'"):
+        return lit[1:-1].replace("''", "'")
+    m = re.match(r"^(TIMESTAMP|DATE|DOUBLE|DECIMAL)\s+'(.*)'$", lit, re.I | re.S)
+    if m:
+        kind, val = m.group(1).upper(), m.group(2)
+        return float(val) if kind in ("DOUBLE", "DECIMAL") else val
+    if lit.upper().startswith("ARRAY["):
+        return [parse_literal(x) for x in split_top(lit[6:-1])]
+    try:
+        return int(lit)
+    except ValueError:
+        return lit
+
+
+def prepared_statements(header: Optional[str]) -> Dict[str, str]:
+    """`X-Trino-Prepared-Statement: nombre=sql_urlencoded[, ...]`."""
+    out: Dict[str, str] = {}
+    for item in (header or "").split(","):
+        name, sep, sql = item.strip().partition("=")
+        if sep:
+            out[name.strip()] = unquote_plus(sql)
+    return out
+
+
+def unbind(statement: str, prepared: Optional[Mapping[str, str]] = None) -> Tuple[str, List[Any]]:
+    """Inverso de trino_async.bind_params / bind_statement."""
+    m = re.match(r"^\s*EXECUTE\s+IMMEDIATE\s+'((?:[^']|'')*)'\s+USING\s+(.*)$", statement, re.S | re.I)
+    if m:
+        return m.group(1).replace("''", "'"), [parse_literal(x) for x in split_top(m.group(2))]
+    m = re.match(r"^\s*EXECUTE\s+(\w+)(?:\s+USING\s+(.*))?$", statement, re.S | re.I)
+    if m and m.group(1).upper() != "IMMEDIATE":
+        if not prepared or m.group(1) not in prepared:
+            raise ValueError(f"prepared statement {m.group(1)} not found")
+        return prepared[m.group(1)], [parse_literal(x) for x in split_top(m.group(2) or "")]
+    return statement, []
+
+
+def outer_select(sql: str) -> List[str]:
+    """Nombres de la proyección del SELECT exterior (alias o último identificador)."""
+    start = re.search(r"\bSELECT\b", sql, re.I)
+    if not start:
+        return []
+    depth, i = 0, start.end()
+    while i < len(sql):
+        ch = sql[i]
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif depth == 0 and re.match(r"\bFROM\b", sql[i:i + 5], re.I) and not sql[i - 1].isalnum() and sql[i - 1] != "_":
+            break
+        i += 1
+    names = []
+    for item in split_top(sql[start.end():i]):
+        alias = re.search(r"\bAS\s+\"?(\w+)\"?\s*$", item, re.I)
+        names.append(alias.group(1) if alias else re.findall(r"\w+", item)[-1])
+    return names
+
+
+# =========================
+# Planeación de la respuesta
+# =========================
+@functools.lru_cache(maxsize=64)
+def day_rows_cached(device_id: str, day: date, day_rows: int) -> List[Dict[str, Any]]:
+    """Un día completo de un device; generarlo fila por fila dominaría la latencia medida."""
+    return list(telematics_rows(device_id, day, day_rows))
+
+
+@functools.lru_cache(maxsize=8192)
+def last_row_cached(device_id: str, day: date, day_rows: int) -> Dict[str, Any]:
+    return next(telematics_rows(device_id, day, day_rows, 0, 1))
+
+
+@functools.lru_cache(maxsize=64)
+def risk_rows_cached(devices: Tuple[str, ...], day_lo: date, day_hi: date) -> List[Dict[str, Any]]:
+    return list(risk_rows(list(devices), day_lo, day_hi, n=len(devices) * ((day_hi - day_lo).days + 1)))
+
+
+@functools.lru_cache(maxsize=4096)
+def area_rows_cached(
+    device_id: str, day: date, day_rows: int, bbox: Tuple[float, float, float, float],
+) -> List[Dict[str, Any]]:
+    """Filas del día de un device dentro del bbox (gps_epoch DESC)."""
+    min_lon, min_lat, max_lon, max_lat = bbox
+    return [
+        r for r in telematics_rows(device_id, day, day_rows)
+        if min_lat <= r["latitude"] <= max_lat and min_lon <= r["longitude"] <= max_lon
+    ]
+
+
+def plan_area(
+    sql: str, params: List[Any], n_ranges: int, days: List[date], cfg: argparse.Namespace,
+) -> Tuple[Iterator[Dict[str, Any]], int, int]:
+    """
+    Área sobre la flota: cada device/día es un "archivo" con el min/max de
+    geo_cell de su recorrido; se lee solo si cruza algún rango. Devuelve
+    (filas, total, filas escaneadas).
+    """
+    # Parámetros de area_predicates: ventana (4), rangos (2 por rango), lat/lon del bbox (4)
+    first = next(i for i, p in enumerate(params) if isinstance(p, int) and not isinstance(p, bool))
+    cells = params[first:first + 2 * n_ranges]
+    ranges = list(zip(cells[0::2], cells[1::2]))
+    min_lat, max_lat, min_lon, max_lon = (float(p) for p in params[first + 2 * n_ranges:first + 2 * n_ranges + 4])
+    bbox = (min_lon, min_lat, max_lon, max_lat)
+
+    scanned = 0
+    rows: List[Dict[str, Any]] = []
+    for d in sorted(device_ids(cfg.devices)):
+        for day in reversed(days):
+            lo_lon, lo_lat, hi_lon, hi_lat = track_bounds(d, day)
+            lo, hi = geo_cell(lo_lat, lo_lon), geo_cell(hi_lat, hi_lon)  # geo_cell crece con lat y con lon
+            if not any(a <= hi and lo <= b for a, b in ranges):
+                continue
+            scanned += cfg.day_rows
+            rows.extend(area_rows_cached(d, day, cfg.day_rows, bbox))
+
+    if re.search(r"\bGROUP\s+BY\s+device_id\b", sql, re.I):
+        by_device: Dict[str, Dict[str, Any]] = {}
+        for r in rows:
+            agg = by_device.setdefault(r["device_id"], {
+                "device_id": r["device_id"], "reports": 0, "first_seen": r["gps_epoch"], "last_seen": r["gps_epoch"],
+            })
+            agg["reports"] += 1
+            agg["first_seen"] = min(agg["first_seen"], r["gps_epoch"])
+            agg["last_seen"] = max(agg["last_seen"], r["gps_epoch"])
+        rows = list(by_device.values())
+    return iter(rows), len(rows), scanned
+
+
+class FakeQuery:
+    def __init__(self, qid: str, columns: List[Dict[str, str]], rows: Iterator[List[Any]], scanned: int):
+        self.id = qid
+        self.columns = columns
+        self.rows = rows
+        self.scanned = scanned
+        self.page = 0
+        self.done = False
+
+
+def plan(
+    statement: str, cfg: argparse.Namespace, prepared: Optional[Mapping[str, str]] = None,
+) -> Tuple[List[Dict[str, str]], Iterator[List[Any]], int]:
+    sql, params = unbind(statement, prepared)
+    if re.search(r"\binformation_schema\.columns\b", sql, re.I):
+        rows = [[t, c, ty] for t, types in SCHEMAS.items() if t in params for c, ty in types.items()]
+        cols = [{"name": n, "type": "varchar"} for n in ("table_name", "column_name", "data_type")]
+        return cols, iter(rows), len(rows)
+    m = TABLE_RE.search(sql)
+    cols = outer_select(sql)
+    if not m:
+        # SELECT 1 (health) u otra query sin tabla conocida
+        return [{"name": c or "_col0", "type": "integer"} for c in (cols or ["_col0"])], iter([[1] * max(len(cols), 1)]), 1
+
+    table = m.group(1)
+    types = SCHEMAS[table]
+    is_count = len(cols) == 1 and re.match(r"^\s*SELECT\s+count\(\*\)\s+FROM", sql, re.I) is not None
+
+    ints = [p for p in params if isinstance(p, int) and not isinstance(p, bool)]
+    limit = offset = None
+    if re.search(r"FETCH\s+NEXT\s+\?\s+ROWS", sql, re.I) and ints:
+        limit = ints[-1]
+        if re.search(r"OFFSET\s+\?\s+ROWS", sql, re.I) and len(ints) >= 2:
+            offset = ints[-2]
+    offset = offset or 0
+
+    strs = [p for p in params if isinstance(p, str)]
+    dates = sorted(p for p in strs if DATE_RE.match(p))
+    devices = list(dict.fromkeys(p for p in strs if p.isdigit()))
+    day_lo = date.fromisoformat(dates[0]) if dates else date(2025, 9, 25)
+    day_hi = date.fromisoformat(dates[-1]) if dates else day_lo
+
+    n_ranges = len(GEO_RANGE_RE.findall(sql))
+    if table == "telematics_real_time" and n_ranges:
+        days = [day_lo + timedelta(days=k) for k in range((day_hi - day_lo).days + 1)]
+        source, total, scanned = plan_area(sql, params, n_ranges, days, cfg)
+        source = itertools.islice(source, offset, None if limit is None else offset + limit)
+        if is_count:
+            return [{"name": "_col0", "type": "bigint"}], iter([[total]]), scanned
+        types = {**types, "reports": "bigint", "first_seen": types["gps_epoch"], "last_seen": types["gps_epoch"]}
+        columns = [{"name": c, "type": "bigint" if c == "_total" else types.get(c, "varchar")} for c in cols]
+        return columns, ([total if c == "_total" else r.get(c) for c in cols] for r in source), scanned
+    if table == "risk_score_daily":
+        devs = devices or device_ids(cfg.devices)
+        total = len(devs) * ((day_hi - day_lo).days + 1)
+        source = iter(risk_rows_cached(tuple(devs), day_lo, day_hi)[offset:None if limit is None else offset + limit])
+    elif table == "device_last_state":
+        devs = devices or device_ids(cfg.devices)
+        total = len(devs)
+        source = (last_row_cached(d, day_hi, cfg.day_rows) for d in devs[:limit])
+    else:
+        devs = devices or device_ids(1)
+        days = [day_lo + timedelta(days=k) for k in range((day_hi - day_lo).days + 1)]
+        per_day = cfg.day_rows
+        total = len(devs) * len(days) * per_day
+
+        def gen():
+            k = 0
+            for d in sorted(devs):
+                for day in reversed(days):
+                    if k + per_day <= offset:
+                        k += per_day
+                        continue
+                    start = max(0, offset - k)
+                    yield from itertools.islice(day_rows_cached(d, day, per_day), start, None)
+                    k += per_day
+
+        source = gen()
+        if limit is not None:
+            source = itertools.islice(source, limit)
+
+    if is_count:
+        return [{"name": "_col0", "type": "bigint"}], iter([[total]]), total
+
+    columns = [{"name": c, "type": "bigint" if c == "_total" else types.get(c, "varchar")} for c in cols]
+    rows = ([total if c == "_total" else r.get(c) for c in cols] for r in source)
+    return columns, rows, total
+
+
+# =========================
+# Servidor
+# =========================
+def make_app(cfg: argparse.Namespace) -> Starlette:
+    queries: Dict[str, FakeQuery] = {}
+    counter = itertools.count(1)
+
+    def stats(q: FakeQuery, state: str) -> Dict[str, Any]:
+        return {
+            "state": state,
+            "queuedTimeMillis": int(cfg.queue_ms),
+            "cpuTimeMillis": int(cfg.exec_ms * 2),
+            "wallTimeMillis": int(cfg.queue_ms + cfg.exec_ms),
+            "processedRows": q.scanned,
+            "processedBytes": q.scanned * 220,
+        }
+
+    async def submit(request: Request) -> Response:
+        statement = (await request.body()).decode("utf-8")
+        qid = f"fake_{next(counter)}"
+        try:
+            prepared = prepared_statements(request.headers.get("x-trino-prepared-statement"))
+            columns, rows, scanned = plan(statement, cfg, prepared)
+        except Exception as e:
+            return JSONResponse({"id": qid, "error": {"message": f"fake planner: {e}", "errorName": "GENERIC_INTERNAL_ERROR"}, "stats": {"state": "FAILED"}})
+        q = FakeQuery(qid, columns, rows, scanned)
+        queries[qid] = q
+        base = str(request.base_url).rstrip("/")
+        return JSONResponse({"id": qid, "nextUri": f"{base}/v1/statement/executing/{qid}/1", "stats": stats(q, "QUEUED")})
+
+    async def fetch(request: Request) -> Response:
+        qid = request.path_params["qid"]
+        q = queries.get(qid)
+        if q is None:
+            return JSONResponse({"error": "not found"}, status_code=404)
+        q.page += 1
+        await asyncio.sleep(((cfg.queue_ms + cfg.exec_ms) if q.page == 1 else cfg.page_ms) / 1000.0)
+        data = list(itertools.islice(q.rows, cfg.page_rows))
+        body: Dict[str, Any] = {"id": qid, "columns": q.columns, "stats": stats(q, "RUNNING")}
+        if data:
+            body["data"] = data
+        if len(data) < cfg.page_rows:
+            queries.pop(qid, None)
+            body["stats"]["state"] = "FINISHED"
+        else:
+            base = str(request.base_url).rstrip("/")
+            body["nextUri"] = f"{base}/v1/statement/executing/{qid}/{q.page + 1}"
+        return JSONResponse(body)
+
+    async def cancel(request: Request) -> Response:
+        queries.pop(request.path_params["qid"], None)
+        return Response(status_code=204)
+
+    return Starlette(routes=[
+        Route("/v1/statement", submit, methods=["POST"]),
+        Route("/v1/statement/executing/{qid}/{page:int}", fetch, methods=["GET"]),
+        Route("/v1/statement/executing/{qid}/{page:int}", cancel, methods=["DELETE"]),
+    ])
+
+
+def parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser()
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=18080)
+    p.add_argument("--queue-ms", type=float, default=20, help="Tiempo en cola antes de la primera página")
+    p.add_argument("--exec-ms", type=float, default=50, help="Planeación + ejecución hasta la primera página")
+    p.add_argument("--page-ms", type=float, default=5, help="Latencia de cada página siguiente (nextUri)")
+    p.add_argument("--page-rows", type=int, default=2000, help="Filas por página")
+    p.add_argument("--day-rows", type=int, default=8640, help="Filas por device y día en telematics_real_time")
+    p.add_argument("--devices", type=int, default=200, help="Devices cuando la query no filtra por device")
+    return p
+
+
+if __name__ == "__main__":
+    args = parser().parse_args()
+    uvicorn.run(make_app(args), host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,423 @@
+"""
+Perfiles de carga de la API contra bench/fake_trino.py (sin cluster).
+
+Levanta el Trino falso y la API (uvicorn) como subprocesos, corre cada perfil
+con N requests y C en paralelo, y escribe un JSON con throughput, latencias
+(p50/p90/p99), errores y RSS pico de la API por perfil. Con `--baseline`
+compara contra un JSON anterior.
+
+    python bench/run_bench.py --requests 200 --concurrency 8 --out bench/results/$(git rev-parse --short HEAD).json
+    python bench/run_bench.py --profiles page_10k,deep_offset --baseline bench/results/abc1234.json
+
+Para medir una API ya levantada (contra Trino real o falso): `--api-url http://host:9009 --token xxxx`
+(sin RSS salvo que se pase `--api-pid`).
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import signal
+import socket
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SERVICE_DIR = os.path.dirname(HERE)
+sys.path.insert(0, HERE)
+
+from datagen import device_ids  # noqa: E402
+
+DAY = date(2025, 9, 20)
+# Cruza el borde del cuadro de 1° en -99 sobre la zona de los recorridos de datagen
+AREA_BBOX = "-99.10,19.40,-99.00,19.50"
+
+
+def window(days: int) -> Dict[str, str]:
+    start = DAY - timedelta(days=days - 1)
+    return {"gps_epoch_start": f"{start.isoformat()}T00:00:00", "gps_epoch_end": f"{DAY.isoformat()}T23:59:59"}
+
+
+# =========================
+# Perfiles
+# =========================
+# Cada perfil: método, ruta, parámetros/body y cómo contar filas de la respuesta.
+def profiles(devices: List[str]) -> Dict[str, Dict[str, Any]]:
+    dev = devices[0]
+    return {
+        "single_device_day": {
+            "desc": "Un device, un día, página de 1000 (total=exact)",
+            "path": "/telematics_real_time",
+            "params": {"device_id": dev, **window(1), "limit": 1000},
+        },
+        "page_10k": {
+            "desc": "Página JSON máxima (10k filas, todas las columnas)",
+            "path": "/telematics_real_time",
+            "params": {"device_id": dev, **window(2), "limit": 10000, "total": "approx"},
+        },
+        "deep_offset": {
+            "desc": "OFFSET 50000 sobre una semana, página de 100",
+            "path": "/telematics_real_time",
+            "params": {"device_id": dev, **window(7), "limit": 100, "offset": 50000},
+        },
+        "risk_range": {
+            "desc": "risk_score_daily por rango de 30 días sin device (scan por fecha)",
+            "path": "/risk_score_daily",
+            "params": {
+                "report_date_start": (DAY - timedelta(days=29)).isoformat(),
+                "report_date_end": DAY.isoformat(),
+                "limit": 5000,
+            },
+        },
+        "last_position_fleet": {
+            "desc": "Última posición de 500 devices (POST)",
+            "method": "POST",
+            "path": "/devices/last_position",
+            "json": {"device_ids": devices[:500]},
+        },
+        "area_devices": {
+            "desc": "Devices dentro de un bbox de 0.1° en un día (rangos de geo_cell, mode=devices)",
+            "path": "/telematics_real_time/area",
+            "params": {"bbox": AREA_BBOX, **window(1)},
+        },
+        "area_points": {
+            "desc": "Puntos dentro del mismo bbox, página de 1000 (mode=points)",
+            "path": "/telematics_real_time/area",
+            "params": {"bbox": AREA_BBOX, **window(1), "mode": "points", "limit": 1000},
+        },
+        "export_ndjson": {
+            "desc": "Exportación ndjson de 3 días (streaming)",
+            "path": "/telematics_real_time",
+            "params": {"device_id": dev, **window(3), "limit": 1000000, "format": "ndjson"},
+            "stream": True,
+        },
+    }
+
+
+def count_rows(resp: httpx.Response, body: bytes, stream: bool) -> int:
+    if stream:
+        return body.count(b"\n")
+    data = json.loads(body)
+    return len(data.get("items", []))
+
+
+# =========================
+# Procesos
+# =========================
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_http(url: str, timeout_s: float = 20.0) -> None:
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} no respondió en {timeout_s}s")
+
+
+def read_status_kb(pid: int, field: str) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def cpu_seconds(pid: Optional[int]) -> Optional[float]:
+    """utime + stime del proceso (para ver si el cuello es la API o el Trino falso)."""
+    if not pid:
+        return None
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def reset_peak_rss(pid: int) -> bool:
+    """Reinicia VmHWM (Linux >= 4.0) para medir el pico de cada perfil por separado."""
+    try:
+        with open(f"/proc/{pid}/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+class Stack:
+    """Trino falso + API en subprocesos; se detienen al salir."""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.procs: List[subprocess.Popen] = []
+        self.api_url = ""
+        self.api_pid: Optional[int] = None
+        self.trino_pid: Optional[int] = None
+
+    def __enter__(self) -> "Stack":
+        a = self.args
+        trino_port, api_port = free_port(), free_port()
+        self.procs.append(subprocess.Popen([
+            sys.executable, os.path.join(HERE, "fake_trino.py"), "--port", str(trino_port),
+            "--queue-ms", str(a.queue_ms), "--exec-ms", str(a.exec_ms), "--page-ms", str(a.page_ms),
+            "--page-rows", str(a.page_rows), "--day-rows", str(a.day_rows), "--devices", str(a.devices),
+        ]))
+        self.trino_pid = self.procs[0].pid
+        wait_http(f"http://127.0.0.1:{trino_port}/v1/statement/executing/x/1")
+
+        env = dict(os.environ)
+        env.update({
+            "TRINO_HOST": "127.0.0.1",
+            "TRINO_PORT": str(trino_port),
+            "TRINO_HTTP_SCHEME": "http",
+            "API_TOKENS": a.token,
+            "CACHE_MAX_ENTRIES": str(a.cache_entries),
+            "NESSIE_URI": f"http://127.0.0.1:{free_port()}/api/v2",  # sin Nessie: no se cachea lo versionado
+            "SLOW_QUERY_MS": "0",
+            "TRINO_POOL_SIZE": str(a.pool_size),
+            # Un solo token de bench: que use todo el pool, como antes del control de admisión
+            "API_MAX_QUERIES_PER_TOKEN": str(a.pool_size),
+        })
+        api = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(api_port),
+             "--log-level", "warning", "--no-access-log"],
+            cwd=SERVICE_DIR, env=env,
+        )
+        self.procs.append(api)
+        self.api_pid = api.pid
+        self.api_url = f"http://127.0.0.1:{api_port}"
+        wait_http(f"{self.api_url}/health")
+        return self
+
+    def __exit__(self, *exc) -> None:
+        for p in reversed(self.procs):
+            p.send_signal(signal.SIGINT)
+        for p in reversed(self.procs):
+            try:
+                p.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                p.kill()
+
+
+# =========================
+# Carga
+# =========================
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    k = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+
+async def run_profile(
+    client: httpx.AsyncClient, prof: Dict[str, Any], n: int, concurrency: int, warmup: int,
+) -> Dict[str, Any]:
+    method = prof.get("method", "GET")
+    stream = prof.get("stream", False)
+
+    async def one() -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        try:
+            resp = await client.request(method, prof["path"], params=prof.get("params"), json=prof.get("json"))
+            body = resp.content
+            elapsed = time.perf_counter() - t0
+            if resp.status_code != 200:
+                return {"ok": False, "elapsed": elapsed, "error": f"HTTP {resp.status_code}: {body[:200]!r}"}
+            return {"ok": True, "elapsed": elapsed, "rows": count_rows(resp, body, stream), "bytes": len(body)}
+        except Exception as e:
+            return {"ok": False, "elapsed": time.perf_counter() - t0, "error": f"{type(e).__name__}: {e}"}
+
+    for _ in range(warmup):
+        await one()
+
+    results: List[Dict[str, Any]] = []
+    queue = iter(range(n))
+
+    async def worker() -> None:
+        for _ in queue:
+            results.append(await one())
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - t0
+
+    ok = [r for r in results if r["ok"]]
+    lat = sorted(r["elapsed"] * 1000 for r in ok)
+    rows = sum(r["rows"] for r in ok)
+    nbytes = sum(r["bytes"] for r in ok)
+    errors = [r["error"] for r in results if not r["ok"]]
+    ms = lambda v: None if v is None else round(v, 2)  # noqa: E731
+    return {
+        "requests": n,
+        "concurrency": concurrency,
+        "errors": len(errors),
+        "error_samples": sorted(set(errors))[:3],
+        "wall_s": round(wall, 3),
+        "req_per_s": round(len(ok) / wall, 2) if wall else None,
+        "rows_per_s": round(rows / wall, 1) if wall else None,
+        "mb_per_s": round(nbytes / wall / 1e6, 3) if wall else None,
+        "rows_per_request": round(rows / len(ok), 1) if ok else None,
+        "latency_ms": {
+            "p50": ms(percentile(lat, 0.50)),
+            "p90": ms(percentile(lat, 0.90)),
+            "p99": ms(percentile(lat, 0.99)),
+            "max": ms(lat[-1] if lat else None),
+            "mean": ms(sum(lat) / len(lat) if lat else None),
+        },
+    }
+
+
+# =========================
+# Reporte
+# =========================
+def git_rev() -> Dict[str, Any]:
+    def git(*cmd: str) -> str:
+        return subprocess.run(["git", *cmd], cwd=SERVICE_DIR, capture_output=True, text=True).stdout.strip()
+    return {"commit": git("rev-parse", "--short", "HEAD") or None, "dirty": bool(git("status", "--porcelain", "--", "."))}
+
+
+METRICS: List[tuple] = [
+    ("req_per_s", lambda r: r["req_per_s"], True),
+    ("rows_per_s", lambda r: r["rows_per_s"], True),
+    ("p50_ms", lambda r: r["latency_ms"]["p50"], False),
+    ("p99_ms", lambda r: r["latency_ms"]["p99"], False),
+    ("peak_rss_mb", lambda r: r.get("peak_rss_mb"), False),
+]
+
+
+def print_table(report: Dict[str, Any], baseline: Optional[Dict[str, Any]]) -> None:
+    header = f"{'profile':<22}" + "".join(f"{m:>14}" for m, _, _ in METRICS) + f"{'errors':>8}"
+    print(header)
+    print("-" * len(header))
+    for name, r in report["profiles"].items():
+        cells = []
+        for _, get, _ in METRICS:
+            v = get(r)
+            cells.append(f"{'-' if v is None else v:>14}")
+        print(f"{name:<22}" + "".join(cells) + f"{r['errors']:>8}")
+        b = (baseline or {}).get("profiles", {}).get(name)
+        if b:
+            deltas = []
+            for _, get, higher_better in METRICS:
+                new, old = get(r), get(b)
+                if new is None or not old:
+                    deltas.append(f"{'-':>14}")
+                    continue
+                pct = (new - old) / old * 100
+                mark = "" if abs(pct) < 5 else ("+" if (pct > 0) == higher_better else "!")
+                deltas.append(f"{f'{pct:+.1f}%{mark}':>14}")
+            print(f"{'  vs baseline':<22}" + "".join(deltas))
+
+
+def parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser()
+    p.add_argument("--profiles", default="all", help="Lista separada por comas o 'all'")
+    p.add_argument("--requests", type=int, default=100, help="Requests medidos por perfil")
+    p.add_argument("--concurrency", type=int, default=8)
+    p.add_argument("--warmup", type=int, default=3)
+    p.add_argument("--out", default=None, help="Archivo JSON de resultados (default: bench/results/<fecha>_<commit>.json)")
+    p.add_argument("--baseline", default=None, help="JSON de una corrida anterior para comparar")
+    # API
+    p.add_argument("--api-url", default=None, help="API ya levantada (no se arrancan subprocesos)")
+    p.add_argument("--api-pid", type=int, default=None, help="PID de la API externa para medir RSS")
+    p.add_argument("--token", default="bench-token")
+    p.add_argument("--cache-entries", type=int, default=0, help="CACHE_MAX_ENTRIES de la API (0 = cada request va a Trino)")
+    p.add_argument("--pool-size", type=int, default=8, help="TRINO_POOL_SIZE de la API")
+    # Trino falso
+    p.add_argument("--queue-ms", type=float, default=20)
+    p.add_argument("--exec-ms", type=float, default=50)
+    p.add_argument("--page-ms", type=float, default=5)
+    p.add_argument("--page-rows", type=int, default=2000)
+    p.add_argument("--day-rows", type=int, default=8640, help="Filas por device y día (8640 = un reporte cada 10 s)")
+    p.add_argument("--devices", type=int, default=200)
+    return p
+
+
+async def bench(
+    args: argparse.Namespace, api_url: str, api_pid: Optional[int], trino_pid: Optional[int] = None,
+) -> Dict[str, Any]:
+    devices = device_ids(max(args.devices, 500))
+    all_profiles = profiles(devices)
+    names = list(all_profiles) if args.profiles == "all" else [n.strip() for n in args.profiles.split(",") if n.strip()]
+    unknown = [n for n in names if n not in all_profiles]
+    if unknown:
+        raise SystemExit(f"Perfiles desconocidos: {unknown}; disponibles: {list(all_profiles)}")
+
+    results: Dict[str, Any] = {}
+    headers = {"Authorization": f"Bearer {args.token}"}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=api_url, headers=headers, timeout=300.0, limits=limits) as client:
+        for name in names:
+            prof = all_profiles[name]
+            if api_pid:
+                reset_peak_rss(api_pid)
+            cpu0 = {"api": cpu_seconds(api_pid), "fake_trino": cpu_seconds(trino_pid)}
+            r = await run_profile(client, prof, args.requests, args.concurrency, args.warmup)
+            r["description"] = prof["desc"]
+            cpu1 = {"api": cpu_seconds(api_pid), "fake_trino": cpu_seconds(trino_pid)}
+            r["cpu_s"] = {
+                k: round(cpu1[k] - cpu0[k], 3) for k in cpu0 if cpu0[k] is not None and cpu1[k] is not None
+            }
+            if api_pid:
+                hwm = read_status_kb(api_pid, "VmHWM")
+                r["peak_rss_mb"] = None if hwm is None else round(hwm / 1024, 1)
+            results[name] = r
+            print(f"{name}: {r['req_per_s']} req/s, p50 {r['latency_ms']['p50']} ms, p99 {r['latency_ms']['p99']} ms, "
+                  f"errores {r['errors']}", file=sys.stderr)
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parser().parse_args(argv)
+    started = datetime.now(timezone.utc)
+
+    if args.api_url:
+        results = asyncio.run(bench(args, args.api_url.rstrip("/"), args.api_pid))
+    else:
+        with Stack(args) as stack:
+            results = asyncio.run(bench(args, stack.api_url, stack.api_pid, stack.trino_pid))
+
+    report = {
+        "meta": {
+            "started_at": started.isoformat(),
+            "git": git_rev(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "config": {k: v for k, v in vars(args).items() if k not in ("out", "baseline", "token")},
+        },
+        "profiles": results,
+    }
+
+    out = args.out
+    if out is None:
+        os.makedirs(os.path.join(HERE, "results"), exist_ok=True)
+        out = os.path.join(HERE, "results", f"{started:%Y%m%dT%H%M%S}_{report['meta']['git']['commit'] or 'nogit'}.json")
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_table(report, baseline)
+    print(f"\nResultados: {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import gzip
+import zlib
+from typing import Any, AsyncIterator, Dict, Literal, Optional
+
+import orjson
+import zstandard
+
+# Forma del JSON paginado:
+# - objects: {"items": [{col: valor, ...}, ...]} (default)
+# - rows:    {"columns": [...], "data": [[v0, v1, ...], ...]}  (una lista por fila)
+# - columns: {"columns": [...], "data": [[...col0...], [...col1...]]}  (una lista por columna)
+ResponseShape = Literal["objects", "rows", "columns"]
+
+# Content-Encoding soportados, en orden de preferencia a igual q
+CODINGS = ("zstd", "gzip")
+
+_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _default(v: Any) -> Any:
+    return str(v)
+
+
+def dumps(content: Any) -> bytes:
+    """JSON con orjson (UTF-8 directo, sin pasar por str)."""
+    return orjson.dumps(content, default=_default, option=_OPTIONS)
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Codificación a usar según `Accept-Encoding` (q-values incluidos);
+    None si el cliente no acepta ninguna de CODINGS.
+    """
+    if not accept_encoding:
+        return None
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for p in params.split(";"):
+            k, _, v = p.strip().partition("=")
+            if k.strip().lower() == "q":
+                try:
+                    q = float(v)
+                except ValueError:
+                    q = 0.0
+        accepted[name] = q
+    wildcard = accepted.get("*")
+    best, best_q = None, 0.0
+    for coding in CODINGS:
+        q = accepted.get(coding, wildcard if wildcard is not None else 0.0)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(data: bytes, coding: str, gzip_level: int = 5, zstd_level: int = 3) -> bytes:
+    if coding == "zstd":
+        return zstandard.ZstdCompressor(level=zstd_level).compress(data)
+    if coding == "gzip":
+        return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+    raise ValueError(f"unsupported coding: {coding}")
+
+
+async def compress_stream(
+    chunks: AsyncIterator[bytes], coding: str, gzip_level: int = 5, zstd_level: int = 3,
+) -> AsyncIterator[bytes]:
+    """
+    Comprime un stream chunk a chunk. Cada chunk se vacía (flush) para que el
+    cliente reciba los datos de cada página de Trino sin esperar al final.
+    """
+    if coding == "zstd":
+        comp = zstandard.ZstdCompressor(level=zstd_level).compressobj()
+        flush_block = lambda: comp.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)  # noqa: E731
+    elif coding == "gzip":
+        comp = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)  # wbits 31: contenedor gzip
+        flush_block = lambda: comp.flush(zlib.Z_SYNC_FLUSH)  # noqa: E731
+    else:
+        raise ValueError(f"unsupported coding: {coding}")
+
+    async for chunk in chunks:
+        out = comp.compress(chunk) + flush_block()
+        if out:
+            yield out
+    tail = comp.flush()
+    if tail:
+        yield tail
@@ -0,0 +1,124 @@
+import math
+from typing import List, Optional, Sequence, Tuple
+
+# Celda espacial `geo_cell` de telematics_real_time (misma fórmula en
+# sink_telematics_real_time.sql y backfill_telematics.py):
+#   lat_i = floor((latitude + 90) * 100)   en [0, 17999]
+#   lon_i = floor((longitude + 180) * 100) en [0, 35999]
+#   geo_cell = tile * 10000 + (lat_i % 100) * 100 + (lon_i % 100)
+#   tile = (lat_i // 100) * 360 + (lon_i // 100)   (cuadro de 1° x 1°)
+# Celdas de 0.01° (~1.1 km) agrupadas por cuadro de 1°: todo un cuadro es un
+# rango contiguo de valores, así que el min/max de geo_cell de un archivo con
+# datos de una misma zona es estrecho y Trino/Iceberg puede saltarlo.
+CELLS_PER_DEGREE = 100
+LAT_CELLS = 180 * CELLS_PER_DEGREE
+LON_CELLS = 360 * CELLS_PER_DEGREE
+TILE_SIZE = CELLS_PER_DEGREE * CELLS_PER_DEGREE
+
+def lat_index(lat: float) -> int:
+    return min(max(math.floor((lat + 90) * CELLS_PER_DEGREE), 0), LAT_CELLS - 1)
+
+def lon_index(lon: float) -> int:
+    return min(max(math.floor((lon + 180) * CELLS_PER_DEGREE), 0), LON_CELLS - 1)
+
+def cell_of(lat_i: int, lon_i: int) -> int:
+    tile = (lat_i // CELLS_PER_DEGREE) * 360 + lon_i // CELLS_PER_DEGREE
+    return tile * TILE_SIZE + (lat_i % CELLS_PER_DEGREE) * CELLS_PER_DEGREE + lon_i % CELLS_PER_DEGREE
+
+def geo_cell(lat: Optional[float], lon: Optional[float]) -> Optional[int]:
+    if lat is None or lon is None:
+        return None
+    return cell_of(lat_index(lat), lon_index(lon))
+
+def merge_ranges(ranges: List[Tuple[int, int]], max_ranges: int) -> List[Tuple[int, int]]:
+    """
+    Une rangos contiguos y, si siguen siendo más de `max_ranges`, cierra los
+    huecos más chicos: el resultado siempre cubre a la entrada (superconjunto).
+    """
+    merged: List[Tuple[int, int]] = []
+    for lo, hi in sorted(ranges):
+        if merged and lo <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], hi))
+        else:
+            merged.append((lo, hi))
+    if len(merged) <= max_ranges:
+        return merged
+    gaps = sorted(range(len(merged) - 1), key=lambda i: merged[i + 1][0] - merged[i][1])
+    close = set(gaps[: len(merged) - max_ranges])
+    out = [merged[0]]
+    for i in range(1, len(merged)):
+        if i - 1 in close:
+            out[-1] = (out[-1][0], merged[i][1])
+        else:
+            out.append(merged[i])
+    return out
+
+def bbox_tiles(min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> int:
+    """Cuadros de 1° que cruza el bbox (cota del trabajo de bbox_cell_ranges)."""
+    rows = lat_index(max_lat) // CELLS_PER_DEGREE - lat_index(min_lat) // CELLS_PER_DEGREE + 1
+    cols = lon_index(max_lon) // CELLS_PER_DEGREE - lon_index(min_lon) // CELLS_PER_DEGREE + 1
+    return rows * cols
+
+def _tile_spans(lo: int, hi: int) -> List[Tuple[int, int, int]]:
+    """[lo, hi] en índices de celda -> (cuadro, primera, última celda dentro del cuadro)."""
+    return [
+        (t, max(lo - t * CELLS_PER_DEGREE, 0), min(hi - t * CELLS_PER_DEGREE, CELLS_PER_DEGREE - 1))
+        for t in range(lo // CELLS_PER_DEGREE, hi // CELLS_PER_DEGREE + 1)
+    ]
+
+def bbox_cell_ranges(
+    min_lon: float, min_lat: float, max_lon: float, max_lat: float, max_ranges: int = 64,
+) -> List[Tuple[int, int]]:
+    """
+    Rangos [lo, hi] de geo_cell que cubren el bbox. Dentro de un cuadro las
+    celdas van por fila, así que un cuadro que el bbox cruza de lado a lado es
+    un solo tramo; los cuadros del borde este/oeste llevan un tramo por fila
+    mientras eso quepa en `max_ranges * CELLS_PER_DEGREE`, y si no, uno por
+    cuadro (superconjunto). El trabajo es O(cuadros), no O(filas de 0.01°).
+    """
+    full = CELLS_PER_DEGREE - 1
+    tile_rows = _tile_spans(lat_index(min_lat), lat_index(max_lat))
+    tile_cols = _tile_spans(lon_index(min_lon), lon_index(max_lon))
+    partial_cols = sum(1 for _, a, b in tile_cols if (a, b) != (0, full))
+    by_row = partial_cols * sum(r1 - r0 + 1 for _, r0, r1 in tile_rows) <= max_ranges * CELLS_PER_DEGREE
+
+    ranges: List[Tuple[int, int]] = []
+    for tile_lat, r0, r1 in tile_rows:
+        for tile_lon, c0, c1 in tile_cols:
+            base = (tile_lat * 360 + tile_lon) * TILE_SIZE
+            if (c0, c1) == (0, full) or r0 == r1 or not by_row:
+                ranges.append((base + r0 * CELLS_PER_DEGREE + c0, base + r1 * CELLS_PER_DEGREE + c1))
+            else:
+                ranges.extend(
+                    (base + r * CELLS_PER_DEGREE + c0, base + r * CELLS_PER_DEGREE + c1) for r in range(r0, r1 + 1)
+                )
+    return merge_ranges(ranges, max_ranges)
+
+def parse_bbox(text: str) -> Tuple[float, float, float, float]:
+    """'min_lon,min_lat,max_lon,max_lat' (orden GeoJSON)."""
+    try:
+        values = [float(x) for x in text.split(",")]
+    except ValueError:
+        raise ValueError("bbox must be min_lon,min_lat,max_lon,max_lat")
+    if len(values) != 4:
+        raise ValueError("bbox must be min_lon,min_lat,max_lon,max_lat")
+    return validate_bbox(*values)
+
+def validate_bbox(min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> Tuple[float, float, float, float]:
+    if not (-180 <= min_lon <= max_lon <= 180 and -90 <= min_lat <= max_lat <= 90):
+        raise ValueError("bbox out of range or min > max (antimeridian not supported)")
+    return min_lon, min_lat, max_lon, max_lat
+
+def polygon_bbox(ring: Sequence[Sequence[float]]) -> Tuple[float, float, float, float]:
+    lons = [p[0] for p in ring]
+    lats = [p[1] for p in ring]
+    return validate_bbox(min(lons), min(lats), max(lons), max(lats))
+
+def polygon_wkt(ring: Sequence[Sequence[float]]) -> str:
+    """Anillo [[lon, lat], ...] -> WKT (se cierra si hace falta)."""
+    if len(ring) < 3 or any(len(p) != 2 for p in ring):
+        raise ValueError("polygon must have at least 3 [lon, lat] points")
+    points = [(float(p[0]), float(p[1])) for p in ring]
+    if points[0] != points[-1]:
+        points.append(points[0])
+    return "POLYGON((" + ", ".join(f"{lon!r} {lat!r}" for lon, lat in points) + "))"
@@ -1,37 +1,130 @@
 import os
-import requests
-from typing import List, Optional, Any, Dict
-from datetime import datetime, date
+import json
+import base64
+import asyncio
+import functools
+from typing import List, Optional, Any, Dict, Awaitable, TypeVar, Literal, Tuple, Callable, AsyncIterator
+from datetime import datetime, date, timedelta
 
 import pytz
-import trino
-from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, validator
 from fastapi.openapi.utils import get_openapi
-from fastapi.responses import PlainTextResponse
-from trino.auth import BasicAuthentication
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 import yaml
 
+from trino_async import AsyncTrino, PreparedStatement, QueryQueueTimeout, QueryResult
+from streaming import MEDIA_TYPES, encode_stream, encode_grouped_ndjson
+from timefmt import LocalOffsetFormatter
+from result_cache import ResultCache, TableVersions
+from simplify import simplify_pages, simplify_rows
+from encoding import ResponseShape, compress, compress_stream, dumps, negotiate
+from geo import bbox_cell_ranges, bbox_tiles, parse_bbox, polygon_bbox, polygon_wkt, validate_bbox
+from admission import (
+    CURRENT as ADMISSION_BUDGET, AdmissionController, AdmissionRejected, ClientPolicy, RequestBudget,
+    client_label, estimate_cost, parse_policies,
+)
+from planner import ProjectionError, SchemaCatalog, TemplateCache
+from metrics import MetricsMiddleware, QueryObserver, count_admission, stage, track_connections
+
 # =========================
 # Configuración
 # =========================
 TIME_ZONE = os.getenv("TIME_ZONE", "America/Mexico_City")
 TRINO_HOST = os.getenv("TRINO_HOST", "trino")
 TRINO_PORT = int(os.getenv("TRINO_PORT", "8080"))
+TRINO_HTTP_SCHEME = os.getenv("TRINO_HTTP_SCHEME", "https")
 TRINO_USER = os.getenv("TRINO_USER", "analyst")
 TRINO_PASSWORD = os.getenv("TRINO_PASSWORD", "analyst2025")
 TRINO_CATALOG = os.getenv("TRINO_CATALOG", "nessie")
 TRINO_SCHEMA = os.getenv("TRINO_SCHEMA", "telematics")
 API_TOKENS = [t.strip() for t in os.getenv("API_TOKENS", "token1,token2,token3").split(",") if t.strip()]
 
+# Pool de conexiones Trino (keep-alive HTTP) y concurrencia por proceso
+TRINO_POOL_SIZE = int(os.getenv("TRINO_POOL_SIZE", "8"))
+TRINO_POOL_TIMEOUT_S = float(os.getenv("TRINO_POOL_TIMEOUT_S", "30"))
+TRINO_KEEPALIVE_EXPIRY_S = float(os.getenv("TRINO_KEEPALIVE_EXPIRY_S", "60"))
+TRINO_HTTP_TIMEOUT_S = float(os.getenv("TRINO_HTTP_TIMEOUT_S", "30"))
+API_MAX_CONCURRENT_QUERIES = int(os.getenv("API_MAX_CONCURRENT_QUERIES", str(TRINO_POOL_SIZE)))
+DISCONNECT_POLL_S = float(os.getenv("DISCONNECT_POLL_S", "0.5"))
+
+# Admisión: queries simultáneas por token, cola con prioridad y presupuesto de costo
+# (días × devices × filas). API_TOKEN_POLICIES: "token=nombre:high|normal|low[:max_concurrentes],..."
+API_MAX_QUERIES_PER_TOKEN = int(os.getenv("API_MAX_QUERIES_PER_TOKEN", str(max(API_MAX_CONCURRENT_QUERIES // 2, 1))))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+ADMISSION_MAX_QUEUE_PER_TOKEN = int(os.getenv("ADMISSION_MAX_QUEUE_PER_TOKEN", "16"))
+API_TOKEN_POLICIES = parse_policies(os.getenv("API_TOKEN_POLICIES", ""))
+ADMISSION_COST_SOFT = float(os.getenv("ADMISSION_COST_SOFT", "1e6"))
+ADMISSION_COST_HARD = float(os.getenv("ADMISSION_COST_HARD", "1e9"))
+ADMISSION_FLEET_DEVICES = int(os.getenv("ADMISSION_FLEET_DEVICES", "1000"))
+ADMISSION_OPEN_RANGE_DAYS = int(os.getenv("ADMISSION_OPEN_RANGE_DAYS", "365"))
+# Peso por tabla: telematics_real_time tiene ~8.6k filas por device-día, las otras una
+TABLE_COST_WEIGHT = {"telematics_real_time": 1.0, "risk_score_daily": 0.01, "device_last_state": 0.01}
+
+# Límites de filas: respuesta JSON vs exportación por streaming (ndjson/csv/arrow)
+JSON_MAX_ROWS = 10000
+STREAM_MAX_ROWS = int(os.getenv("STREAM_MAX_ROWS", "1000000"))
+BATCH_MAX_DEVICES = int(os.getenv("BATCH_MAX_DEVICES", "5000"))
+
+# Caché de resultados (risk_score_daily y ventanas históricas de telematics_real_time)
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+CACHE_TTL_S = float(os.getenv("CACHE_TTL_S", "3600"))
+CACHE_CLOSED_DAYS = int(os.getenv("CACHE_CLOSED_DAYS", "2"))
+NESSIE_URI = os.getenv("NESSIE_URI", "http://nessie:19120/api/v2")
+NESSIE_REF = os.getenv("NESSIE_REF", "main")
+CACHE_VERSION_REFRESH_S = float(os.getenv("CACHE_VERSION_REFRESH_S", "30"))
+
+# Consultas por área (geo_cell): ventana máxima, rangos de celdas y cuadros de 1° por query
+AREA_MAX_DAYS = int(os.getenv("AREA_MAX_DAYS", "7"))
+GEO_MAX_RANGES = int(os.getenv("GEO_MAX_RANGES", "64"))
+AREA_MAX_TILES = int(os.getenv("AREA_MAX_TILES", "10000"))
+
+# Compresión de respuestas (Accept-Encoding: zstd | gzip)
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "5"))
+COMPRESS_ZSTD_LEVEL = int(os.getenv("COMPRESS_ZSTD_LEVEL", "3"))
+
+# Esquema de tablas (validación de `columns`), SQL por forma de query y prepared statements
+SCHEMA_REFRESH_S = float(os.getenv("SCHEMA_REFRESH_S", "300"))
+SQL_TEMPLATE_CACHE = int(os.getenv("SQL_TEMPLATE_CACHE", "512"))
+TRINO_PREPARED_MAX_BYTES = int(os.getenv("TRINO_PREPARED_MAX_BYTES", "4096"))
+
+# Métricas / slow-query log (0 = desactivado)
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "2000"))
+
 # CORS: soporta ALLOW_ORIGINS="*" o lista separada por comas
 ALLOW_ORIGINS_ENV = os.getenv("ALLOW_ORIGINS", "").strip()
 ANY_ORIGIN = (ALLOW_ORIGINS_ENV == "*")
 ALLOW_ORIGINS = [] if ANY_ORIGIN else [o.strip() for o in ALLOW_ORIGINS_ENV.split(",") if o.strip()]
 
+class TimedJSONResponse(JSONResponse):
+    """JSONResponse con orjson que mide la serialización como etapa `encode`."""
+
+    def render(self, content: Any) -> bytes:
+        with stage("encode"):
+            return dumps(content)
+
+def json_response(request: Request, response: Response, content: Any) -> Response:
+    """
+    Respuesta JSON ya serializada (sin jsonable_encoder de FastAPI) y comprimida
+    según Accept-Encoding. Conserva los headers fijados en `response` (X-Cache).
+    """
+    with stage("encode"):
+        body = dumps(content)
+    headers = {**dict(response.headers), **admission_headers()}
+    headers["Vary"] = "Accept-Encoding"
+    coding = negotiate(request.headers.get("accept-encoding")) if len(body) >= COMPRESS_MIN_BYTES else None
+    if coding:
+        with stage("compress"):
+            body = compress(body, coding, COMPRESS_GZIP_LEVEL, COMPRESS_ZSTD_LEVEL)
+        headers["Content-Encoding"] = coding
+    return Response(body, media_type="application/json", headers=headers)
+
 app = FastAPI(
+    default_response_class=TimedJSONResponse,
     title="Telematics API",
     version="1.0.0",
     description="API para exponer datos de Nessie/Iceberg vía Trino.\n\n"
@@ -60,40 +153,154 @@ elif ALLOW_ORIGINS:
         max_age=3600,
     )
 
+app.add_middleware(MetricsMiddleware)
+
 # Seguridad Bearer
 auth_scheme = HTTPBearer(auto_error=True)
 
-def require_token(credentials: HTTPAuthorizationCredentials = Depends(auth_scheme)):
+TOKEN_POLICIES = {t: API_TOKEN_POLICIES.get(t) or ClientPolicy(client_label(t)) for t in API_TOKENS}
+
+async def require_token(credentials: HTTPAuthorizationCredentials = Depends(auth_scheme)):
     token = credentials.credentials
     if token not in API_TOKENS:
         raise HTTPException(status_code=401, detail="Invalid token")
+    # Cliente y prioridad del request para la admisión de sus queries
+    policy = TOKEN_POLICIES[token]
+    ADMISSION_BUDGET.set(RequestBudget(policy, policy.priority))
     return token
 
-# Conexión Trino (HTTPS + BasicAuth + Skip TLS Verify)
-def trino_conn():
-    session = requests.Session()
-    session.verify = False  # ⚠️ Skip TLS verify (dev con cert autofirmado)
-
-    conn = trino.dbapi.connect(
-        host=TRINO_HOST,
-        port=TRINO_PORT,
-        user=TRINO_USER,
-        auth=BasicAuthentication(TRINO_USER, TRINO_PASSWORD),
-        catalog=TRINO_CATALOG,
-        schema=TRINO_SCHEMA,
-        http_scheme="https",
-        http_session=session,
-    )
-    cur = conn.cursor()
-    # La sesión de Trino interpreta/retorna timestamps en esta zona
-    cur.execute(f"SET TIME ZONE '{TIME_ZONE}'")
-    return conn
+# Slots de Trino por proceso: globales, por token y cola con prioridad
+ADMISSION = AdmissionController(
+    max_concurrency=API_MAX_CONCURRENT_QUERIES,
+    per_client=API_MAX_QUERIES_PER_TOKEN,
+    max_queue=ADMISSION_MAX_QUEUE,
+    max_queue_per_client=ADMISSION_MAX_QUEUE_PER_TOKEN,
+    timeout_s=TRINO_POOL_TIMEOUT_S,
+)
+
+# Cliente Trino asíncrono (HTTPS + BasicAuth + Skip TLS Verify)
+# La zona horaria va como header de sesión (X-Trino-Time-Zone): sin SET TIME ZONE por request.
+TRINO = AsyncTrino(
+    host=TRINO_HOST,
+    port=TRINO_PORT,
+    user=TRINO_USER,
+    password=TRINO_PASSWORD,
+    catalog=TRINO_CATALOG,
+    schema=TRINO_SCHEMA,
+    time_zone=TIME_ZONE,
+    admission=ADMISSION,
+    http_scheme=TRINO_HTTP_SCHEME,
+    verify=False,  # ⚠️ Skip TLS verify (dev con cert autofirmado)
+    max_connections=TRINO_POOL_SIZE,
+    keepalive_expiry_s=TRINO_KEEPALIVE_EXPIRY_S,
+    request_timeout_s=TRINO_HTTP_TIMEOUT_S,
+    on_complete=QueryObserver(SLOW_QUERY_MS),
+)
+track_connections(TRINO)
+
+# Columnas por tabla (refresco en segundo plano) y SQL ya armado por forma de query
+SCHEMAS = SchemaCatalog(
+    TRINO, TRINO_CATALOG, TRINO_SCHEMA, ["telematics_real_time", "risk_score_daily", "device_last_state"],
+    refresh_s=SCHEMA_REFRESH_S,
+)
+TEMPLATES = TemplateCache(SQL_TEMPLATE_CACHE, TRINO_PREPARED_MAX_BYTES)
+
+@app.on_event("startup")
+async def load_schemas():
+    SCHEMAS.start()
+
+@app.on_event("shutdown")
+async def close_trino():
+    await SCHEMAS.stop()
+    await TRINO.close()
+    await TABLE_VERSIONS.close()
+
+T = TypeVar("T")
+
+async def run_cancellable(request: Request, work: Awaitable[T]) -> T:
+    """
+    Ejecuta `work` y lo cancela si el cliente HTTP se desconecta antes de terminar.
+    Al cancelarse, AsyncTrino hace DELETE de la query en Trino.
+    """
+    task = asyncio.ensure_future(work)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_S)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+                raise HTTPException(status_code=499, detail="client disconnected")
+    finally:
+        if not task.done():
+            task.cancel()
+
+def query_error(e: Exception, prefix: str = "trino query error") -> HTTPException:
+    """Traduce errores de ejecución a HTTPException."""
+    if isinstance(e, HTTPException):
+        return e
+    if isinstance(e, AdmissionRejected):
+        count_admission(admission_client(), "rejected_queue")
+        return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after_s)})
+    if isinstance(e, QueryQueueTimeout):
+        count_admission(admission_client(), "timeout")
+        return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    return HTTPException(status_code=500, detail=f"{prefix}: {e}")
+
+def project(table: str, columns: Optional[str], default: List[str]) -> List[str]:
+    """Proyección validada contra el esquema de la tabla (400 antes de ir a Trino)."""
+    try:
+        return SCHEMAS.projection(table, columns, default)
+    except ProjectionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def admission_client() -> str:
+    budget = ADMISSION_BUDGET.get()
+    return budget.client.name if budget else "internal"
+
+def admit(table: str, days: int, devices: int, rows: int) -> bool:
+    """
+    Presupuesto del request antes de ir a Trino. Sobre ADMISSION_COST_HARD se
+    rechaza; sobre ADMISSION_COST_SOFT baja a prioridad `low` (cola de la API y
+    resource group de Trino) y devuelve True para que el endpoint se degrade
+    (p.ej. total=exact -> approx). `rows` es offset + limit: Trino ordena y
+    descarta las filas del offset, así que también cuentan.
+    """
+    cost = estimate_cost(days, devices, rows, TABLE_COST_WEIGHT.get(table, 1.0))
+    if cost > ADMISSION_COST_HARD:
+        count_admission(admission_client(), "rejected_cost")
+        raise HTTPException(
+            status_code=400,
+            detail=f"estimated cost {cost:.0f} exceeds budget {ADMISSION_COST_HARD:.0f} (narrow the window, devices or limit, or page with cursor instead of offset)",
+        )
+    downgraded = cost > ADMISSION_COST_SOFT
+    budget = ADMISSION_BUDGET.get()
+    if budget is not None:
+        budget.cost = cost
+        if downgraded:
+            budget.downgraded = True
+            budget.priority = "low"
+    count_admission(admission_client(), "downgraded" if downgraded else "admitted")
+    return downgraded
+
+def admission_headers() -> Dict[str, str]:
+    budget = ADMISSION_BUDGET.get()
+    if budget is None or budget.cost is None:
+        return {}
+    headers = {"X-Admission-Cost": f"{budget.cost:.0f}"}
+    if budget.downgraded:
+        headers["X-Admission"] = "downgraded"
+    return headers
 
 # =========================
 # Helpers (TZ local y formato exacto)
 # =========================
 LOCAL_TZ = pytz.timezone(TIME_ZONE)
-TIMESTAMP_FIELDS = {"gps_epoch", "received_epoch", "decoded_epoch"}
+TIMESTAMP_FIELDS = {"gps_epoch", "received_epoch", "decoded_epoch", "first_seen", "last_seen"}
 
 def to_local_naive(dt: datetime) -> datetime:
     """Convierte un datetime con tz a la TZ local y lo deja naive (sin tzinfo).
@@ -186,15 +393,292 @@ def pagination_clause(offset: int, limit: int):
     else:
         return "OFFSET ? ROWS FETCH NEXT ? ROWS ONLY", [offset, limit]
 
-def postprocess_row(row: Dict[str, Any]) -> Dict[str, Any]:
-    """Formatea campos de tiempo a 'YYYY-MM-DD HH:MM:SS.mmm -0600'."""
-    out = {}
-    for k, v in row.items():
-        if k in TIMESTAMP_FIELDS and v is not None:
-            out[k] = format_local_offset(v)
+# =========================
+# Keyset pagination (cursor opaco)
+# =========================
+# Por tabla: (columna de orden DESC, cast del valor en el cursor, desempate).
+# El desempate hace única la posición del cursor cuando varias filas de un
+# device comparten la clave (p.ej. reportes con el mismo gps_epoch).
+KEYSET = {
+    "telematics_real_time": ("gps_epoch", "CAST(? AS timestamp(6) with time zone)", "correlation_id"),
+    "risk_score_daily": ("report_date", "CAST(? AS date)", None),
+}
+
+def keyset_order(table: str) -> str:
+    """ORDER BY de las páginas con cursor: device_id, <clave> DESC[, desempate]."""
+    col, _, tie = KEYSET[table]
+    return f"device_id, {col} DESC" + (f", coalesce({tie}, '')" if tie else "")
+
+def encode_cursor(table: str, device_id: str, key: Any, tie: Optional[str] = None, total: Optional[int] = None) -> str:
+    """
+    Cursor opaco con el último (device_id, clave[, desempate]) devuelto y, si
+    se conoce, el total de la primera página (`total=exact`) para arrastrarlo.
+    """
+    if isinstance(key, datetime):
+        if key.tzinfo is None:
+            key = LOCAL_TZ.localize(key)
+        key = key.astimezone(pytz.utc).strftime("%Y-%m-%d %H:%M:%S.%f UTC")
+    elif isinstance(key, date):
+        key = key.isoformat()
+    values = [device_id, key] + ([tie or ""] if KEYSET[table][2] else [])
+    data: Dict[str, Any] = {"t": table, "k": values}
+    if total is not None:
+        data["n"] = total
+    raw = json.dumps(data, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def _cursor_payload(table: str, cursor: str) -> Dict[str, Any]:
+    size = 3 if KEYSET[table][2] else 2
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        if data["t"] != table or len(data["k"]) != size or not all(isinstance(v, str) for v in data["k"]):
+            raise ValueError
+        if not isinstance(data.get("n", 0), int):
+            raise ValueError
+        return data
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def decode_cursor(table: str, cursor: str) -> List[str]:
+    return _cursor_payload(table, cursor)["k"]
+
+def cursor_total(table: str, cursor: str) -> Optional[int]:
+    """
+    Total que trae el cursor. Con cursor, count(*) OVER () solo vería las filas
+    posteriores al keyset, así que `total=exact` reporta el de la primera página.
+    """
+    return _cursor_payload(table, cursor).get("n")
+
+def keyset_predicate(table: str, cursor: str) -> Tuple[str, List[Any]]:
+    """
+    Rango equivalente a "después del último elemento" con el orden de keyset_order.
+    Cada página cuesta lo mismo sin importar la profundidad y el min/max de la
+    clave en Iceberg permite saltar archivos ya leídos.
+    """
+    device_id, key, *rest = decode_cursor(table, cursor)
+    col, cast, tie = KEYSET[table]
+    if not tie:
+        return f"(device_id > ? OR (device_id = ? AND {col} < {cast}))", [device_id, device_id, key]
+    return (
+        f"(device_id > ? OR (device_id = ? AND ({col} < {cast} OR ({col} = {cast} AND coalesce({tie}, '') > ?))))",
+        [device_id, device_id, key, key, rest[0]],
+    )
+
+def keyset_columns(table: str, proj_cols: List[str]) -> List[str]:
+    """Proyección + columnas de la clave del cursor (ocultas si no se pidieron)."""
+    col, _, tie = KEYSET[table]
+    extra = [c for c in ("device_id", col, tie) if c and c not in proj_cols]
+    return proj_cols + extra
+
+def next_cursor(
+    table: str, query_cols: List[str], rows: List[List[Any]], limit: int, has_more: Optional[bool], total: Optional[int] = None,
+) -> Optional[str]:
+    if not rows or has_more is False or (has_more is None and len(rows) < limit):
+        return None
+    last = rows[-1]
+    col, _, tie = KEYSET[table]
+    return encode_cursor(
+        table, last[query_cols.index("device_id")], last[query_cols.index(col)],
+        last[query_cols.index(tie)] if tie else None, total,
+    )
+
+# Modo de total por página:
+# - exact:  count(*) OVER () en la misma query de la página (un solo scan); con
+#           cursor se piden limit+1 filas y el total viene del cursor
+# - approx: se piden limit+1 filas y solo se reporta has_more
+# - none:   sin conteo
+TotalMode = Literal["exact", "approx", "none"]
+TOTAL_COL = "_total"
+
+def page_sql(
+    table: str,
+    sel: str,
+    where_sql: str,
+    order_sql: str,
+    offset: int,
+    limit: int,
+    total_mode: TotalMode,
+    source: Optional[str] = None,
+) -> Tuple[PreparedStatement, List[Any]]:
+    """
+    SQL de una página y sus parámetros de paginación. `source` reemplaza a la
+    tabla en el FROM (p.ej. una subconsulta de downsampling). El SQL solo
+    depende de la forma (proyección, predicados, orden, total), así que se
+    arma una vez por forma (TEMPLATES) y los requests solo cambian parámetros.
+    """
+    fetch = limit + 1 if total_mode == "approx" else limit
+    pag_sql, pag_params = pagination_clause(offset, fetch)
+    total_sel = f", count(*) OVER () AS {TOTAL_COL}" if total_mode == "exact" else ""
+
+    data_sql = TEMPLATES.get(("page", table, sel, total_sel, source, where_sql, order_sql, pag_sql), lambda: f"""
+        SELECT {sel}{total_sel}
+        FROM {source or f"{TRINO_CATALOG}.{TRINO_SCHEMA}.{table}"}
+        {where_sql}
+        ORDER BY {order_sql}
+        {pag_sql}
+    """)
+    return data_sql, pag_params
+
+async def fetch_page(
+    table: str,
+    sel: str,
+    where_sql: str,
+    params: List[Any],
+    order_sql: str,
+    offset: int,
+    limit: int,
+    total_mode: TotalMode,
+    source: Optional[str] = None,
+) -> Tuple[List[List[Any]], Optional[int], Optional[bool]]:
+    """Ejecuta la página y devuelve (rows, total, has_more)."""
+    data_sql, pag_params = page_sql(table, sel, where_sql, order_sql, offset, limit, total_mode, source)
+    with stage("trino_data"):
+        rows = (await TRINO.execute(data_sql, [*params, *pag_params])).rows
+
+    total: Optional[int] = None
+    has_more: Optional[bool] = None
+    if total_mode == "exact":
+        if rows:
+            total = rows[0][-1]
+            rows = [r[:-1] for r in rows]
+        elif offset == 0:
+            total = 0
         else:
-            out[k] = v
-    return out
+            # Offset fuera de rango: la ventana no devuelve filas, se cuenta aparte
+            count_sql = TEMPLATES.get(
+                ("count", table, source, where_sql),
+                lambda: f"SELECT count(*) FROM {source or f'{TRINO_CATALOG}.{TRINO_SCHEMA}.{table}'} {where_sql}",
+            )
+            with stage("trino_count"):
+                total = (await TRINO.execute(count_sql, params)).rows[0][0]
+        has_more = offset + len(rows) < total
+    elif total_mode == "approx":
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+    return rows, total, has_more
+
+async def stream_query(
+    request: Request,
+    sql: PreparedStatement,
+    params: List[Any],
+    encode: Callable[[AsyncIterator[QueryResult]], AsyncIterator[bytes]],
+    media_type: str,
+) -> StreamingResponse:
+    """
+    Exporta el resultado por streaming, página a página desde Trino.
+    La primera página se espera antes de responder para que los errores de
+    la query (columna inexistente, slots agotados) salgan como HTTP 4xx/5xx.
+    """
+    pages = TRINO.batches(sql, params)
+    try:
+        first = await run_cancellable(request, pages.__anext__())
+    except StopAsyncIteration:
+        first = QueryResult(columns=[], rows=[])
+    except BaseException as e:
+        await pages.aclose()
+        if isinstance(e, Exception):
+            raise query_error(e)
+        raise
+
+    async def chained():
+        yield first
+        async for page in pages:
+            yield page
+
+    chunks = encode(chained())
+    headers = {**admission_headers(), "Vary": "Accept-Encoding"}
+    coding = negotiate(request.headers.get("accept-encoding"))
+    if coding:
+        chunks = compress_stream(chunks, coding, COMPRESS_GZIP_LEVEL, COMPRESS_ZSTD_LEVEL)
+        headers["Content-Encoding"] = coding
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
+
+# =========================
+# Caché de resultados
+# =========================
+RESULT_CACHE = ResultCache(CACHE_MAX_ENTRIES, CACHE_TTL_S, LOCAL_TZ)
+TABLE_VERSIONS = TableVersions(NESSIE_URI, NESSIE_REF, TRINO_SCHEMA, refresh_s=CACHE_VERSION_REFRESH_S)
+
+async def result_cache_key(
+    table: str, sql: PreparedStatement, params: List[Any], proj_cols: List[str], versioned: bool, variant: Any = None,
+) -> Optional[str]:
+    """
+    Key de caché: statement (nombre = hash del SQL normalizado) + parámetros + proyección (+ snapshot de la tabla).
+    `variant` distingue respuestas con el mismo SQL y distinto post-proceso (p.ej. simplify).
+    Con `versioned`, el key incluye el snapshot Iceberg vigente en Nessie, así que
+    una escritura nueva invalida las entradas; si no se conoce la versión no se cachea.
+    """
+    version = None
+    if versioned:
+        version = await TABLE_VERSIONS.get(table)
+        if version is None:
+            return None
+    return ResultCache.make_key(table, sql.name, params, proj_cols, version, variant)
+
+def is_closed_window(day_end_local: str) -> bool:
+    """
+    Ventanas con received_day suficientemente en el pasado: el sink de Flink ya
+    no escribe ahí, así que vale la pena cachearlas (el key igual lleva el
+    snapshot, porque un backfill sí puede escribir en días pasados).
+    """
+    today = datetime.now(LOCAL_TZ).date()
+    return date.fromisoformat(day_end_local) <= today - timedelta(days=CACHE_CLOSED_DAYS)
+
+# Formateador por columna (tabla de offsets de TIME_ZONE en caché)
+TS_FORMATTER = LocalOffsetFormatter(LOCAL_TZ, fallback=format_local_offset)
+
+@functools.lru_cache(maxsize=1024)
+def _timestamp_positions(columns: Tuple[str, ...], schema_version: int) -> Tuple[int, ...]:
+    ts = TIMESTAMP_FIELDS | SCHEMAS.timestamp_columns()
+    return tuple(i for i, c in enumerate(columns) if c in ts)
+
+def timestamp_positions(columns: List[str]) -> Tuple[int, ...]:
+    """Posiciones de columnas timestamp (tipo en el esquema o TIMESTAMP_FIELDS), por proyección."""
+    return _timestamp_positions(tuple(columns), SCHEMAS.version)
+
+def postprocess_rows(columns: List[str], rows: List[List[Any]]) -> List[Dict[str, Any]]:
+    """
+    Arma los items y formatea los campos de tiempo a 'YYYY-MM-DD HH:MM:SS.mmm -0600'
+    columna por columna. Columnas extra al final de cada fila se descartan.
+    """
+    ts_idx = timestamp_positions(columns)
+    with stage("postprocess"):
+        if not ts_idx:
+            return [dict(zip(columns, r)) for r in rows]
+        formatted = {i: TS_FORMATTER.format_column([r[i] for r in rows]) for i in ts_idx}
+        items = []
+        for n, r in enumerate(rows):
+            item = dict(zip(columns, r))
+            for i in ts_idx:
+                item[columns[i]] = formatted[i][n]
+            items.append(item)
+        return items
+
+def postprocess_columns(columns: List[str], rows: List[List[Any]]) -> List[List[Any]]:
+    """
+    Valores por columna (column-major) directo de las filas de Trino, con los
+    timestamps formateados igual que postprocess_rows y sin dicts por fila.
+    """
+    ts_idx = timestamp_positions(columns)
+    with stage("postprocess"):
+        out = []
+        for i in range(len(columns)):
+            col = [r[i] for r in rows]
+            out.append(TS_FORMATTER.format_column(col) if i in ts_idx else col)
+        return out
+
+def shaped_body(shape: ResponseShape, columns: List[str], rows: List[List[Any]], page: Dict[str, Any]) -> Dict[str, Any]:
+    """Cuerpo de una página JSON en la forma pedida (ver encoding.ResponseShape)."""
+    if shape == "objects":
+        return {"items": postprocess_rows(columns, rows), "page": page}
+    if shape == "rows" and not timestamp_positions(columns):
+        # Nada que formatear: las filas de Trino van tal cual (sin columnas ocultas)
+        n = len(columns)
+        return {"columns": columns, "data": [r[:n] if len(r) > n else r for r in rows], "page": page}
+    cols = postprocess_columns(columns, rows)
+    data = cols if shape == "columns" else list(zip(*cols))
+    return {"columns": columns, "data": data, "page": page}
 
 # =========================
 # OpenAPI personalizado (bearer global)
@@ -225,29 +709,18 @@ def openapi_yaml():
     return yaml.safe_dump(app.openapi(), sort_keys=False, allow_unicode=True)
 
 # =========================
-# Endpoints
+# telematics_real_time: columnas, ventana y buckets
 # =========================
-@app.get("/health", tags=["system"], include_in_schema=True)
-def health():
-    try:
-        conn = trino_conn()
-        cur = conn.cursor()
-        cur.execute("SELECT 1")
-        cur.fetchall()
-        return {"status": "ok"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"trino error: {e}")
+TELEMATICS_COLUMNS = [
+    "report_type","tenant","provider","model","firmware","device_id",
+    "alert_type","latitude","longitude","gps_fixed","gps_epoch",
+    "satellites","speed_kmh","heading","odometer_meters","engine_on",
+    "vehicle_battery_voltage","backup_battery_voltage",
+    "received_epoch","decoded_epoch","correlation_id"
+]
 
-@app.get("/telematics_real_time", tags=["telematics"])
-def telematics_real_time(
-    token: str = Depends(require_token),
-    device_id: str = Query(..., description="Exact device_id (requerido)"),
-    gps_epoch_start: str = Query(..., description="Inicio local, ej. 2025-09-25T00:00:00"),
-    gps_epoch_end: str = Query(..., description="Fin local (inclusive)"),
-    limit: int = Query(100, ge=1, le=10000),   # ⬆ 10k
-    offset: int = Query(0, ge=0),
-    columns: Optional[str] = Query(None, description="Proyección separada por comas"),
-):
+def gps_window(gps_epoch_start: str, gps_epoch_end: str) -> Tuple[List[str], List[Any], str]:
+    """Predicados de la ventana gps_epoch (+ received_day para pruning); devuelve (where, params, día fin)."""
     # Parseo a string local sin tz
     start_ts_local = parse_local_dt_str(gps_epoch_start)  # 'YYYY-MM-DD HH:MM:SS'
     end_ts_local   = parse_local_dt_str(gps_epoch_end)    # 'YYYY-MM-DD HH:MM:SS'
@@ -258,58 +731,504 @@ def telematics_real_time(
     day_start_local = start_ts_local.split(" ")[0]
     day_end_local   = end_ts_local.split(" ")[0]
 
-    base_cols = [
-        "report_type","tenant","provider","model","firmware","device_id",
-        "alert_type","latitude","longitude","gps_fixed","gps_epoch",
-        "satellites","speed_kmh","heading","odometer_meters","engine_on",
-        "vehicle_battery_voltage","backup_battery_voltage",
-        "received_epoch","decoded_epoch","correlation_id"
-    ]
-    proj_cols = [c.strip() for c in (columns.split(",") if columns else base_cols) if c.strip()]
-    sel = ", ".join(proj_cols)
-
     # Casts para tipos correctos
     where = [
-        "device_id = ?",
         f"gps_epoch BETWEEN with_timezone(CAST(? AS timestamp), '{TIME_ZONE}') AND with_timezone(CAST(? AS timestamp), '{TIME_ZONE}')",
         "received_day BETWEEN CAST(? AS date) AND CAST(? AS date)",
     ]
-    params: List[Any] = [device_id, start_ts_local, end_ts_local, day_start_local, day_end_local]
+    return where, [start_ts_local, end_ts_local, day_start_local, day_end_local], day_end_local
 
-    where_sql = "WHERE " + " AND ".join(where)
+def window_days(window_params: List[Any]) -> int:
+    """Días locales que cubre la ventana de gps_window."""
+    return (date.fromisoformat(window_params[3]) - date.fromisoformat(window_params[2])).days + 1
 
-    count_sql = f"SELECT count(*) FROM {TRINO_CATALOG}.{TRINO_SCHEMA}.telematics_real_time {where_sql}"
+# Downsampling por tiempo (resolution): un punto por bucket de N segundos, conservando
+# siempre el primer/último punto de la ventana y las filas ALERT
+DOWNSAMPLE_COLUMNS = TELEMATICS_COLUMNS + ["device_id_bucket", "received_day"]
+DOWNSAMPLE_AVG_COLUMNS = ("latitude", "longitude", "speed_kmh")
+DownsampleAgg = Literal["first", "last", "avg"]
 
-    # Paginación robusta
-    pag_sql, pag_params = pagination_clause(offset, limit)
+@functools.lru_cache(maxsize=256)
+def downsample_source(inner_where_sql: str, resolution_s: int, agg: DownsampleAgg) -> str:
+    """
+    Subconsulta para el FROM de page_sql. Los buckets, el primero/último de la
+    ventana y los promedios se calculan sobre la ventana completa, así que los
+    predicados de página (cursor) van afuera y las páginas son consistentes.
+    """
+    rn_order = "ASC" if agg == "first" else "DESC"
+    avg_windows = ""
+    cols = DOWNSAMPLE_COLUMNS
+    if agg == "avg":
+        avg_windows = "".join(
+            f", avg({c}) OVER (PARTITION BY device_id, _bucket) AS _avg_{c}" for c in DOWNSAMPLE_AVG_COLUMNS
+        )
+        cols = [
+            f"IF(_first > 1 AND _last > 1 AND report_type <> 'ALERT', _avg_{c}, {c}) AS {c}" if c in DOWNSAMPLE_AVG_COLUMNS else c
+            for c in DOWNSAMPLE_COLUMNS
+        ]
+    return f"""(
+            SELECT {", ".join(cols)}
+            FROM (
+                SELECT s.*,
+                    row_number() OVER (PARTITION BY device_id, _bucket ORDER BY gps_epoch {rn_order}) AS _rn,
+                    row_number() OVER (PARTITION BY device_id ORDER BY gps_epoch ASC) AS _first,
+                    row_number() OVER (PARTITION BY device_id ORDER BY gps_epoch DESC) AS _last{avg_windows}
+                FROM (
+                    SELECT *, floor(to_unixtime(gps_epoch) / {int(resolution_s)}) AS _bucket
+                    FROM {TRINO_CATALOG}.{TRINO_SCHEMA}.telematics_real_time
+                    {inner_where_sql}
+                ) s
+            )
+            WHERE _rn = 1 OR _first = 1 OR _last = 1 OR report_type = 'ALERT'
+        ) AS ds"""
 
-    data_sql = f"""
-        SELECT {sel}
-        FROM {TRINO_CATALOG}.{TRINO_SCHEMA}.telematics_real_time
-        {where_sql}
-        ORDER BY device_id, gps_epoch DESC
-        {pag_sql}
+def simplify_columns(query_cols: List[str]) -> Tuple[List[str], Tuple[int, int, int, int]]:
+    """Columnas ocultas que necesita simplify y sus índices (lat, lon, report_type, device_id)."""
+    cols = query_cols + [c for c in ("latitude", "longitude", "report_type", "device_id") if c not in query_cols]
+    return cols, (cols.index("latitude"), cols.index("longitude"), cols.index("report_type"), cols.index("device_id"))
+
+DEVICE_ID_BUCKETS = 32
+
+def java_hashcode(s: str) -> int:
+    """String.hashCode() de Java (HASH_CODE de Flink)."""
+    # Unidades UTF-16, como Java: un carácter fuera del BMP cuenta como dos
+    units = s.encode("utf-16-le", "surrogatepass")
+    h = 0
+    for i in range(0, len(units), 2):
+        h = (31 * h + int.from_bytes(units[i:i + 2], "little")) & 0xFFFFFFFF
+    return h - 0x100000000 if h & 0x80000000 else h
+
+def device_id_bucket(device_id: str) -> int:
+    """Mismo valor que MOD(ABS(HASH_CODE(device_id)), 32) en sink_telematics_real_time.sql."""
+    return abs(java_hashcode(device_id)) % DEVICE_ID_BUCKETS
+
+class DeviceBatchRequest(BaseModel):
+    device_ids: List[str]
+    gps_epoch_start: str
+    gps_epoch_end: str
+    columns: Optional[str] = None
+    limit: int = 100000
+
+    @validator("device_ids")
+    def v_device_ids(cls, v):
+        v = list(dict.fromkeys(d.strip() for d in v if d and d.strip()))
+        if not v or len(v) > BATCH_MAX_DEVICES:
+            raise ValueError(f"device_ids must have 1..{BATCH_MAX_DEVICES} ids")
+        return v
+
+    @validator("limit")
+    def v_limit(cls, v):
+        if v < 1 or v > STREAM_MAX_ROWS:
+            raise ValueError(f"limit must be 1..{STREAM_MAX_ROWS}")
+        return v
+
+# =========================
+# device_last_state: última posición por device
+# =========================
+LAST_STATE_COLUMNS = [
+    "device_id","report_type","tenant","provider","model","alert_type",
+    "latitude","longitude","gps_fixed","gps_epoch","speed_kmh","heading",
+    "odometer_meters","engine_on","received_epoch","correlation_id"
+]
+
+def clean_device_ids(values: List[str]) -> List[str]:
+    """Ids únicos (en orden) a partir de valores repetidos y/o separados por comas."""
+    ids = list(dict.fromkeys(d.strip() for v in values for d in v.split(",") if d.strip()))
+    if not ids or len(ids) > BATCH_MAX_DEVICES:
+        raise HTTPException(status_code=400, detail=f"device_id must have 1..{BATCH_MAX_DEVICES} ids")
+    return ids
+
+class LastPositionRequest(BaseModel):
+    device_ids: List[str]
+    columns: Optional[str] = None
+
+# =========================
+# Consultas por área (bbox / polígono)
+# =========================
+AreaMode = Literal["devices", "points"]
+AREA_DEVICE_COLUMNS = ["device_id", "reports", "first_seen", "last_seen"]
+
+class AreaRequest(BaseModel):
+    bbox: Optional[List[float]] = None            # [min_lon, min_lat, max_lon, max_lat]
+    polygon: Optional[List[List[float]]] = None   # [[lon, lat], ...]
+    gps_epoch_start: str
+    gps_epoch_end: str
+    mode: AreaMode = "devices"
+    columns: Optional[str] = None
+    limit: int = 1000
+    offset: int = 0
+    total: TotalMode = "exact"
+
+def area_predicates(
+    bbox: Tuple[float, float, float, float], polygon: Optional[str],
+) -> Tuple[List[str], List[Any]]:
     """
+    Rangos de geo_cell (pruning por min/max en Iceberg) + refinamiento exacto
+    por latitude/longitude y, con polígono, ST_Contains. Filas sin geo_cell
+    (anteriores a la columna) entran por `IS NULL` y las filtra el refinamiento.
+    """
+    min_lon, min_lat, max_lon, max_lat = bbox
+    ranges = bbox_cell_ranges(min_lon, min_lat, max_lon, max_lat, GEO_MAX_RANGES)
+    cells = " OR ".join("geo_cell BETWEEN ? AND ?" for _ in ranges)
+    where = [
+        f"({cells} OR geo_cell IS NULL)",
+        "latitude BETWEEN ? AND ?",
+        "longitude BETWEEN ? AND ?",
+    ]
+    params: List[Any] = [v for r in ranges for v in r] + [min_lat, max_lat, min_lon, max_lon]
+    if polygon:
+        where.append("ST_Contains(ST_GeometryFromText(?), ST_Point(longitude, latitude))")
+        params.append(polygon)
+    return where, params
+
+async def area_query(
+    request: Request,
+    response: Response,
+    bbox: Tuple[float, float, float, float],
+    polygon: Optional[str],
+    gps_epoch_start: str,
+    gps_epoch_end: str,
+    mode: AreaMode,
+    columns: Optional[str],
+    limit: int,
+    offset: int,
+    total: TotalMode,
+) -> Response:
+    if limit < 1 or limit > JSON_MAX_ROWS or offset < 0:
+        raise HTTPException(status_code=400, detail=f"limit must be 1..{JSON_MAX_ROWS} and offset >= 0")
+
+    window_where, window_params, day_end_local = gps_window(gps_epoch_start, gps_epoch_end)
+    days = window_days(window_params)
+    if days > AREA_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"window must span at most {AREA_MAX_DAYS} days")
+    if bbox_tiles(*bbox) > AREA_MAX_TILES:
+        raise HTTPException(status_code=400, detail=f"area must span at most {AREA_MAX_TILES} 1° tiles")
+    if admit("telematics_real_time", days, ADMISSION_FLEET_DEVICES, offset + limit) and total == "exact":
+        total = "approx"
+
+    geo_where, geo_params = area_predicates(bbox, polygon)
+    where_sql = "WHERE " + " AND ".join([*window_where, *geo_where])
+    params: List[Any] = [*window_params, *geo_params]
+
+    if mode == "devices":
+        proj_cols = AREA_DEVICE_COLUMNS
+        sel = ", ".join(proj_cols)
+        order_sql = "device_id"
+        source = f"""(
+            SELECT device_id, count(*) AS reports, min(gps_epoch) AS first_seen, max(gps_epoch) AS last_seen
+            FROM {TRINO_CATALOG}.{TRINO_SCHEMA}.telematics_real_time
+            {where_sql}
+            GROUP BY device_id
+        ) AS area"""
+        where_sql = ""
+    else:
+        proj_cols = project("telematics_real_time", columns, TELEMATICS_COLUMNS)
+        sel = ", ".join(proj_cols)
+        order_sql = "device_id, gps_epoch DESC"
+        source = None
+
+    cache_key = None
+    if is_closed_window(day_end_local):
+        data_sql, pag_params = page_sql("telematics_real_time", sel, where_sql, order_sql, offset, limit, total, source)
+        cache_key = await result_cache_key("telematics_real_time", data_sql, [*params, *pag_params], proj_cols, versioned=True)
+    cached = RESULT_CACHE.get(cache_key) if cache_key else None
+    response.headers["X-Cache"] = "HIT" if cached is not None else ("MISS" if cache_key else "BYPASS")
+    if cached is not None:
+        return json_response(request, response, cached)
 
     try:
-        conn = trino_conn()
-        cur = conn.cursor()
+        rows, total_rows, has_more = await run_cancellable(request, fetch_page(
+            "telematics_real_time", sel, where_sql, params, order_sql, offset, limit, total, source,
+        ))
+    except Exception as e:
+        raise query_error(e)
+    body = {
+        "items": postprocess_rows(proj_cols, rows),
+        "page": {"limit": limit, "offset": offset, "total": total_rows, "has_more": has_more},
+    }
+    if cache_key:
+        RESULT_CACHE.put(cache_key, body)
+    return json_response(request, response, body)
 
-        cur.execute(count_sql, params)
-        total = cur.fetchone()[0]
+# =========================
+# Endpoints
+# =========================
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/health", tags=["system"], include_in_schema=True)
+async def health(request: Request):
+    try:
+        await run_cancellable(request, TRINO.execute("SELECT 1"))
+        return {
+            "status": "ok", "trino": TRINO.stats(), "cache": RESULT_CACHE.stats(),
+            "schema": SCHEMAS.stats(), "templates": TEMPLATES.stats(),
+        }
+    except Exception as e:
+        raise query_error(e, "trino error")
 
-        cur.execute(data_sql, [*params, *pag_params])
-        rows = cur.fetchall()
-        raw = [dict(zip(proj_cols, r)) for r in rows]
+@app.get("/telematics_real_time", tags=["telematics"])
+async def telematics_real_time(
+    request: Request,
+    response: Response,
+    token: str = Depends(require_token),
+    device_id: str = Query(..., description="Exact device_id (requerido)"),
+    gps_epoch_start: str = Query(..., description="Inicio local, ej. 2025-09-25T00:00:00"),
+    gps_epoch_end: str = Query(..., description="Fin local (inclusive)"),
+    limit: int = Query(100, ge=1, le=STREAM_MAX_ROWS, description="Máx 10k en json; hasta STREAM_MAX_ROWS en ndjson/csv/arrow"),
+    offset: int = Query(0, ge=0),
+    columns: Optional[str] = Query(None, description="Proyección separada por comas"),
+    total: TotalMode = Query("exact", description="exact: conteo en la misma query | approx: solo has_more | none: sin conteo"),
+    cursor: Optional[str] = Query(None, description="page.next_cursor de la página anterior (reemplaza a offset)"),
+    fmt: Literal["json", "ndjson", "csv", "arrow"] = Query("json", alias="format", description="json paginado o exportación por streaming"),
+    resolution: Optional[int] = Query(None, ge=1, le=86400, description="Downsampling en Trino: un punto por bucket de N segundos (+ inicio/fin y ALERT)"),
+    resolution_agg: DownsampleAgg = Query("last", description="Punto por bucket: first | last | avg (lat/lon/velocidad promedio)"),
+    simplify: Optional[float] = Query(None, gt=0, le=100000, description="Douglas-Peucker sobre latitude/longitude con tolerancia en metros"),
+    shape: ResponseShape = Query("objects", description="json: objects (items) | rows (columns + data por fila) | columns (data por columna)"),
+):
+    if cursor and offset:
+        raise HTTPException(status_code=400, detail="Use either cursor or offset, not both")
+    if fmt == "json" and limit > JSON_MAX_ROWS:
+        raise HTTPException(status_code=400, detail=f"limit must be <= {JSON_MAX_ROWS} for format=json (use ndjson/csv/arrow)")
+
+    proj_cols = project("telematics_real_time", columns, TELEMATICS_COLUMNS)
+    if resolution:
+        # La subconsulta de downsampling solo expone DOWNSAMPLE_COLUMNS
+        missing = [c for c in proj_cols if c not in DOWNSAMPLE_COLUMNS]
+        if missing:
+            raise HTTPException(
+                status_code=400,
+                detail=f"column(s) not available with resolution: {', '.join(missing)} (available: {', '.join(DOWNSAMPLE_COLUMNS)})",
+            )
+    query_cols = keyset_columns("telematics_real_time", proj_cols)
+    if simplify:
+        query_cols, track_idx = simplify_columns(query_cols)
+    sel = ", ".join(query_cols)
+    order_sql = keyset_order("telematics_real_time")
+
+    window_where, window_params, day_end_local = gps_window(gps_epoch_start, gps_epoch_end)
+    if admit("telematics_real_time", window_days(window_params), 1, offset + limit) and total == "exact":
+        total = "approx"
+    where = ["device_id = ?", *window_where]
+    params: List[Any] = [device_id, *window_params]
+
+    source = None
+    if resolution:
+        # La ventana va dentro de la subconsulta; el cursor, afuera
+        source = downsample_source("WHERE " + " AND ".join(where), resolution, resolution_agg)
+        where = []
+
+    carry_total, carried_total = False, None
+    if cursor:
+        pred, pred_params = keyset_predicate("telematics_real_time", cursor)
+        where.append(pred)
+        params.extend(pred_params)
+        if total == "exact":
+            carry_total, carried_total, total = True, cursor_total("telematics_real_time", cursor), "approx"
+
+    where_sql = ("WHERE " + " AND ".join(where)) if where else ""
+
+    if fmt != "json":
+        data_sql, pag_params = page_sql(
+            "telematics_real_time", sel, where_sql, order_sql, offset, limit, "none", source,
+        )
+        if simplify:
+            encode = lambda pages: encode_stream(simplify_pages(pages, *track_idx, simplify), proj_cols, fmt, postprocess_rows)
+        else:
+            encode = lambda pages: encode_stream(pages, proj_cols, fmt, postprocess_rows)
+        return await stream_query(request, data_sql, [*params, *pag_params], encode, MEDIA_TYPES[fmt])
+
+    cache_key = None
+    if is_closed_window(day_end_local):
+        data_sql, pag_params = page_sql("telematics_real_time", sel, where_sql, order_sql, offset, limit, total, source)
+        cache_key = await result_cache_key(
+            "telematics_real_time", data_sql, [*params, *pag_params], proj_cols, versioned=True,
+            variant=(simplify, shape, carried_total),
+        )
+    cached = RESULT_CACHE.get(cache_key) if cache_key else None
+    response.headers["X-Cache"] = "HIT" if cached is not None else ("MISS" if cache_key else "BYPASS")
+    if cached is not None:
+        return json_response(request, response, cached)
+
+    try:
+        rows, total_rows, has_more = await run_cancellable(request, fetch_page(
+            "telematics_real_time", sel, where_sql, params,
+            order_sql, offset, limit, total, source,
+        ))
+        if carry_total:
+            total_rows = carried_total
+        # El cursor sale de las filas de Trino; simplify solo reduce lo que se devuelve
+        cursor_next = next_cursor("telematics_real_time", query_cols, rows, limit, has_more, total_rows)
+        if simplify:
+            rows = simplify_rows(rows, *track_idx, simplify)
+        page = {
+            "limit": limit, "offset": offset, "total": total_rows, "has_more": has_more,
+            "next_cursor": cursor_next,
+        }
         # Formateo final de timestamps como en la BD: "YYYY-MM-DD HH:MM:SS.mmm -0600"
-        result = [postprocess_row(item) for item in raw]
-        return {"items": result, "page": {"limit": limit, "offset": offset, "total": total}}
+        body = shaped_body(shape, proj_cols, rows, page)
+        if cache_key:
+            RESULT_CACHE.put(cache_key, body)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"trino query error: {e}")
+        raise query_error(e)
+    return json_response(request, response, body)
+
+
+@app.post("/telematics_real_time/batch", tags=["telematics"])
+async def telematics_real_time_batch(
+    request: Request,
+    body: DeviceBatchRequest,
+    token: str = Depends(require_token),
+):
+    """
+    Varios devices en una sola query (`device_id IN (...)` + `device_id_bucket IN (...)`
+    para podar particiones). Respuesta NDJSON: una línea por device
+    `{"device_id": ..., "items": [...]}`, en orden de device_id.
+    `limit` aplica al total de filas de la respuesta; si se alcanza, la última
+    línea es `{"truncated": true, "limit": ..., "next_device_id": ...}`.
+    """
+    proj_cols = project("telematics_real_time", body.columns, TELEMATICS_COLUMNS)
+    query_cols = proj_cols if "device_id" in proj_cols else proj_cols + ["device_id"]
+    sel = ", ".join(query_cols)
+
+    buckets = sorted({device_id_bucket(d) for d in body.device_ids})
+    window_where, window_params, _ = gps_window(body.gps_epoch_start, body.gps_epoch_end)
+    # `limit` ya es el tope de filas de toda la respuesta: no se multiplica por devices
+    admit("telematics_real_time", window_days(window_params), 1, body.limit)
+    where = [
+        f"device_id_bucket IN ({', '.join('?' for _ in buckets)})",
+        f"device_id IN ({', '.join('?' for _ in body.device_ids)})",
+        *window_where,
+    ]
+    params: List[Any] = [*buckets, *body.device_ids, *window_params]
+    where_sql = "WHERE " + " AND ".join(where)
+
+    # limit + 1 filas ("approx"): la de más indica que la respuesta se cortó
+    data_sql, pag_params = page_sql(
+        "telematics_real_time", sel, where_sql, "device_id, gps_epoch DESC", 0, body.limit, "approx",
+    )
+    key_index = query_cols.index("device_id")
+    return await stream_query(
+        request, data_sql, [*params, *pag_params],
+        lambda pages: encode_grouped_ndjson(pages, proj_cols, key_index, postprocess_rows, body.limit),
+        MEDIA_TYPES["ndjson"],
+    )
+
+
+async def last_positions(request: Request, response: Response, device_ids: List[str], columns: Optional[str]) -> Response:
+    """
+    Una fila por device desde `device_last_state` (tabla upsert que mantiene
+    sink_device_last_state.sql): lectura por PK + bucket, sin importar cuánto
+    histórico exista en telematics_real_time.
+    """
+    proj_cols = project("device_last_state", columns, LAST_STATE_COLUMNS)
+    query_cols = proj_cols if "device_id" in proj_cols else proj_cols + ["device_id"]
+    sel = ", ".join(query_cols)
+
+    buckets = sorted({device_id_bucket(d) for d in device_ids})
+    sql = TEMPLATES.get(("last_state", sel, len(buckets), len(device_ids)), lambda: (
+        f"SELECT {sel} FROM {TRINO_CATALOG}.{TRINO_SCHEMA}.device_last_state "
+        f"WHERE device_id_bucket IN ({', '.join('?' for _ in buckets)}) "
+        f"AND device_id IN ({', '.join('?' for _ in device_ids)}) "
+        f"ORDER BY device_id"
+    ))
+    params: List[Any] = [*buckets, *device_ids]
+    admit("device_last_state", 1, len(device_ids), len(device_ids))
+
+    cache_key = await result_cache_key("device_last_state", sql, params, proj_cols, versioned=True)
+    cached = RESULT_CACHE.get(cache_key) if cache_key else None
+    response.headers["X-Cache"] = "HIT" if cached is not None else ("MISS" if cache_key else "BYPASS")
+    if cached is not None:
+        return json_response(request, response, cached)
+
+    try:
+        with stage("trino_data"):
+            res = await run_cancellable(request, TRINO.execute(sql, params))
+    except Exception as e:
+        raise query_error(e)
+
+    key_index = query_cols.index("device_id")
+    found = {r[key_index] for r in res.rows}
+    body = {
+        "items": postprocess_rows(proj_cols, res.rows),
+        "missing": [d for d in device_ids if d not in found],
+    }
+    if cache_key:
+        RESULT_CACHE.put(cache_key, body)
+    return json_response(request, response, body)
+
+
+@app.get("/devices/last_position", tags=["devices"])
+async def devices_last_position(
+    request: Request,
+    response: Response,
+    token: str = Depends(require_token),
+    device_id: List[str] = Query(..., description="Uno o varios device_id (parámetro repetido o separado por comas)"),
+    columns: Optional[str] = Query(None, description="Proyección separada por comas"),
+):
+    return await last_positions(request, response, clean_device_ids(device_id), columns)
+
+
+@app.post("/devices/last_position", tags=["devices"])
+async def devices_last_position_batch(
+    request: Request,
+    response: Response,
+    body: LastPositionRequest,
+    token: str = Depends(require_token),
+):
+    return await last_positions(request, response, clean_device_ids(body.device_ids), body.columns)
+
+
+@app.get("/telematics_real_time/area", tags=["telematics"])
+async def telematics_real_time_area(
+    request: Request,
+    response: Response,
+    token: str = Depends(require_token),
+    bbox: str = Query(..., description="min_lon,min_lat,max_lon,max_lat"),
+    gps_epoch_start: str = Query(..., description="Inicio local, ej. 2025-09-25T00:00:00"),
+    gps_epoch_end: str = Query(..., description="Fin local (inclusive)"),
+    mode: AreaMode = Query("devices", description="devices: un registro por device (reportes, primera/última vez) | points: filas"),
+    columns: Optional[str] = Query(None, description="Proyección separada por comas (mode=points)"),
+    limit: int = Query(1000, ge=1, le=JSON_MAX_ROWS),
+    offset: int = Query(0, ge=0),
+    total: TotalMode = Query("exact", description="exact: conteo en la misma query | approx: solo has_more | none: sin conteo"),
+):
+    """Devices (o puntos) dentro de un bbox en la ventana gps_epoch."""
+    try:
+        box = parse_bbox(bbox)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await area_query(request, response, box, None, gps_epoch_start, gps_epoch_end, mode, columns, limit, offset, total)
+
+
+@app.post("/telematics_real_time/area", tags=["telematics"])
+async def telematics_real_time_area_polygon(
+    request: Request,
+    response: Response,
+    body: AreaRequest,
+    token: str = Depends(require_token),
+):
+    """Igual que GET, con `bbox` o `polygon` ([[lon, lat], ...]) en el body."""
+    try:
+        if body.polygon:
+            wkt, box = polygon_wkt(body.polygon), polygon_bbox(body.polygon)
+        elif body.bbox and len(body.bbox) == 4:
+            wkt, box = None, validate_bbox(*body.bbox)
+        else:
+            raise ValueError("provide polygon or bbox [min_lon, min_lat, max_lon, max_lat]")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await area_query(
+        request, response, box, wkt, body.gps_epoch_start, body.gps_epoch_end,
+        body.mode, body.columns, body.limit, body.offset, body.total,
+    )
 
 
 @app.get("/risk_score_daily", tags=["risk"])
-def risk_score_daily(
+async def risk_score_daily(
+    request: Request,
+    response: Response,
     token: str = Depends(require_token),
     device_id: Optional[str] = Query(None),
     report_date_start: Optional[date] = Query(None),
@@ -317,16 +1236,32 @@ def risk_score_daily(
     limit: int = Query(100, ge=1, le=10000),   # ⬆ 10k
     offset: int = Query(0, ge=0),
     columns: Optional[str] = Query(None),
+    total: TotalMode = Query("exact", description="exact: conteo en la misma query | approx: solo has_more | none: sin conteo"),
+    cursor: Optional[str] = Query(None, description="page.next_cursor de la página anterior (reemplaza a offset)"),
+    shape: ResponseShape = Query("objects", description="json: objects (items) | rows (columns + data por fila) | columns (data por columna)"),
 ):
+    if cursor and offset:
+        raise HTTPException(status_code=400, detail="Use either cursor or offset, not both")
+
     if not device_id and not (report_date_start or report_date_end):
         raise HTTPException(status_code=400, detail="Provide device_id or report_date range")
 
     if report_date_start and report_date_end and report_date_start > report_date_end:
         raise HTTPException(status_code=400, detail="report_date_start must be <= report_date_end")
 
+    if report_date_start and report_date_end:
+        days = (report_date_end - report_date_start).days + 1
+    elif report_date_start:
+        days = max((date.today() - report_date_start).days + 1, 1)
+    else:
+        days = ADMISSION_OPEN_RANGE_DAYS
+    if admit("risk_score_daily", days, 1 if device_id else ADMISSION_FLEET_DEVICES, offset + limit) and total == "exact":
+        total = "approx"
+
     base_cols = ["device_id", "report_date", "score", "level", "total_reports", "overspeed_reports", "night_reports"]
-    proj_cols = [c.strip() for c in (columns.split(",") if columns else base_cols) if c.strip()]
-    sel = ", ".join(proj_cols)
+    proj_cols = project("risk_score_daily", columns, base_cols)
+    query_cols = keyset_columns("risk_score_daily", proj_cols)
+    sel = ", ".join(query_cols)
 
     where = []
     params: List[Any] = []
@@ -343,32 +1278,39 @@ def risk_score_daily(
     elif report_date_end:
         where.append("report_date <= CAST(? AS date)")
         params.append(report_date_end.isoformat())
+    carry_total, carried_total = False, None
+    if cursor:
+        pred, pred_params = keyset_predicate("risk_score_daily", cursor)
+        where.append(pred)
+        params.extend(pred_params)
+        if total == "exact":
+            carry_total, carried_total, total = True, cursor_total("risk_score_daily", cursor), "approx"
 
     where_sql = ("WHERE " + " AND ".join(where)) if where else ""
 
-    count_sql = f"SELECT count(*) FROM {TRINO_CATALOG}.{TRINO_SCHEMA}.risk_score_daily {where_sql}"
-
-    pag_sql, pag_params = pagination_clause(offset, limit)
-
-    data_sql = f"""
-        SELECT {sel}
-        FROM {TRINO_CATALOG}.{TRINO_SCHEMA}.risk_score_daily
-        {where_sql}
-        ORDER BY device_id, report_date DESC
-        {pag_sql}
-    """
+    data_sql, pag_params = page_sql("risk_score_daily", sel, where_sql, keyset_order("risk_score_daily"), offset, limit, total)
+    cache_key = await result_cache_key(
+        "risk_score_daily", data_sql, [*params, *pag_params], proj_cols, versioned=True, variant=(shape, carried_total),
+    )
+    cached = RESULT_CACHE.get(cache_key) if cache_key else None
+    response.headers["X-Cache"] = "HIT" if cached is not None else ("MISS" if cache_key else "BYPASS")
+    if cached is not None:
+        return json_response(request, response, cached)
 
     try:
-        conn = trino_conn()
-        cur = conn.cursor()
-
-        cur.execute(count_sql, params)
-        total = cur.fetchone()[0]
-
-        cur.execute(data_sql, [*params, *pag_params])
-        rows = cur.fetchall()
-        raw = [dict(zip(proj_cols, r)) for r in rows]
-        result = raw
-        return {"items": result, "page": {"limit": limit, "offset": offset, "total": total}}
+        rows, total_rows, has_more = await run_cancellable(request, fetch_page(
+            "risk_score_daily", sel, where_sql, params,
+            keyset_order("risk_score_daily"), offset, limit, total,
+        ))
+        if carry_total:
+            total_rows = carried_total
+        page = {
+            "limit": limit, "offset": offset, "total": total_rows, "has_more": has_more,
+            "next_cursor": next_cursor("risk_score_daily", query_cols, rows, limit, has_more, total_rows),
+        }
+        body = shaped_body(shape, proj_cols, rows, page)
+        if cache_key:
+            RESULT_CACHE.put(cache_key, body)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"trino query error: {e}")
\ No newline at end of file
+        raise query_error(e)
+    return json_response(request, response, body)
\ No newline at end of file
@@ -0,0 +1,202 @@
+import json
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator
+
+from prometheus_client import Counter, Gauge, Histogram
+from starlette.routing import Match
+
+from trino_async import AsyncTrino, QueryTrace
+
+# Ruta (plantilla) del request en curso; la fija MetricsMiddleware y la heredan
+# las tasks que lanza el handler (run_cancellable), así que las etapas y las
+# queries de Trino quedan etiquetadas con su endpoint.
+ENDPOINT: ContextVar[str] = ContextVar("metrics_endpoint", default="other")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+REQUEST_LATENCY = Histogram(
+    "telematics_api_request_duration_seconds",
+    "Duración del request completo (hasta el último byte del body)",
+    ["endpoint", "method", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+STAGE_LATENCY = Histogram(
+    "telematics_api_stage_duration_seconds",
+    "Duración por etapa del request (queue_wait, trino_first_page, trino_data, trino_count, postprocess, encode, compress)",
+    ["endpoint", "stage"],
+    buckets=LATENCY_BUCKETS,
+)
+TRINO_QUERIES = Counter(
+    "telematics_api_trino_queries_total",
+    "Queries enviadas a Trino por resultado (ok | error | cancelled)",
+    ["endpoint", "outcome"],
+)
+TRINO_QUEUED = Histogram(
+    "telematics_api_trino_queued_seconds",
+    "queuedTimeMillis reportado por Trino",
+    ["endpoint"],
+    buckets=LATENCY_BUCKETS,
+)
+TRINO_CPU = Histogram(
+    "telematics_api_trino_cpu_seconds",
+    "cpuTimeMillis reportado por Trino",
+    ["endpoint"],
+    buckets=LATENCY_BUCKETS,
+)
+TRINO_PROCESSED_ROWS = Counter(
+    "telematics_api_trino_processed_rows_total",
+    "processedRows reportado por Trino (filas leídas, no devueltas)",
+    ["endpoint"],
+)
+TRINO_PROCESSED_BYTES = Counter(
+    "telematics_api_trino_processed_bytes_total",
+    "processedBytes reportado por Trino",
+    ["endpoint"],
+)
+TRINO_RETURNED_ROWS = Counter(
+    "telematics_api_trino_returned_rows_total",
+    "Filas devueltas por Trino a la API",
+    ["endpoint"],
+)
+SLOW_QUERIES = Counter(
+    "telematics_api_slow_queries_total",
+    "Queries sobre el umbral del slow-query log",
+    ["endpoint"],
+)
+ADMISSION = Counter(
+    "telematics_api_admission_total",
+    "Decisiones de admisión por cliente (admitted | downgraded | rejected_cost | rejected_queue | timeout)",
+    ["endpoint", "client", "outcome"],
+)
+TRINO_CONNECTIONS = Gauge(
+    "telematics_api_trino_connections",
+    "Conexiones HTTP keep-alive hacia Trino por estado (in_use | idle)",
+    ["state"],
+)
+
+slow_log = logging.getLogger("telematics_api.slow_query")
+if not slow_log.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+    slow_log.addHandler(_handler)
+    slow_log.setLevel(logging.INFO)
+    slow_log.propagate = False
+
+
+def count_admission(client: str, outcome: str) -> None:
+    ADMISSION.labels(ENDPOINT.get(), client, outcome).inc()
+
+
+def track_connections(trino: AsyncTrino) -> None:
+    """Gauges de conexiones en uso / ociosas, leídas del cliente en cada scrape."""
+    for state in ("in_use", "idle"):
+        TRINO_CONNECTIONS.labels(state).set_function(lambda state=state: trino.connection_stats()[state])
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Mide una etapa del request en curso."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.labels(ENDPOINT.get(), name).observe(time.perf_counter() - t0)
+
+
+class QueryObserver:
+    """
+    Callback `on_complete` de AsyncTrino: etapas de espera/primera página,
+    stats de Trino por endpoint y slow-query log (SQL + parámetros + query id).
+    `slow_ms <= 0` desactiva el log.
+    """
+
+    def __init__(self, slow_ms: float, max_param_chars: int = 2000):
+        self.slow_ms = slow_ms
+        self.max_param_chars = max_param_chars
+
+    def __call__(self, trace: QueryTrace) -> None:
+        endpoint = ENDPOINT.get()
+        STAGE_LATENCY.labels(endpoint, "queue_wait").observe(trace.queue_wait_s)
+        if trace.first_page_s is not None:
+            STAGE_LATENCY.labels(endpoint, "trino_first_page").observe(trace.first_page_s)
+        TRINO_QUERIES.labels(endpoint, trace.outcome).inc()
+        TRINO_RETURNED_ROWS.labels(endpoint).inc(trace.rows)
+
+        st = trace.stats or {}
+        if "queuedTimeMillis" in st:
+            TRINO_QUEUED.labels(endpoint).observe(st["queuedTimeMillis"] / 1000.0)
+        if "cpuTimeMillis" in st:
+            TRINO_CPU.labels(endpoint).observe(st["cpuTimeMillis"] / 1000.0)
+        TRINO_PROCESSED_ROWS.labels(endpoint).inc(st.get("processedRows", 0))
+        TRINO_PROCESSED_BYTES.labels(endpoint).inc(st.get("processedBytes", 0))
+
+        if self.slow_ms > 0 and trace.elapsed_s * 1000 >= self.slow_ms:
+            SLOW_QUERIES.labels(endpoint).inc()
+            slow_log.warning(self.format(endpoint, trace))
+
+    def format(self, endpoint: str, trace: QueryTrace) -> str:
+        st = trace.stats or {}
+        params = json.dumps(list(trace.params or []), default=str, ensure_ascii=False)
+        if len(params) > self.max_param_chars:
+            params = params[: self.max_param_chars] + "...(truncated)"
+        return json.dumps({
+            "endpoint": endpoint,
+            "query_id": trace.query_id,
+            "outcome": trace.outcome,
+            "elapsed_ms": round(trace.elapsed_s * 1000, 1),
+            "queue_wait_ms": round(trace.queue_wait_s * 1000, 1),
+            "first_page_ms": None if trace.first_page_s is None else round(trace.first_page_s * 1000, 1),
+            "trino_queued_ms": st.get("queuedTimeMillis"),
+            "trino_cpu_ms": st.get("cpuTimeMillis"),
+            "processed_rows": st.get("processedRows"),
+            "processed_bytes": st.get("processedBytes"),
+            "rows": trace.rows,
+            "error": trace.error,
+            "client_tags": trace.client_tags,
+            "statement": trace.statement,
+            "sql": " ".join(trace.sql.split()),
+            "params": params,
+        }, ensure_ascii=False)
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI (sin BaseHTTPMiddleware, para no bufferizar streaming):
+    fija ENDPOINT con la plantilla de la ruta y mide hasta el último chunk.
+    """
+
+    def __init__(self, app: Any, exclude: tuple = ("/metrics",)):
+        self.app = app
+        self.exclude = exclude
+
+    def _endpoint(self, scope: dict) -> str:
+        app = scope.get("app")
+        for route in getattr(getattr(app, "router", None), "routes", []):
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return getattr(route, "path", "other")
+        return "other"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path") in self.exclude:
+            await self.app(scope, receive, send)
+            return
+
+        endpoint = self._endpoint(scope)
+        token = ENDPOINT.set(endpoint)
+        t0 = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUEST_LATENCY.labels(endpoint, scope.get("method", ""), str(status["code"])).observe(time.perf_counter() - t0)
+            ENDPOINT.reset(token)
@@ -0,0 +1,160 @@
+import asyncio
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Set
+
+from trino_async import AsyncTrino, PreparedStatement, prepare
+
+# Columnas que se aceptan en `columns` (se comparan en minúsculas, como Trino)
+IDENTIFIER = re.compile(r"^[a-z_][a-z0-9_]*$")
+
+
+class ProjectionError(ValueError):
+    """`columns` con nombres inválidos o que no existen en la tabla."""
+
+
+class SchemaCatalog:
+    """
+    Columnas y tipos de las tablas de la API según `information_schema`.
+
+    Se carga al arrancar y se refresca cada `refresh_s` en segundo plano; si
+    Trino no responde se conserva el último esquema conocido. Mientras no haya
+    esquema, la validación de proyecciones se limita a la sintaxis de los
+    identificadores (y Trino reporta las columnas inexistentes).
+    """
+
+    def __init__(self, trino: AsyncTrino, catalog: str, schema: str, tables: Sequence[str], refresh_s: float = 300.0):
+        self.trino = trino
+        self.catalog = catalog
+        self.schema = schema
+        self.tables = list(tables)
+        self.refresh_s = refresh_s
+        self.version = 0
+        self._columns: Dict[str, Dict[str, str]] = {}
+        self._timestamps: Set[str] = set()
+        self._task: Optional["asyncio.Task[None]"] = None
+
+        # Métricas
+        self.loaded_at: Optional[float] = None
+        self.errors = 0
+
+    async def load(self) -> bool:
+        sql = (
+            f"SELECT table_name, column_name, data_type FROM {self.catalog}.information_schema.columns "
+            f"WHERE table_schema = ? AND table_name IN ({', '.join('?' for _ in self.tables)}) "
+            f"ORDER BY table_name, ordinal_position"
+        )
+        try:
+            res = await self.trino.execute(sql, [self.schema, *self.tables])
+        except Exception:
+            self.errors += 1
+            return False
+        columns: Dict[str, Dict[str, str]] = {}
+        for table, column, data_type in res.rows:
+            columns.setdefault(table, {})[column] = data_type
+        self.loaded_at = time.time()
+        if columns != self._columns:
+            self._columns = columns
+            self._timestamps = {c for cols in columns.values() for c, t in cols.items() if t.startswith("timestamp")}
+            self.version += 1
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            await self.load()
+            await asyncio.sleep(self.refresh_s)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def columns(self, table: str) -> Optional[Dict[str, str]]:
+        return self._columns.get(table)
+
+    def timestamp_columns(self) -> Set[str]:
+        return self._timestamps
+
+    def projection(self, table: str, columns: Optional[str], default: Sequence[str]) -> List[str]:
+        """
+        Proyección normalizada (minúsculas, sin duplicados, en orden) a partir
+        de `columns` separado por comas; `default` si no se pidió.
+        """
+        if not columns:
+            return list(default)
+        names = list(dict.fromkeys(c.strip().lower() for c in columns.split(",") if c.strip()))
+        if not names:
+            raise ProjectionError("columns must list at least one column")
+        invalid = [c for c in names if not IDENTIFIER.match(c)]
+        if invalid:
+            raise ProjectionError(f"invalid column name(s): {', '.join(invalid)}")
+        known = self.columns(table)
+        if known is not None:
+            unknown = [c for c in names if c not in known]
+            if unknown:
+                raise ProjectionError(
+                    f"unknown column(s) for {table}: {', '.join(unknown)} (available: {', '.join(known)})"
+                )
+        return names
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tables": {t: len(cols) for t, cols in self._columns.items()},
+            "version": self.version,
+            "loaded_at": self.loaded_at,
+            "errors": self.errors,
+        }
+
+
+class TemplateCache:
+    """
+    LRU de SQL ya armado por (endpoint, proyección, forma del filtro) ->
+    PreparedStatement. Los requests con la misma forma reusan el texto, el
+    nombre del statement y el header ya codificado; solo cambian los parámetros.
+    """
+
+    def __init__(self, max_entries: int = 512, max_header_bytes: int = 4096):
+        self.max_entries = max_entries
+        self.max_header_bytes = max_header_bytes
+        self._data: "OrderedDict[Hashable, PreparedStatement]" = OrderedDict()
+
+        # Métricas
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, build: Callable[[], str]) -> PreparedStatement:
+        stmt = self._data.get(key)
+        if stmt is not None:
+            self._data.move_to_end(key)
+            self.hits += 1
+            return stmt
+        self.misses += 1
+        stmt = prepare(build(), self.max_header_bytes)
+        if self.max_entries > 0:
+            self._data[key] = stmt
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+        return stmt
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "prepared": sum(1 for s in self._data.values() if s.header is not None),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,132 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+
+class ResultCache:
+    """
+    Caché LRU de respuestas con TTL.
+
+    Cada entrada expira a los `ttl_s` segundos o al cambiar de día en la zona
+    local (lo que ocurra primero), como red de seguridad para entradas cuyo
+    key no incluye la versión de la tabla.
+    """
+
+    def __init__(self, max_entries: int, ttl_s: float, tz: Any):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.tz = tz
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+        # Métricas
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        raw = json.dumps(parts, default=str, separators=(",", ":"), sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _expires_at(self) -> float:
+        now = time.time()
+        local_now = datetime.fromtimestamp(now, self.tz)
+        midnight = self.tz.localize(datetime.combine(local_now.date() + timedelta(days=1), datetime.min.time()))
+        return min(now + self.ttl_s, midnight.timestamp())
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if time.time() >= expires_at:
+            del self._data[key]
+            self.expired += 1
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        if self.max_entries <= 0:
+            return
+        self._data[key] = (self._expires_at(), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expired": self.expired,
+        }
+
+
+class TableVersions:
+    """
+    Snapshot actual de cada tabla Iceberg según Nessie (sin pasar por Trino).
+
+    Se consulta `GET {uri}/trees/{ref}/contents/{namespace}.{table}` y el
+    resultado se recuerda `refresh_s` segundos. Si Nessie no responde se
+    devuelve None y el llamador no debe cachear.
+    """
+
+    def __init__(self, uri: str, ref: str, namespace: str, refresh_s: float = 30.0, timeout_s: float = 2.0):
+        self.uri = uri.rstrip("/")
+        self.ref = ref
+        self.namespace = namespace
+        self.refresh_s = refresh_s
+        self._client: Optional[httpx.AsyncClient] = None
+        self._timeout = httpx.Timeout(timeout_s)
+        self._versions: Dict[str, Tuple[float, Optional[str]]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self._timeout)
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _fetch(self, table: str) -> Optional[str]:
+        try:
+            resp = await self.client.get(f"{self.uri}/trees/{self.ref}/contents/{self.namespace}.{table}")
+            resp.raise_for_status()
+            content = resp.json().get("content", {})
+        except Exception:
+            return None
+        version = content.get("snapshotId", content.get("metadataLocation"))
+        return None if version is None else str(version)
+
+    async def get(self, table: str) -> Optional[str]:
+        cached = self._versions.get(table)
+        if cached and time.monotonic() - cached[0] < self.refresh_s:
+            return cached[1]
+        lock = self._locks.setdefault(table, asyncio.Lock())
+        async with lock:
+            cached = self._versions.get(table)
+            if cached and time.monotonic() - cached[0] < self.refresh_s:
+                return cached[1]
+            version = await self._fetch(table)
+            self._versions[table] = (time.monotonic(), version)
+            return version
@@ -0,0 +1,116 @@
+from typing import Any, AsyncIterator, List
+
+import numpy as np
+
+from trino_async import QueryResult
+
+EARTH_RADIUS_M = 6371008.8
+
+
+def douglas_peucker_mask(lat: np.ndarray, lon: np.ndarray, tolerance_m: float) -> np.ndarray:
+    """
+    Máscara de puntos a conservar (Douglas-Peucker) con tolerancia en metros.
+
+    Las coordenadas se proyectan a un plano equirectangular centrado en la
+    latitud media del tramo (error despreciable a escala de un recorrido) y
+    cada segmento se evalúa con operaciones vectorizadas sobre todos sus
+    puntos intermedios. Primer y último punto siempre se conservan.
+    """
+    n = len(lat)
+    keep = np.zeros(n, dtype=bool)
+    if n <= 2:
+        keep[:] = True
+        return keep
+
+    lat_r = np.radians(lat)
+    y = lat_r * EARTH_RADIUS_M
+    x = np.radians(lon) * np.cos(lat_r.mean()) * EARTH_RADIUS_M
+
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        i, j = stack.pop()
+        if j - i < 2:
+            continue
+        dx, dy = x[j] - x[i], y[j] - y[i]
+        px, py = x[i + 1:j] - x[i], y[i + 1:j] - y[i]
+        seg2 = dx * dx + dy * dy
+        if seg2 == 0.0:
+            d = np.hypot(px, py)
+        else:
+            t = np.clip((px * dx + py * dy) / seg2, 0.0, 1.0)
+            d = np.hypot(px - t * dx, py - t * dy)
+        k = int(np.argmax(d))
+        if d[k] > tolerance_m:
+            m = i + 1 + k
+            keep[m] = True
+            stack.append((i, m))
+            stack.append((m, j))
+    return keep
+
+
+def simplify_rows(
+    rows: List[List[Any]],
+    lat_index: int,
+    lon_index: int,
+    type_index: int,
+    key_index: int,
+    tolerance_m: float,
+) -> List[List[Any]]:
+    """
+    Simplifica cada recorrido (filas consecutivas con el mismo `key_index`,
+    es decir ordenadas por device_id) sin cambiar el orden de las filas.
+
+    Se conservan siempre: primer y último punto de cada recorrido, filas
+    ALERT y filas sin coordenadas (no participan en la simplificación).
+    """
+    if len(rows) <= 2:
+        return rows
+    out: List[List[Any]] = []
+    start = 0
+    n = len(rows)
+    while start < n:
+        end = start + 1
+        key = rows[start][key_index]
+        while end < n and rows[end][key_index] == key:
+            end += 1
+        track = rows[start:end]
+
+        coords = [i for i, r in enumerate(track) if r[lat_index] is not None and r[lon_index] is not None]
+        keep = np.ones(len(track), dtype=bool)
+        if len(coords) > 2:
+            idx = np.fromiter(coords, dtype=np.int64, count=len(coords))
+            lat = np.fromiter((track[i][lat_index] for i in coords), dtype=np.float64, count=len(coords))
+            lon = np.fromiter((track[i][lon_index] for i in coords), dtype=np.float64, count=len(coords))
+            keep[idx] = douglas_peucker_mask(lat, lon, tolerance_m)
+            keep[0] = keep[-1] = True
+            for i, r in enumerate(track):
+                if r[type_index] == "ALERT":
+                    keep[i] = True
+        out.extend(r for r, k in zip(track, keep) if k)
+        start = end
+    return out
+
+
+async def simplify_pages(
+    pages: AsyncIterator[QueryResult],
+    lat_index: int,
+    lon_index: int,
+    type_index: int,
+    key_index: int,
+    tolerance_m: float,
+) -> AsyncIterator[QueryResult]:
+    """
+    Versión por streaming: simplifica cada página de Trino por separado.
+    Los extremos de cada página se conservan, así que el resultado sigue
+    dentro de la tolerancia (con algunos puntos extra en los cortes) y la
+    memoria pico sigue siendo la de una página.
+    """
+    async for page in pages:
+        yield QueryResult(
+            page.columns,
+            simplify_rows(page.rows, lat_index, lon_index, type_index, key_index, tolerance_m),
+            page.query_id,
+            page.stats,
+            page.types,
+        )
@@ -0,0 +1,177 @@
+import csv
+import io
+import re
+from typing import Any, AsyncIterator, Callable, Dict, List, Literal, Optional
+
+import pyarrow as pa
+
+from encoding import dumps
+from trino_async import QueryResult
+
+# Formatos de exportación por streaming
+StreamFormat = Literal["ndjson", "csv", "arrow"]
+
+MEDIA_TYPES: Dict[str, str] = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+
+# =========================
+# Tipos Trino -> Arrow
+# =========================
+_DECIMAL = re.compile(r"^decimal\((\d+),\s*(\d+)\)$")
+
+
+def arrow_type(trino_type: str) -> pa.DataType:
+    t = trino_type.lower()
+    m = _DECIMAL.match(t)
+    if m:
+        return pa.decimal128(int(m.group(1)), int(m.group(2)))
+    if t.startswith("timestamp") and t.endswith("with time zone"):
+        return pa.timestamp("us", tz="UTC")
+    if t.startswith("timestamp"):
+        return pa.timestamp("us")
+    if t.startswith("varchar") or t.startswith("char"):
+        return pa.string()
+    return {
+        "boolean": pa.bool_(),
+        "tinyint": pa.int8(),
+        "smallint": pa.int16(),
+        "integer": pa.int32(),
+        "bigint": pa.int64(),
+        "real": pa.float32(),
+        "double": pa.float64(),
+        "date": pa.date32(),
+    }.get(t, pa.string())
+
+
+def arrow_array(values: List[Any], type_: pa.DataType) -> pa.Array:
+    # Tipos sin equivalente (array, map, json, uuid, ...) van como texto
+    if pa.types.is_string(type_) and any(v is not None and not isinstance(v, str) for v in values):
+        values = [None if v is None else str(v) for v in values]
+    return pa.array(values, type=type_)
+
+
+class _Drain(io.RawIOBase):
+    """Sink en memoria que se vacía tras cada batch (el writer IPC escribe aquí)."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def take(self) -> bytes:
+        out = b"".join(self._chunks)
+        self._chunks.clear()
+        return out
+
+
+# =========================
+# Encoders (una página de Trino -> un chunk de bytes)
+# =========================
+async def encode_stream(
+    pages: AsyncIterator[QueryResult],
+    columns: List[str],
+    fmt: StreamFormat,
+    format_rows: Callable[[List[str], List[List[Any]]], List[Dict[str, Any]]],
+) -> AsyncIterator[bytes]:
+    """
+    Convierte las páginas de Trino en chunks del formato pedido sin acumular
+    el resultado: la memoria pico es la de una página (`nextUri`) de Trino.
+
+    `columns` es la proyección pedida; columnas extra al final de cada fila
+    (p.ej. las del cursor) se descartan. `format_rows` aplica el formateo de
+    timestamps de los endpoints JSON (ndjson/csv); arrow conserva los tipos.
+    """
+    n = len(columns)
+    drain = _Drain()
+    writer: Optional[pa.ipc.RecordBatchStreamWriter] = None
+    schema: Optional[pa.Schema] = None
+
+    if fmt == "csv":
+        buf = io.StringIO()
+        csv.writer(buf).writerow(columns)
+        yield buf.getvalue().encode("utf-8")
+
+    async for page in pages:
+        if fmt == "arrow":
+            if writer is None:
+                types = page.types[:n] if page.types else ["varchar"] * n
+                schema = pa.schema([(c, arrow_type(t)) for c, t in zip(columns, types)])
+                writer = pa.ipc.new_stream(pa.PythonFile(drain, mode="w"), schema)
+            if page.rows:
+                arrays = [arrow_array([r[i] for r in page.rows], schema.field(i).type) for i in range(n)]
+                writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            chunk = drain.take()
+            if chunk:
+                yield chunk
+            continue
+
+        if not page.rows:
+            continue
+        items = format_rows(columns, page.rows)
+        if fmt == "ndjson":
+            yield b"".join(dumps(it) + b"\n" for it in items)
+        else:
+            buf = io.StringIO()
+            w = csv.writer(buf)
+            for it in items:
+                w.writerow(["" if it[c] is None else it[c] for c in columns])
+            yield buf.getvalue().encode("utf-8")
+
+    if fmt == "arrow":
+        if writer is None:
+            # Sin páginas: stream válido con solo el esquema
+            writer = pa.ipc.new_stream(pa.PythonFile(drain, mode="w"), pa.schema([(c, pa.string()) for c in columns]))
+        writer.close()
+        yield drain.take()
+
+
+async def encode_grouped_ndjson(
+    pages: AsyncIterator[QueryResult],
+    columns: List[str],
+    key_index: int,
+    format_rows: Callable[[List[str], List[List[Any]]], List[Dict[str, Any]]],
+    limit: Optional[int] = None,
+) -> AsyncIterator[bytes]:
+    """
+    NDJSON agrupado: una línea `{"device_id": ..., "items": [...]}` por valor de
+    la columna `key_index`. Las filas deben venir ordenadas por esa columna;
+    cada grupo se emite en cuanto aparece el siguiente.
+    Con `limit`, la query debe pedir limit + 1 filas: si llega la fila de más,
+    se cierra con `{"truncated": true, "limit": ..., "next_device_id": ...}`
+    (desde ese device, en orden, faltan filas).
+    """
+    key: Any = None
+    pending: List[List[Any]] = []
+    seen = 0
+    next_key: Any = None
+
+    def flush() -> bytes:
+        line = {"device_id": key, "items": format_rows(columns, pending)}
+        return dumps(line) + b"\n"
+
+    async for page in pages:
+        for row in page.rows:
+            seen += 1
+            if limit is not None and seen > limit:
+                if next_key is None:
+                    next_key = row[key_index]
+                continue
+            k = row[key_index]
+            if pending and k != key:
+                yield flush()
+                pending = []
+            key = k
+            pending.append(row)
+    if pending:
+        yield flush()
+    if limit is not None and seen > limit:
+        yield dumps({"truncated": True, "limit": limit, "next_device_id": next_key}) + b"\n"
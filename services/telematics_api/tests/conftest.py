@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Los módulos del servicio son planos (main.py, geo.py, ...), como en el Dockerfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from admission import (
+    CURRENT, AdmissionController, AdmissionRejected, ClientPolicy, RequestBudget, estimate_cost, parse_policies,
+)
+from trino_async import QueryQueueTimeout
+
+
+def as_client(name, priority="normal", max_concurrency=None):
+    CURRENT.set(RequestBudget(ClientPolicy(name, priority, max_concurrency), priority))
+
+
+async def acquire_as(ctl, name, priority="normal", max_concurrency=None):
+    # Cada task tiene su propio contexto (como cada request)
+    as_client(name, priority, max_concurrency)
+    return await ctl.acquire()
+
+
+def test_priority_order():
+    async def run():
+        ctl = AdmissionController(max_concurrency=1, per_client=1)
+        first = await acquire_as(ctl, "a")
+        order = []
+
+        async def wait(name, priority):
+            lease = await acquire_as(ctl, name, priority)
+            order.append(name)
+            ctl.release(lease)
+
+        tasks = [asyncio.ensure_future(wait("low", "low")), asyncio.ensure_future(wait("normal", "normal")),
+                 asyncio.ensure_future(wait("high", "high"))]
+        await asyncio.sleep(0)
+        ctl.release(first)
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(run()) == ["high", "normal", "low"]
+
+
+def test_per_client_limit_lets_other_clients_through():
+    async def run():
+        ctl = AdmissionController(max_concurrency=4, per_client=1)
+        busy = await acquire_as(ctl, "a")
+        blocked = asyncio.ensure_future(acquire_as(ctl, "a"))
+        other = await asyncio.wait_for(acquire_as(ctl, "b"), 1)
+        await asyncio.sleep(0)
+        assert not blocked.done()
+        ctl.release(busy)
+        lease = await asyncio.wait_for(blocked, 1)
+        assert ctl.stats()["running_by_client"] == {"a": 1, "b": 1}
+        ctl.release(lease)
+        ctl.release(other)
+        return ctl.stats()
+
+    stats = asyncio.run(run())
+    assert stats["in_use"] == 0 and stats["admitted"] == 3
+
+
+def test_queue_full_rejects():
+    async def run():
+        ctl = AdmissionController(max_concurrency=1, per_client=1, max_queue=1)
+        await acquire_as(ctl, "a")
+        waiting = asyncio.ensure_future(acquire_as(ctl, "b"))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected):
+            await acquire_as(ctl, "c")
+        waiting.cancel()
+        return ctl.stats()
+
+    assert asyncio.run(run())["rejected"] == 1
+
+
+def test_timeout():
+    async def run():
+        ctl = AdmissionController(max_concurrency=1, per_client=1, timeout_s=0.05)
+        await acquire_as(ctl, "a")
+        with pytest.raises(QueryQueueTimeout):
+            await acquire_as(ctl, "b")
+        return ctl.stats()
+
+    stats = asyncio.run(run())
+    assert stats["timeouts"] == 1 and stats["waiting"] == 0
+
+
+def test_parse_policies():
+    policies = parse_policies("t1=mobile:high:4, t2=bi:low,t3=")
+    assert policies["t1"] == ClientPolicy("mobile", "high", 4)
+    assert policies["t2"] == ClientPolicy("bi", "low", None)
+    assert policies["t3"].name.startswith("c") and "t3" not in policies["t3"].name
+    with pytest.raises(ValueError):
+        parse_policies("t=x:urgent")
+
+
+def test_estimate_cost():
+    assert estimate_cost(2, 3, 100) == 600
+    assert estimate_cost(0, 0, 0) == 1
+    assert estimate_cost(1, 1, 1000, weight=0.01) == 10
@@ -0,0 +1,37 @@
+from fastapi import Response
+from fastapi.testclient import TestClient
+
+import main
+
+
+def test_deep_offset_is_charged(monkeypatch):
+    monkeypatch.setattr(main, "ADMISSION_COST_HARD", 1e5)
+    client = TestClient(main.app)  # sin lifespan: el rechazo ocurre antes de ir a Trino
+    params = {
+        "device_id": "1440086780", "gps_epoch_start": "2025-09-20T00:00:00",
+        "gps_epoch_end": "2025-09-20T23:59:59", "limit": 100, "offset": 200000,
+    }
+    r = client.get("/telematics_real_time", params=params, headers={"Authorization": f"Bearer {main.API_TOKENS[0]}"})
+    assert r.status_code == 400
+    assert "cursor" in r.json()["detail"]
+
+
+def test_fleet_batch_admitted_at_normal_priority(monkeypatch):
+    seen = {}
+
+    async def fake_stream(request, sql, params, encode, media_type):
+        budget = main.ADMISSION_BUDGET.get()
+        seen["priority"], seen["downgraded"] = budget.priority, budget.downgraded
+        return Response(headers=main.admission_headers())
+
+    monkeypatch.setattr(main, "stream_query", fake_stream)
+    client = TestClient(main.app)
+    body = {
+        "device_ids": [str(1440000000 + i) for i in range(3000)],
+        "gps_epoch_start": "2025-09-14T00:00:00", "gps_epoch_end": "2025-09-20T23:59:59",
+    }
+    r = client.post("/telematics_real_time/batch", json=body, headers={"Authorization": f"Bearer {main.API_TOKENS[0]}"})
+    assert r.status_code == 200
+    assert "X-Admission" not in r.headers
+    assert float(r.headers["X-Admission-Cost"]) <= main.ADMISSION_COST_SOFT
+    assert seen == {"priority": "normal", "downgraded": False}
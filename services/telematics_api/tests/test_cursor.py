@@ -0,0 +1,111 @@
+import sqlite3
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import main
+
+TABLE = "telematics_real_time"
+
+
+def sqlite_sql(sql: str) -> str:
+    # sqlite no tiene timestamp with time zone: el cursor guarda el texto UTC y se compara como string
+    return sql.replace("CAST(? AS timestamp(6) with time zone)", "?")
+
+
+@pytest.fixture
+def db():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (device_id TEXT, gps_epoch TEXT, correlation_id TEXT)")
+    rows = []
+    for device in ("100", "200"):
+        for second in range(4):
+            # 3 reportes por segundo con el mismo gps_epoch (uno sin correlation_id)
+            for corr in (f"{device}-{second}-a", None, f"{device}-{second}-b"):
+                rows.append((device, f"2025-09-20 12:00:0{second}.000000 UTC", corr))
+    conn.executemany("INSERT INTO t VALUES (?, ?, ?)", rows)
+    yield conn, rows
+    conn.close()
+
+
+def fetch_all(conn, limit):
+    cols = main.keyset_columns(TABLE, ["device_id", "gps_epoch"])
+    order = main.keyset_order(TABLE)
+    seen, cursor, pages = [], None, 0
+    while True:
+        where, params = ("", [])
+        if cursor:
+            pred, params = main.keyset_predicate(TABLE, cursor)
+            where = "WHERE " + sqlite_sql(pred)
+        page = conn.execute(f"SELECT {', '.join(cols)} FROM t {where} ORDER BY {order} LIMIT ?", [*params, limit]).fetchall()
+        pages += 1
+        seen.extend(page)
+        cursor = main.next_cursor(TABLE, cols, [list(r) for r in page], limit, None)
+        if cursor is None:
+            return seen, pages
+
+
+@pytest.mark.parametrize("limit", [1, 2, 4, 5])
+def test_pages_across_duplicate_timestamps(db, limit):
+    conn, rows = db
+    seen, pages = fetch_all(conn, limit)
+    assert sorted(seen, key=repr) == sorted(rows, key=repr)
+    assert len(seen) == len(set(seen)) == len(rows)
+    assert pages >= len(rows) // limit
+
+
+def test_cursor_round_trip():
+    cursor = main.encode_cursor(TABLE, "100", "2025-09-20 12:00:00.000000 UTC", "abc")
+    assert main.decode_cursor(TABLE, cursor) == ["100", "2025-09-20 12:00:00.000000 UTC", "abc"]
+    risk = main.encode_cursor("risk_score_daily", "100", main.date(2025, 9, 20))
+    assert main.decode_cursor("risk_score_daily", risk) == ["100", "2025-09-20"]
+
+
+def test_cursor_rejects_other_table_and_old_format():
+    risk = main.encode_cursor("risk_score_daily", "100", main.date(2025, 9, 20))
+    with pytest.raises(HTTPException):
+        main.decode_cursor(TABLE, risk)
+    with pytest.raises(HTTPException):
+        main.decode_cursor(TABLE, "not-base64-json")
+
+
+def test_exact_total_is_stable_across_cursor_pages(monkeypatch):
+    conn = sqlite3.connect(":memory:", check_same_thread=False)  # TestClient corre la app en otro hilo
+    conn.execute("CREATE TABLE risk_score_daily (device_id TEXT, report_date TEXT, score REAL)")
+    conn.executemany(
+        "INSERT INTO risk_score_daily VALUES (?, ?, ?)",
+        [("100", f"2025-09-{day:02d}", float(day)) for day in range(1, 8)],
+    )
+
+    async def execute(sql, params=None):
+        text = (
+            sql.sql.replace(f"{main.TRINO_CATALOG}.{main.TRINO_SCHEMA}.", "")
+            .replace("CAST(? AS date)", "?")
+            .replace("FETCH NEXT ? ROWS ONLY", "LIMIT ?")
+        )
+        cur = conn.execute(text, list(params or []))
+        return main.QueryResult(columns=[d[0] for d in cur.description], rows=[list(r) for r in cur.fetchall()])
+
+    async def no_version(table):
+        return None
+
+    monkeypatch.setattr(main.TRINO, "execute", execute)
+    monkeypatch.setattr(main.TABLE_VERSIONS, "get", no_version)
+    client = TestClient(main.app)
+    headers = {"Authorization": f"Bearer {main.API_TOKENS[0]}"}
+    params = {
+        "device_id": "100", "report_date_start": "2025-09-01", "report_date_end": "2025-09-07",
+        "columns": "device_id,report_date,score", "limit": 3,
+    }
+    pages, cursor = [], None
+    while True:
+        r = client.get("/risk_score_daily", params={**params, **({"cursor": cursor} if cursor else {})}, headers=headers)
+        assert r.status_code == 200
+        pages.append(r.json())
+        cursor = r.json()["page"]["next_cursor"]
+        if cursor is None:
+            break
+    assert [p["page"]["total"] for p in pages] == [7, 7, 7]
+    assert [p["page"]["has_more"] for p in pages] == [True, True, False]
+    assert [item["report_date"] for p in pages for item in p["items"]] == [f"2025-09-{d:02d}" for d in range(7, 0, -1)]
@@ -0,0 +1,22 @@
+import pytest
+
+from main import device_id_bucket, java_hashcode
+
+# Valores de String.hashCode() en Java
+JAVA_HASHCODES = {
+    "": 0,
+    "hello": 99162322,
+    "Aa": 2112,
+    "polygenelubricants": -2147483648,  # Integer.MIN_VALUE
+    "\U0001F600": 1772899,  # "😀": dos unidades UTF-16
+}
+
+
+@pytest.mark.parametrize("s,expected", sorted(JAVA_HASHCODES.items()))
+def test_java_hashcode_matches_java(s, expected):
+    assert java_hashcode(s) == expected
+
+
+def test_bucket_range():
+    assert device_id_bucket("polygenelubricants") == 0
+    assert all(0 <= device_id_bucket(str(n)) < 32 for n in range(1440000000, 1440001000))
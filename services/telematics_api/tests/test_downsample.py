@@ -0,0 +1,25 @@
+from fastapi.testclient import TestClient
+
+import main
+
+PARAMS = {
+    "device_id": "1440086780",
+    "gps_epoch_start": "2025-09-20T00:00:00",
+    "gps_epoch_end": "2025-09-20T23:59:59",
+    "resolution": 60,
+}
+
+
+def test_resolution_rejects_columns_outside_subquery():
+    client = TestClient(main.app)  # sin lifespan: no toca Trino
+    r = client.get(
+        "/telematics_real_time", params={**PARAMS, "columns": "gps_epoch,geo_cell"},
+        headers={"Authorization": f"Bearer {main.API_TOKENS[0]}"},
+    )
+    assert r.status_code == 400
+    assert "geo_cell" in r.json()["detail"]
+
+
+def test_downsample_columns_cover_keyset():
+    cols = main.keyset_columns("telematics_real_time", ["latitude"])
+    assert all(c in main.DOWNSAMPLE_COLUMNS for c in cols)
@@ -0,0 +1,75 @@
+import asyncio
+import gzip
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+import orjson
+import pytest
+import zstandard
+
+import main
+from encoding import compress, compress_stream, dumps, negotiate
+
+
+@pytest.mark.parametrize("header,expected", [
+    (None, None),
+    ("", None),
+    ("identity", None),
+    ("gzip", "gzip"),
+    ("gzip, zstd", "zstd"),  # a igual q se prefiere zstd
+    ("zstd;q=0.5, gzip;q=0.8", "gzip"),
+    ("zstd;q=0, gzip", "gzip"),
+    ("*", "zstd"),
+    ("*;q=0.1, gzip;q=0", "zstd"),
+    ("br, deflate", None),
+    ("GZIP;Q=1", "gzip"),
+    ("gzip;q=abc", None),
+])
+def test_negotiate(header, expected):
+    assert negotiate(header) == expected
+
+
+def test_dumps_non_json_values():
+    assert orjson.loads(dumps({"d": date(2025, 9, 20), "x": Decimal("1.50"), 1: None})) == {"d": "2025-09-20", "x": "1.50", "1": None}
+
+
+def test_compress_round_trip():
+    data = dumps({"items": list(range(1000))})
+    assert gzip.decompress(compress(data, "gzip")) == data
+    assert zstandard.ZstdDecompressor().decompress(compress(data, "zstd")) == data
+    with pytest.raises(ValueError):
+        compress(data, "br")
+
+
+@pytest.mark.parametrize("coding", ["gzip", "zstd"])
+def test_compress_stream_flushes_each_chunk(coding):
+    chunks = [b'{"a":1}\n' * 50, b'{"b":2}\n' * 50]
+
+    async def gen():
+        for c in chunks:
+            yield c
+
+    async def run():
+        return [out async for out in compress_stream(gen(), coding)]
+
+    parts = asyncio.run(run())
+    assert len(parts) >= len(chunks)
+    blob = b"".join(parts)
+    if coding == "gzip":
+        assert gzip.decompress(blob) == b"".join(chunks)
+    else:
+        assert zstandard.ZstdDecompressor().decompressobj().decompress(blob) == b"".join(chunks)
+
+
+def test_response_shapes_agree():
+    cols = ["device_id", "gps_epoch", "speed_kmh"]
+    rows = [["1", datetime(2025, 9, 20, 18, tzinfo=timezone.utc), 10.5, "hidden"], ["2", None, None, "hidden"]]
+    page = {"limit": 2}
+    objects = main.shaped_body("objects", cols, [list(r) for r in rows], page)["items"]
+    by_rows = main.shaped_body("rows", cols, [list(r) for r in rows], page)
+    by_cols = main.shaped_body("columns", cols, [list(r) for r in rows], page)
+    assert by_rows["columns"] == by_cols["columns"] == cols
+    assert [dict(zip(cols, r)) for r in by_rows["data"]] == objects
+    assert [dict(zip(cols, vals)) for vals in zip(*by_cols["data"])] == objects
+    # Sin timestamps, rows devuelve las filas de Trino sin las columnas ocultas
+    assert [list(r) for r in main.shaped_body("rows", ["device_id"], [["1", "x"]], page)["data"]] == [["1"]]
@@ -0,0 +1,79 @@
+import random
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from geo import (
+    LAT_CELLS, LON_CELLS, TILE_SIZE, bbox_cell_ranges, bbox_tiles, geo_cell, lat_index, lon_index, merge_ranges, parse_bbox, polygon_wkt,
+)
+
+MAX_CELL = (180 * 360) * TILE_SIZE - 1
+
+
+@pytest.mark.parametrize("lat,lon", [(-90, -180), (90, 180), (0, 0), (89.9999, 179.9999), (-89.9999, -179.9999), (19.43, -99.13)])
+def test_geo_cell_bounds(lat, lon):
+    cell = geo_cell(lat, lon)
+    assert 0 <= cell <= MAX_CELL
+
+
+def test_indexes_clamped():
+    assert lat_index(-90) == 0 and lat_index(90) == LAT_CELLS - 1
+    assert lon_index(-180) == 0 and lon_index(180) == LON_CELLS - 1
+    assert geo_cell(None, 1.0) is None
+
+
+def test_bbox_ranges_cover_every_point():
+    rnd = random.Random(3)
+    bbox = (-99.35, 19.20, -98.95, 19.60)  # cruza el cuadro de 1° en -99
+    ranges = bbox_cell_ranges(*bbox)
+    for _ in range(5000):
+        lon, lat = rnd.uniform(bbox[0], bbox[2]), rnd.uniform(bbox[1], bbox[3])
+        cell = geo_cell(lat, lon)
+        assert any(lo <= cell <= hi for lo, hi in ranges)
+
+
+def test_merge_ranges_is_superset_and_bounded():
+    ranges = [(i * 10, i * 10 + 3) for i in range(50)]
+    merged = merge_ranges(ranges, 8)
+    assert len(merged) <= 8
+    assert all(any(lo <= a and b <= hi for lo, hi in merged) for a, b in ranges)
+    assert merge_ranges([(1, 2), (3, 5), (10, 11)], 10) == [(1, 5), (10, 11)]
+
+
+def test_parse_bbox_validation():
+    assert parse_bbox("-99.2,19.3,-99.1,19.5") == (-99.2, 19.3, -99.1, 19.5)
+    for bad in ("1,2,3", "a,b,c,d", "10,0,5,1", "-181,0,0,1"):
+        with pytest.raises(ValueError):
+            parse_bbox(bad)
+
+
+def test_polygon_wkt_closes_ring():
+    assert polygon_wkt([[0, 0], [1, 0], [1, 1]]) == "POLYGON((0.0 0.0, 1.0 0.0, 1.0 1.0, 0.0 0.0))"
+    with pytest.raises(ValueError):
+        polygon_wkt([[0, 0], [1, 1]])
+
+
+def test_world_bbox_is_cheap():
+    start = time.perf_counter()
+    ranges = bbox_cell_ranges(-180, -90, 180, 90)
+    assert time.perf_counter() - start < 1.0
+    assert ranges == [(0, MAX_CELL)]
+    # Bordes este/oeste parciales: sigue acotado y cubre las esquinas
+    start = time.perf_counter()
+    ranges = bbox_cell_ranges(-179.55, -89.55, 179.55, 89.55)
+    assert time.perf_counter() - start < 1.0
+    assert len(ranges) <= 64
+    for lat, lon in ((-89.55, -179.55), (89.55, 179.55), (0, 0), (-89.5, 179.5)):
+        cell = geo_cell(lat, lon)
+        assert any(lo <= cell <= hi for lo, hi in ranges)
+
+
+def test_area_rejects_too_many_tiles():
+    client = TestClient(main.app)  # sin lifespan: el rechazo ocurre antes de ir a Trino
+    params = {"bbox": "-180,-90,180,90", "gps_epoch_start": "2025-09-20T00:00:00", "gps_epoch_end": "2025-09-20T23:59:59"}
+    r = client.get("/telematics_real_time/area", params=params, headers={"Authorization": f"Bearer {main.API_TOKENS[0]}"})
+    assert r.status_code == 400
+    assert "tiles" in r.json()["detail"]
+    assert bbox_tiles(-180, -90, 180, 90) == 180 * 360
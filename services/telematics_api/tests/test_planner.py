@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+
+from planner import ProjectionError, SchemaCatalog, TemplateCache
+from trino_async import QueryResult, bind_statement, prepare
+
+SCHEMA_ROWS = [
+    ["telematics_real_time", "device_id", "varchar"],
+    ["telematics_real_time", "gps_epoch", "timestamp(6) with time zone"],
+    ["telematics_real_time", "latitude", "double"],
+    ["risk_score_daily", "report_date", "date"],
+]
+
+
+class FakeTrino:
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = 0
+
+    async def execute(self, sql, params=None):
+        self.calls += 1
+        if isinstance(self.rows, Exception):
+            raise self.rows
+        return QueryResult(["table_name", "column_name", "data_type"], [list(r) for r in self.rows])
+
+
+def catalog(rows=SCHEMA_ROWS):
+    cat = SchemaCatalog(FakeTrino(rows), "nessie", "telematics", ["telematics_real_time", "risk_score_daily"])
+    loaded = asyncio.run(cat.load())
+    assert loaded == (not isinstance(rows, Exception))
+    return cat
+
+
+def test_projection_normalizes():
+    cat = catalog()
+    assert cat.projection("telematics_real_time", " Latitude,device_id,latitude ,", ["x"]) == ["latitude", "device_id"]
+    assert cat.projection("telematics_real_time", None, ["device_id"]) == ["device_id"]
+
+
+@pytest.mark.parametrize("columns", ["device_id;drop", "1abc", "lat itude", ",,"])
+def test_projection_rejects_invalid(columns):
+    with pytest.raises(ProjectionError):
+        catalog().projection("telematics_real_time", columns, [])
+
+
+def test_projection_rejects_unknown_with_available_list():
+    with pytest.raises(ProjectionError, match="available: device_id, gps_epoch, latitude"):
+        catalog().projection("telematics_real_time", "speed", [])
+
+
+def test_without_schema_only_syntax_is_checked():
+    cat = catalog(RuntimeError("trino down"))
+    assert cat.stats()["errors"] == 1
+    assert cat.projection("telematics_real_time", "anything", []) == ["anything"]
+
+
+def test_schema_version_and_timestamp_columns():
+    cat = catalog()
+    assert cat.version == 1 and cat.timestamp_columns() == {"gps_epoch"}
+    asyncio.run(cat.load())
+    assert cat.version == 1  # mismo esquema: no cambia la versión
+    cat.trino.rows = SCHEMA_ROWS + [["telematics_real_time", "decoded_epoch", "timestamp(3)"]]
+    asyncio.run(cat.load())
+    assert cat.version == 2 and cat.timestamp_columns() == {"gps_epoch", "decoded_epoch"}
+
+
+def test_template_cache_keys_and_lru():
+    cache = TemplateCache(max_entries=2)
+    builds = []
+
+    def build(sql):
+        return lambda: builds.append(sql) or sql
+
+    a = cache.get(("page", "t", "a, b"), build("SELECT a, b FROM t"))
+    assert cache.get(("page", "t", "a, b"), build("SELECT a, b FROM t")) is a
+    b = cache.get(("page", "t", "a"), build("SELECT a FROM t"))
+    assert b.name != a.name
+    cache.get(("count", "t"), build("SELECT count(*) FROM t"))  # desaloja la más vieja (a, b)
+    cache.get(("page", "t", "a, b"), build("SELECT a, b FROM t"))
+    assert builds == ["SELECT a, b FROM t", "SELECT a FROM t", "SELECT count(*) FROM t", "SELECT a, b FROM t"]
+    stats = cache.stats()
+    assert stats["entries"] == 2 and stats["hits"] == 1 and stats["misses"] == 4
+
+
+def test_statement_name_ignores_indentation():
+    assert prepare("SELECT a\n    FROM t\n").name == prepare("  SELECT a\nFROM t").name
+    assert prepare("SELECT a FROM t").name != prepare("SELECT b FROM t").name
+
+
+def test_prepared_statement_header_and_fallback():
+    stmt = prepare("SELECT x\n    FROM t\n    WHERE id = ?")
+    body, headers = bind_statement(stmt, ["a'b"])
+    assert body == f"EXECUTE {stmt.name} USING 'a''b'"
+    assert headers["X-Trino-Prepared-Statement"].startswith(stmt.name + "=SELECT+x%0AFROM+t")
+    too_long = prepare("SELECT " + "x, " * 2000 + "y FROM t", max_header_bytes=128)
+    body, headers = bind_statement(too_long, [1])
+    assert body.startswith("EXECUTE IMMEDIATE") and headers == {}
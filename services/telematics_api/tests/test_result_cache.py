@@ -0,0 +1,31 @@
+import asyncio
+
+import main
+from result_cache import ResultCache
+
+
+def cache_key(monkeypatch, version):
+    async def get(table):
+        return version
+
+    monkeypatch.setattr(main.TABLE_VERSIONS, "get", get)
+    stmt = main.TEMPLATES.get(("test", "telematics"), lambda: "SELECT gps_epoch FROM t WHERE device_id = ?")
+    return asyncio.run(main.result_cache_key("telematics_real_time", stmt, ["1"], ["gps_epoch"], versioned=True))
+
+
+def test_telematics_key_follows_snapshot(monkeypatch):
+    # Un backfill sobre días pasados crea un snapshot nuevo: el key cambia
+    assert cache_key(monkeypatch, "snap-1") != cache_key(monkeypatch, "snap-2")
+    assert cache_key(monkeypatch, "snap-1") == cache_key(monkeypatch, "snap-1")
+
+
+def test_no_key_without_snapshot(monkeypatch):
+    assert cache_key(monkeypatch, None) is None
+
+
+def test_lru_eviction():
+    cache = ResultCache(max_entries=2, ttl_s=60, tz=main.LOCAL_TZ)
+    for k in "abc":
+        cache.put(k, {"k": k})
+    assert cache.get("a") is None
+    assert cache.get("c") == {"k": "c"}
@@ -0,0 +1,62 @@
+import asyncio
+import json
+from decimal import Decimal
+
+import pyarrow as pa
+
+from streaming import arrow_type, encode_grouped_ndjson, encode_stream
+from trino_async import QueryResult
+
+
+def collect(pages, columns, fmt):
+    async def gen():
+        for p in pages:
+            yield p
+
+    async def run():
+        return b"".join([chunk async for chunk in encode_stream(gen(), columns, fmt, lambda cols, rows: [dict(zip(cols, r)) for r in rows])])
+
+    return asyncio.run(run())
+
+
+def test_decimal_maps_to_decimal128():
+    assert arrow_type("decimal(10, 2)") == pa.decimal128(10, 2)
+    assert arrow_type("decimal(38,6)") == pa.decimal128(38, 6)
+
+
+def test_arrow_stream_with_decimal_and_unmapped_types():
+    types = ["varchar", "decimal(10,2)", "array(integer)"]
+    pages = [
+        QueryResult(["device_id", "score", "tags"], [["1", Decimal("12.50"), [1, 2]], ["2", None, None]], types=types),
+        QueryResult(["device_id", "score", "tags"], [["3", Decimal("0.01"), [3]]], types=types),
+    ]
+    table = pa.ipc.open_stream(collect(pages, ["device_id", "score", "tags"], "arrow")).read_all()
+    assert table.schema.field("score").type == pa.decimal128(10, 2)
+    assert table.column("score").to_pylist() == [Decimal("12.50"), None, Decimal("0.01")]
+    assert table.column("tags").to_pylist() == ["[1, 2]", None, "[3]"]
+
+
+def grouped(pages, limit):
+    async def gen():
+        for p in pages:
+            yield p
+
+    async def run():
+        fmt = lambda cols, rows: [dict(zip(cols, r)) for r in rows]
+        return [json.loads(line) async for chunk in encode_grouped_ndjson(gen(), ["device_id", "v"], 0, fmt, limit) for line in chunk.splitlines()]
+
+    return asyncio.run(run())
+
+
+def test_grouped_ndjson_marks_truncation():
+    rows = [["1", 1], ["1", 2], ["2", 3], ["3", 4]]
+    # La query pidió limit + 1 = 4 filas: llegó la de más
+    lines = grouped([QueryResult(["device_id", "v"], rows[:2]), QueryResult(["device_id", "v"], rows[2:])], 3)
+    assert lines == [
+        {"device_id": "1", "items": [{"device_id": "1", "v": 1}, {"device_id": "1", "v": 2}]},
+        {"device_id": "2", "items": [{"device_id": "2", "v": 3}]},
+        {"truncated": True, "limit": 3, "next_device_id": "3"},
+    ]
+    # Resultado completo: sin marca
+    complete = grouped([QueryResult(["device_id", "v"], rows)], 4)
+    assert [line["device_id"] for line in complete] == ["1", "2", "3"]
@@ -0,0 +1,42 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytz
+
+import main
+
+
+def values():
+    rnd = random.Random(11)
+    base = datetime(2015, 1, 1, tzinfo=timezone.utc)
+    out = [base + timedelta(seconds=rnd.randrange(11 * 365 * 86400), microseconds=rnd.randrange(1_000_000)) for _ in range(3000)]
+    # Alrededor de cada cambio de horario de TIME_ZONE
+    for t in getattr(main.LOCAL_TZ, "_utc_transition_times", [])[1:]:
+        if t.year >= 1970:
+            out += [t.replace(tzinfo=timezone.utc) + timedelta(seconds=d, microseconds=999) for d in (-1, 0, 1)]
+    # Otras zonas, naive, strings, años < 1000 y nulos (camino de fallback)
+    out += [
+        pytz.timezone("America/New_York").localize(datetime(2024, 3, 10, 3, 30)),
+        datetime(2024, 6, 1, 12, 0, 0, 123456, tzinfo=timezone(timedelta(hours=5, minutes=30))),
+        datetime(2024, 6, 1, 12, 0, 0),
+        datetime(999, 12, 31, 23, 0, tzinfo=timezone.utc),
+        "2024-06-01 12:00:00.5",
+        None,
+    ]
+    return out
+
+
+def test_column_formatter_matches_format_local_offset():
+    vals = values()
+    assert main.TS_FORMATTER.format_column(vals) == [main.format_local_offset(v) for v in vals]
+
+
+def test_format_shape():
+    text = main.TS_FORMATTER.format_column([datetime(2025, 9, 20, 18, 0, 0, 250000, tzinfo=timezone.utc)])[0]
+    assert text == "2025-09-20 12:00:00.250 -0600"
+
+
+def test_postprocess_rows_formats_only_timestamp_columns():
+    ts = datetime(2025, 9, 20, 18, 0, tzinfo=timezone.utc)
+    items = main.postprocess_rows(["device_id", "gps_epoch"], [["1", ts, "extra"]])
+    assert items == [{"device_id": "1", "gps_epoch": main.format_local_offset(ts)}]
@@ -0,0 +1,109 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from admission import AdmissionController
+from trino_async import AsyncTrino
+
+FINISHED = {"id": "q1", "columns": [{"name": "x", "type": "integer"}], "data": [[1]], "stats": {"state": "FINISHED"}}
+
+
+def make_trino(handler) -> AsyncTrino:
+    trino = AsyncTrino(
+        "trino", 8080, "test", None, "nessie", "telematics", "UTC",
+        admission=AdmissionController(4, 4), http_scheme="http",
+    )
+    trino._client = httpx.AsyncClient(base_url=trino.base_url, transport=httpx.MockTransport(handler))
+    return trino
+
+
+def run(trino: AsyncTrino, sql="SELECT 1"):
+    async def go():
+        try:
+            return await trino.execute(sql)
+        finally:
+            await trino.close()
+    return asyncio.run(go())
+
+
+def test_post_retried_when_not_sent(monkeypatch):
+    monkeypatch.setattr(asyncio, "sleep", _no_sleep)
+    posts = []
+
+    def handler(request):
+        posts.append(request)
+        if len(posts) == 1:
+            raise httpx.ConnectError("refused", request=request)
+        return httpx.Response(200, json=FINISHED)
+
+    assert run(make_trino(handler)).rows == [[1]]
+    assert len(posts) == 2
+
+
+@pytest.mark.parametrize("failure", ["read_timeout", "status_503"])
+def test_post_not_retried_after_send(monkeypatch, failure):
+    monkeypatch.setattr(asyncio, "sleep", _no_sleep)
+    posts = []
+
+    def handler(request):
+        posts.append(request)
+        if failure == "read_timeout":
+            raise httpx.ReadTimeout("timeout", request=request)
+        return httpx.Response(503)
+
+    with pytest.raises((httpx.ReadTimeout, httpx.HTTPStatusError)):
+        run(make_trino(handler))
+    assert len(posts) == 1
+
+
+def test_next_uri_retried(monkeypatch):
+    monkeypatch.setattr(asyncio, "sleep", _no_sleep)
+    gets = []
+
+    def handler(request):
+        if request.method == "POST":
+            return httpx.Response(200, json={"id": "q1", "nextUri": "http://trino:8080/v1/statement/executing/q1/1"})
+        gets.append(request)
+        if len(gets) == 1:
+            return httpx.Response(503)
+        return httpx.Response(200, json=FINISHED)
+
+    assert run(make_trino(handler)).rows == [[1]]
+    assert len(gets) == 2
+
+
+async def _no_sleep(_s):
+    return None
+
+
+def test_connection_stats_idle_and_expiry():
+    body = json.dumps(FINISHED).encode()
+
+    async def serve(reader, writer):
+        while await reader.readuntil(b"\r\n\r\n"):
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body))
+            await writer.drain()
+
+    async def go():
+        server = await asyncio.start_server(serve, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        trino = AsyncTrino(
+            "127.0.0.1", port, "test", None, "nessie", "telematics", "UTC",
+            admission=AdmissionController(4, 4), http_scheme="http", keepalive_expiry_s=0.2,
+        )
+        try:
+            assert trino.connection_stats() == {"in_use": 0, "idle": 0}
+            assert (await trino.execute("SELECT 1")).rows == [[1]]
+            after_query = trino.connection_stats()
+            await asyncio.sleep(0.3)
+            return after_query, trino.connection_stats(), trino.stats()
+        finally:
+            await trino.close()
+            server.close()
+
+    after_query, expired, stats = asyncio.run(go())
+    assert after_query == {"in_use": 0, "idle": 1}
+    assert expired == {"in_use": 0, "idle": 0}
+    assert stats["connections_idle"] == 0 and "connections_in_use" in stats
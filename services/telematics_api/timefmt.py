@@ -0,0 +1,75 @@
+from bisect import bisect_right
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+_FAR_FUTURE = datetime.max
+
+
+class LocalOffsetFormatter:
+    """
+    Formateo por columna a 'YYYY-MM-DD HH:MM:SS.mmm -0600' en una zona pytz.
+
+    Usa la tabla de transiciones UTC de la zona (la misma que usa pytz) para
+    resolver el offset de cada valor con una búsqueda binaria, y recuerda el
+    último intervalo: en una columna de un mismo día casi todos los valores
+    caen en el mismo tramo, así que el costo por valor es una comparación,
+    una suma y un `isoformat`.
+
+    Solo los datetime con tz pasan por el camino rápido; naive, strings u
+    otros tipos se delegan a `fallback` (el formateador escalar).
+    """
+
+    def __init__(self, tz: Any, fallback: Callable[[Any], Optional[str]]):
+        self.fallback = fallback
+        starts: List[datetime] = list(getattr(tz, "_utc_transition_times", None) or [datetime.min])
+        infos = getattr(tz, "_transition_info", None)
+        if infos:
+            offsets = [info[0] for info in infos]
+        else:
+            offsets = [tz.utcoffset(datetime(2000, 1, 1))]
+        self._starts = starts
+        self._offsets: List[timedelta] = offsets
+        # Mismo texto que strftime('%z') de un datetime con ese offset
+        self._suffixes = [" " + datetime(2000, 1, 1, tzinfo=timezone(off)).strftime("%z") for off in offsets]
+
+    def _interval(self, utc_naive: datetime) -> Tuple[int, datetime, datetime]:
+        i = bisect_right(self._starts, utc_naive) - 1
+        if i < 0:
+            i = 0
+        end = self._starts[i + 1] if i + 1 < len(self._starts) else _FAR_FUTURE
+        return i, self._starts[i], end
+
+    def format_column(self, values: Sequence[Any]) -> List[Optional[str]]:
+        out: List[Optional[str]] = []
+        append = out.append
+        fallback = self.fallback
+        utc = timezone.utc
+        lo = hi = None
+        off: Optional[timedelta] = None
+        suffix = ""
+
+        for v in values:
+            if v is None:
+                append(None)
+                continue
+            if type(v) is not datetime or v.tzinfo is None:
+                append(fallback(v))
+                continue
+
+            if v.tzinfo is utc:
+                u = v.replace(tzinfo=None)
+            else:
+                u = v.replace(tzinfo=None) - v.utcoffset()
+
+            if lo is None or not (lo <= u < hi):
+                i, lo, hi = self._interval(u)
+                off = self._offsets[i]
+                suffix = self._suffixes[i]
+
+            local = u + off
+            if local.year < 1000:
+                # strftime('%Y') no rellena con ceros; se respeta el formato original
+                append(fallback(v))
+                continue
+            append(local.isoformat(" ", "milliseconds") + suffix)
+        return out
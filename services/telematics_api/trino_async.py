@@ -0,0 +1,413 @@
+import asyncio
+import hashlib
+import math
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, List, Optional, Sequence, Tuple, Union
+from urllib.parse import quote_plus
+
+import httpx
+import pytz
+
+if TYPE_CHECKING:
+    from admission import AdmissionController
+
+
+class TrinoQueryError(Exception):
+    """Trino respondió con `error` (sintaxis, columna inexistente, etc.)."""
+
+    def __init__(self, message: str, query_id: Optional[str] = None, error_name: Optional[str] = None):
+        super().__init__(message)
+        self.query_id = query_id
+        self.error_name = error_name
+
+
+class QueryQueueTimeout(Exception):
+    """No se liberó un slot de ejecución dentro del timeout de admisión."""
+
+
+@dataclass
+class QueryResult:
+    columns: List[str]
+    rows: List[List[Any]]
+    query_id: Optional[str] = None
+    stats: Dict[str, Any] = field(default_factory=dict)
+    types: List[str] = field(default_factory=list)
+
+
+@dataclass
+class QueryTrace:
+    """Resumen de una query terminada (o cancelada) para métricas y logs."""
+    sql: str
+    params: Optional[Sequence[Any]]
+    query_id: Optional[str]
+    outcome: str  # ok | error | cancelled
+    queue_wait_s: float
+    first_page_s: Optional[float]
+    elapsed_s: float
+    rows: int
+    stats: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+    client_tags: List[str] = field(default_factory=list)
+    statement: Optional[str] = None  # nombre del prepared statement, si se usó
+
+
+# =========================
+# Parámetros (EXECUTE IMMEDIATE ... USING)
+# =========================
+def sql_literal(v: Any) -> str:
+    """Literal SQL de Trino para un parámetro (mismo formato que trino.dbapi)."""
+    if v is None:
+        return "NULL"
+    if isinstance(v, bool):
+        return "true" if v else "false"
+    if isinstance(v, int):
+        return "%d" % v
+    if isinstance(v, float):
+        if math.isnan(v):
+            return "nan()"
+        if math.isinf(v):
+            return "infinity()" if v > 0 else "-infinity()"
+        return "DOUBLE '%s'" % v
+    if isinstance(v, Decimal):
+        return "DECIMAL '%s'" % format(v, "f")
+    if isinstance(v, str):
+        return "'%s'" % v.replace("'", "''")
+    if isinstance(v, datetime):
+        ts = v.strftime("%Y-%m-%d %H:%M:%S.%f")
+        if v.tzinfo is None:
+            return "TIMESTAMP '%s'" % ts
+        return "TIMESTAMP '%s %s'" % (ts, v.strftime("%z")[:3] + ":" + v.strftime("%z")[3:])
+    if isinstance(v, date):
+        return "DATE '%s'" % v.isoformat()
+    if isinstance(v, (list, tuple)):
+        return "ARRAY[%s]" % ",".join(sql_literal(x) for x in v)
+    raise TypeError(f"Unsupported query parameter type: {type(v).__name__}")
+
+
+def bind_params(sql: str, params: Optional[Sequence[Any]]) -> str:
+    if not params:
+        return sql
+    return "EXECUTE IMMEDIATE %s USING %s" % (sql_literal(sql), ", ".join(sql_literal(p) for p in params))
+
+
+@dataclass(frozen=True)
+class PreparedStatement:
+    """
+    SQL con `?` que viaja como prepared statement del protocolo: el texto va en
+    `X-Trino-Prepared-Statement` (ya codificado) y el body es solo
+    `EXECUTE name USING ...`. Con `header` None (SQL demasiado largo para un
+    header HTTP) se ejecuta con EXECUTE IMMEDIATE.
+    """
+    name: str
+    sql: str
+    header: Optional[str]
+
+
+def prepare(sql: str, max_header_bytes: int = 4096) -> PreparedStatement:
+    # Sin indentación ni líneas vacías: menos bytes en el header, mismo SQL
+    text = "\n".join(line.strip() for line in sql.splitlines() if line.strip())
+    name = "api_" + hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+    header = f"{name}={quote_plus(text)}"
+    return PreparedStatement(name, text, header if len(header) <= max_header_bytes else None)
+
+
+def bind_statement(sql: Union[str, PreparedStatement], params: Optional[Sequence[Any]]) -> Tuple[str, Dict[str, str]]:
+    """Body del POST /v1/statement y headers extra para `sql` + `params`."""
+    if isinstance(sql, PreparedStatement):
+        if sql.header is None:
+            return bind_params(sql.sql, params), {}
+        body = f"EXECUTE {sql.name}"
+        if params:
+            body += " USING " + ", ".join(sql_literal(p) for p in params)
+        return body, {"X-Trino-Prepared-Statement": sql.header}
+    return bind_params(sql, params), {}
+
+
+# =========================
+# Conversión de valores (mismo resultado que trino.dbapi)
+# =========================
+_ZONES: Dict[str, Any] = {"UTC": timezone.utc, "Z": timezone.utc}
+
+
+def _zone(name: str):
+    tz = _ZONES.get(name)
+    if tz is None:
+        if name[0] in "+-":
+            sign = -1 if name[0] == "-" else 1
+            hh, mm = name[1:].split(":")
+            tz = timezone(sign * timedelta(hours=int(hh), minutes=int(mm)))
+        else:
+            tz = pytz.timezone(name)
+        _ZONES[name] = tz
+    return tz
+
+
+def _parse_ts(txt: str) -> datetime:
+    # Trino devuelve hasta 12 dígitos de fracción; datetime soporta 6
+    dot = txt.find(".")
+    if dot != -1 and len(txt) - dot - 1 > 6:
+        txt = txt[:dot + 7]
+    return datetime.fromisoformat(txt)
+
+
+def _parse_ts_tz(txt: str) -> datetime:
+    base, _, zone = txt.rpartition(" ")
+    tz = _zone(zone)
+    dt = _parse_ts(base)
+    if hasattr(tz, "localize"):
+        return tz.localize(dt)
+    return dt.replace(tzinfo=tz)
+
+
+def _parse_double(v: Any) -> Any:
+    if isinstance(v, str):
+        return float(v)  # "NaN", "Infinity", "-Infinity"
+    return v
+
+
+def _converter(type_name: str) -> Optional[Callable[[Any], Any]]:
+    if type_name.startswith("timestamp") and type_name.endswith("with time zone"):
+        return _parse_ts_tz
+    if type_name.startswith("timestamp"):
+        return _parse_ts
+    if type_name == "date":
+        return date.fromisoformat
+    if type_name in ("double", "real"):
+        return _parse_double
+    if type_name.startswith("decimal"):
+        return Decimal
+    return None
+
+
+def _row_mapper(columns: List[Dict[str, Any]]) -> Callable[[List[Any]], List[Any]]:
+    convs = [(i, c) for i, c in enumerate(_converter(col["type"]) for col in columns) if c is not None]
+    if not convs:
+        return lambda row: row
+
+    def mapper(row: List[Any]) -> List[Any]:
+        for i, conv in convs:
+            v = row[i]
+            if v is not None:
+                row[i] = conv(v)
+        return row
+
+    return mapper
+
+
+# =========================
+# Cliente asíncrono (protocolo REST /v1/statement)
+# =========================
+class AsyncTrino:
+    """
+    Ejecuta statements contra Trino sin bloquear el event loop.
+
+    - Un solo `httpx.AsyncClient` por proceso (keep-alive, hasta `max_connections`).
+    - Cada query pide un slot a `admission` (límite global y por cliente, cola con
+      prioridad); los tags del cliente van en `X-Trino-Client-Tags` para que los
+      resource groups de Trino separen el tráfico de la API de los batch.
+    - Si la coroutine se cancela (p.ej. el cliente HTTP se desconectó), se hace
+      DELETE sobre `nextUri` para que Trino también mate la query.
+    - `on_complete` recibe un `QueryTrace` por query (métricas, slow-query log).
+    """
+
+    RETRYABLE_STATUS = {502, 503, 504}
+    # Errores sin que el request haya salido: reintentar el POST no puede duplicar la query
+    UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        user: str,
+        password: Optional[str],
+        catalog: str,
+        schema: str,
+        time_zone: str,
+        admission: "AdmissionController",
+        http_scheme: str = "https",
+        source: str = "telematics-api",
+        verify: bool = False,
+        max_connections: int = 8,
+        keepalive_expiry_s: float = 60.0,
+        request_timeout_s: float = 30.0,
+        max_attempts: int = 3,
+        on_complete: Optional[Callable[[QueryTrace], None]] = None,
+    ):
+        self.base_url = f"{http_scheme}://{host}:{port}"
+        self.headers = {
+            "X-Trino-User": user,
+            "X-Trino-Catalog": catalog,
+            "X-Trino-Schema": schema,
+            "X-Trino-Time-Zone": time_zone,
+            "X-Trino-Source": source,
+        }
+        self._auth = (user, password) if password else None
+        self._verify = verify
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=keepalive_expiry_s,
+        )
+        self._timeout = httpx.Timeout(request_timeout_s)
+        self._transport: Optional[httpx.AsyncHTTPTransport] = None
+        self._client: Optional[httpx.AsyncClient] = None
+
+        self.admission = admission
+        self.max_attempts = max_attempts
+        self.on_complete = on_complete
+
+        # Métricas
+        self._cancelled = 0
+
+    # ----- ciclo de vida -----
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._transport = httpx.AsyncHTTPTransport(verify=self._verify, limits=self._limits)
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                auth=self._auth,
+                transport=self._transport,
+                timeout=self._timeout,
+                headers=self.headers,
+            )
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._transport = None
+
+    def connection_stats(self) -> Dict[str, int]:
+        """
+        Conexiones HTTP abiertas hacia Trino: `in_use` (con un request en curso)
+        e `idle` (keep-alive, se cierran a los `keepalive_expiry_s`; httpcore
+        descarta al reusarla una conexión que Trino ya cerró). httpx no expone
+        el pool, así que se lee el de httpcore que está debajo del transporte.
+        """
+        pool = getattr(self._transport, "_pool", None)
+        conns = [c for c in getattr(pool, "connections", []) if not c.is_closed() and not c.has_expired()]
+        idle = sum(1 for c in conns if c.is_idle())
+        return {"in_use": len(conns) - idle, "idle": idle}
+
+    # ----- HTTP -----
+    async def _request(self, method: str, url: str, idempotent: bool = True, **kw) -> Dict[str, Any]:
+        """
+        GET de `nextUri` (idempotente): reintenta errores de transporte y 502/503/504.
+        POST de un statement (`idempotent=False`): solo si el request no llegó a
+        enviarse; un timeout o corte después podría ejecutar la query dos veces.
+        """
+        retry_errors = httpx.TransportError if idempotent else self.UNSENT_ERRORS
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                resp = await self.client.request(method, url, **kw)
+            except retry_errors:
+                if attempt == self.max_attempts:
+                    raise
+            else:
+                if not idempotent or resp.status_code not in self.RETRYABLE_STATUS or attempt == self.max_attempts:
+                    resp.raise_for_status()
+                    return resp.json()
+            await asyncio.sleep(0.1 * 2 ** (attempt - 1))
+        raise RuntimeError("unreachable")
+
+    async def _cancel(self, next_uri: str) -> None:
+        self._cancelled += 1
+        try:
+            await asyncio.shield(self.client.delete(next_uri))
+        except Exception:
+            pass
+
+    # ----- ejecución -----
+    async def batches(
+        self, sql: Union[str, PreparedStatement], params: Optional[Sequence[Any]] = None,
+    ) -> AsyncIterator[QueryResult]:
+        """
+        Itera los resultados página a página (una por respuesta de `nextUri`).
+        Cada `QueryResult` trae solo las filas de esa página; las columnas y
+        stats se actualizan conforme avanza la query.
+        """
+        body, headers = bind_statement(sql, params)
+        statement = sql.name if isinstance(sql, PreparedStatement) and sql.header is not None else None
+        text = sql.sql if isinstance(sql, PreparedStatement) else sql
+        lease = await self.admission.acquire()
+        if lease.tags:
+            headers["X-Trino-Client-Tags"] = ",".join(lease.tags)
+        t0 = time.monotonic()
+        next_uri: Optional[str] = None
+        finished = False
+        outcome = "cancelled"
+        error: Optional[str] = None
+        first_page_s: Optional[float] = None
+        n_rows = 0
+        query_id: Optional[str] = None
+        stats: Dict[str, Any] = {}
+        try:
+            payload = await self._request(
+                "POST", "/v1/statement", idempotent=False, content=body.encode("utf-8"), headers=headers,
+            )
+            columns: Optional[List[str]] = None
+            types: List[str] = []
+            mapper: Callable[[List[Any]], List[Any]] = lambda row: row
+            while True:
+                query_id = payload.get("id", query_id)
+                stats = payload.get("stats", stats)
+                if payload.get("error"):
+                    err = payload["error"]
+                    finished = True
+                    raise TrinoQueryError(err.get("message", "query failed"), payload.get("id"), err.get("errorName"))
+                if columns is None and payload.get("columns"):
+                    columns = [c["name"] for c in payload["columns"]]
+                    types = [c["type"] for c in payload["columns"]]
+                    mapper = _row_mapper(payload["columns"])
+                data = payload.get("data")
+                next_uri = payload.get("nextUri")
+                if data:
+                    if first_page_s is None:
+                        first_page_s = time.monotonic() - t0
+                    n_rows += len(data)
+                    yield QueryResult(columns or [], [mapper(r) for r in data], payload.get("id"), payload.get("stats", {}), types)
+                if not next_uri:
+                    finished = True
+                    outcome = "ok"
+                    if not data:
+                        yield QueryResult(columns or [], [], payload.get("id"), payload.get("stats", {}), types)
+                    return
+                payload = await self._request("GET", next_uri)
+        except Exception as e:
+            outcome, error = "error", str(e)
+            raise
+        finally:
+            if not finished and next_uri:
+                await self._cancel(next_uri)
+            self.admission.release(lease)
+            if self.on_complete is not None:
+                trace = QueryTrace(
+                    text, params, query_id, outcome, lease.waited_s, first_page_s,
+                    time.monotonic() - t0, n_rows, stats, error, lease.tags, statement,
+                )
+                try:
+                    self.on_complete(trace)
+                except Exception:
+                    pass
+
+    async def execute(self, sql: Union[str, PreparedStatement], params: Optional[Sequence[Any]] = None) -> QueryResult:
+        result = QueryResult(columns=[], rows=[])
+        async for page in self.batches(sql, params):
+            result.columns = page.columns
+            result.rows.extend(page.rows)
+            result.query_id = page.query_id
+            result.stats = page.stats
+            result.types = page.types
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        conns = self.connection_stats()
+        return {
+            **self.admission.stats(), "cancelled": self._cancelled,
+            "connections_in_use": conns["in_use"], "connections_idle": conns["idle"],
+        }